@@ -0,0 +1,353 @@
+import numpy as np
+from data.acceso_data import cache_datos, cargar_tabla, obtener_arreglos_modelo, obtener_nombres_municipios
+from data.geometrias import ruta_geometria
+from data.capas import CAPAS, archivo_capa
+from data.caracteristicas import normalizar_cvegeo
+from data.sequia import obtener_sequia_anual, sequia_anual
+from calculos.modelo import ESPECIFICACION_DETALLE, desglose_similitud
+from calculos.matriz_similitud import cargar_matriz, municipios_mas_similares
+from calculos.cache_resultados import cache_resultado, detalle_similares
+from calculos.cubo_produccion import agregado, obtener_cubo, principales_municipios, ultimo_anio
+from calculos.similitud_cultivos import obtener_perfiles_cultivos
+from calculos.espacial import municipio_en_punto, obtener_indice_espacial, similares_en_radio
+from calculos.aez_comp import (
+    cultivos_similares,
+    fila_cultivos,
+    filas_cultivos,
+    ids_a_nombres,
+    ids_de_fila,
+    obtener_cultivos,
+    obtener_indice_aptitud,
+    obtener_matriz_cultivos,
+    obtener_nombres_cultivos,
+    recomendar_mejores_cultivos,
+)
+
+# Respuestas JSON de la API (listas y diccionarios con tipos de Python),
+# con la forma que espera front_bueno/src/services/api.js.
+# Regresan None cuando el municipio o cultivo no existe. Las respuestas por
+# municipio se guardan en el cache de resultados (calculos.cache_resultados).
+
+# Etiquetas del porcentaje de aptitud respecto al máximo nacional
+NIVELES_APTITUD = [(0.75, "Muy Alto"), (0.5, "Alto"), (0.25, "Medio"), (0.0, "Bajo")]
+
+# Etiquetas de la similitud de cada componente en la comparación
+NIVELES_SIMILITUD = [
+    (0.85, "Muy similar"),
+    (0.6, "Similar"),
+    (0.35, "Diferencia moderada"),
+    (0.0, "Diferente"),
+]
+
+
+def etiqueta(valor, niveles):
+    for minimo, texto in niveles:
+        if valor >= minimo:
+            return texto
+    return niveles[-1][1]
+
+
+def porcentaje(valor):
+    return round(float(valor) * 100, 2)
+
+
+@cache_datos
+def obtener_nombres_estados():
+    """
+    Diccionario clave de estado (int) -> NOM_ENT.
+    """
+    tabla = cargar_tabla("tabla_municipios")
+    estados = tabla.drop_duplicates("CVE_ENT")
+    return dict(zip(estados["CVE_ENT"].astype(int), estados["NOM_ENT"]))
+
+
+@cache_datos
+def obtener_produccion_anual():
+    """
+    Producción (Volumenproduccion) del cierre agrícola sumada por municipio
+    y año: DataFrame CVEGEO × Anio.
+    """
+    return agregado(["Anio", "CVEGEO"])["Volumenproduccion"].unstack("Anio")
+
+
+def precargar(informar=None):
+    """
+    Carga las tablas y construye las estructuras que usan las respuestas,
+    para que la primera consulta no pague la lectura de datos.
+    Las tablas cuyo archivo no existe se omiten.
+    """
+    pasos = {
+        "municipios": obtener_nombres_municipios,
+        "modelo de similitud": obtener_arreglos_modelo,
+        "matriz de similitud": cargar_matriz,
+        "sequía": obtener_sequia_anual,
+        "catálogo de cultivos": obtener_nombres_cultivos,
+        "cultivos por municipio": obtener_matriz_cultivos,
+        "aptitud AEZ": obtener_indice_aptitud,
+        "perfiles de cultivos": obtener_perfiles_cultivos,
+        "cubo de producción": obtener_cubo,
+        "producción anual": obtener_produccion_anual,
+        "índice espacial": obtener_indice_espacial,
+        "geometrías por zoom": lambda: ruta_geometria(0),
+    }
+    for nombre, funcion in pasos.items():
+        try:
+            funcion()
+        except FileNotFoundError as e:
+            if informar is not None:
+                informar(f"{nombre}: sin datos ({e.filename})")
+            continue
+        if informar is not None:
+            informar(f"{nombre}: listo")
+
+
+# GET /municipios
+def lista_municipios():
+    nombres = obtener_nombres_municipios().sort_values(["NOM_ENT", "NOMGEO"])
+    return [
+        {"nombre_ent": ent, "cvegeo": cve, "nomgeo": nom}
+        for cve, ent, nom in zip(nombres.index, nombres["NOM_ENT"], nombres["NOMGEO"])
+    ]
+
+
+def _perfil(cvegeo):
+    nombres = obtener_nombres_municipios()
+    if cvegeo not in nombres.index:
+        return {"estado": "", "municipio": "", "cvegeo": cvegeo}
+    fila = nombres.loc[cvegeo]
+    return {"estado": fila["NOM_ENT"], "municipio": fila["NOMGEO"], "cvegeo": cvegeo}
+
+
+def _cultivos_potenciales(cvegeo, top_n=5):
+    mejores = recomendar_mejores_cultivos(cvegeo, top_n)
+    if mejores.empty:
+        return []
+    maximo = np.nanmax(obtener_indice_aptitud()["aptitud"])
+    return [
+        {
+            "cultivo": nombre,
+            "puntaje": round(float(aptitud), 2),
+            "indice": etiqueta(aptitud / maximo if maximo else 0, NIVELES_APTITUD),
+        }
+        for nombre, aptitud in zip(mejores["NombreCultivo"], mejores["APTITUD"])
+    ]
+
+
+# GET /municipio/{cvegeo}/similar
+@cache_resultado
+def municipio_similar(cvegeo, k=10):
+    """
+    Los k municipios más similares, los cultivos de la base que también
+    siembran esos municipios, los cultivos con mejor aptitud AEZ y todos los
+    cultivos de la base.
+    """
+    cvegeo = normalizar_cvegeo(cvegeo)
+    similitudes = municipios_mas_similares(cvegeo, k)
+    if similitudes is None:
+        return None
+
+    similares = [
+        {**_perfil(cve), "similitud": porcentaje(valor)}
+        for cve, valor in similitudes.items()
+    ]
+    comunes = fila_cultivos(cvegeo) & filas_cultivos(list(similitudes.index)).any(axis=0)
+
+    return {
+        "municipios_mas_similares": similares,
+        "cultivos_similares": ids_a_nombres(ids_de_fila(comunes)),
+        "cultivos_potenciales": _cultivos_potenciales(cvegeo),
+        "perfil_municipio": _perfil(cvegeo),
+        "todos_los_cultivos": obtener_cultivos(cvegeo),
+    }
+
+
+# GET /municipio/{cvegeo}/cercanos?radio_km=...&k=...
+@cache_resultado
+def municipios_cercanos(cvegeo, radio_km=100, k=10):
+    """
+    Los k municipios más similares entre los que están a menos de radio_km
+    (distancia entre centroides).
+    """
+    cvegeo = normalizar_cvegeo(cvegeo)
+    tabla = similares_en_radio(cvegeo, radio_km, k)
+    if tabla is None:
+        return None
+
+    return {
+        "perfil_municipio": _perfil(cvegeo),
+        "radio_km": radio_km,
+        "municipios_cercanos": [
+            {**_perfil(cve), "similitud": porcentaje(similitud), "distancia_km": round(float(distancia), 1)}
+            for cve, similitud, distancia in zip(tabla.index, tabla["Similitud"], tabla["distancia_km"])
+        ],
+    }
+
+
+# GET /punto?lat=...&lon=...
+def municipio_de_punto(lat, lon):
+    cvegeo = municipio_en_punto(lat, lon)
+    return None if cvegeo is None else _perfil(cvegeo)
+
+
+# GET /geometrias?zoom=...&formato=...
+def archivo_geometrias(zoom, formato="topojson"):
+    """
+    Ruta del TopoJSON/GeoJSON simplificado para el zoom (ver data.geometrias).
+    """
+    if formato not in ("topojson", "geojson"):
+        return None
+    return ruta_geometria(zoom, formato)
+
+
+# GET /capas/{nombre}?zoom=...
+def archivo_capa_mapa(nombre, zoom=6):
+    """
+    Ruta del GeoJSON de la capa ya coloreada (ver data.capas).
+    """
+    if nombre not in CAPAS:
+        return None
+    return archivo_capa(nombre, zoom)
+
+
+# GET /municipio/{cvegeo}/comparacion?base=...
+@cache_resultado
+def detalle_comparacion(base, cvegeo):
+    """
+    Similitud de cada componente del modelo entre 'base' y 'cvegeo', con el
+    formato del modal de comparación (ModalCentro.jsx).
+    """
+    base = normalizar_cvegeo(base)
+    cvegeo = normalizar_cvegeo(cvegeo)
+    desglose = desglose_similitud(base, [cvegeo])
+    if desglose is None or desglose.empty:
+        return None
+    valores = desglose.iloc[0].to_dict()
+
+    def texto(nombre):
+        return f"{etiqueta(valores[nombre], NIVELES_SIMILITUD)} ({porcentaje(valores[nombre]):.0f}%)"
+
+    return {
+        "estado_base": _perfil(base)["estado"],
+        "estado_similar": _perfil(cvegeo)["estado"],
+        "precipitacion": texto("precipitacion"),
+        "temperatura": texto("temperatura"),
+        "unidad_climatica": texto("unidad_climatica"),
+        "edafologia": texto("edafologia"),
+        "topoforma": texto("topoforma"),
+        "total_similitud": porcentaje(valores["Similitud"]),
+        "cultivos_en_comun": cultivos_similares(base, cvegeo),
+    }
+
+
+def _valor(valor):
+    # valores de características (numpy/pandas) a JSON
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def _similitud_cultivos(fila):
+    # partes de la similitud combinada (modo "cultivos")
+    if "similitud_combinada" not in fila:
+        return {}
+    return {
+        "similitud_cultivos": None if np.isnan(fila["similitud_cultivos"]) else porcentaje(fila["similitud_cultivos"]),
+        "similitud_aptitud": None if np.isnan(fila["similitud_aptitud"]) else porcentaje(fila["similitud_aptitud"]),
+        "similitud_combinada": porcentaje(fila["similitud_combinada"]),
+    }
+
+
+# GET /municipio/{cvegeo}/detalle?k=...&modo=...
+@cache_resultado
+def detalle_similares_municipio(cvegeo, k=10, modo="ambiente"):
+    """
+    El detalle de la comparación con cada uno de los k municipios más
+    similares (una sola llamada a detalle_similares()): similitud y valores
+    de cada componente y cultivos en común y faltantes. Con modo
+    "cultivos" el ranking es el de similitud ambiental y de cultivos
+    (la ruta valida modo y k).
+    """
+    cvegeo = normalizar_cvegeo(cvegeo)
+    tabla = detalle_similares(cvegeo, k, modo)
+    if tabla is None:
+        return None
+
+    return {
+        "perfil_municipio": _perfil(cvegeo),
+        "similares": [
+            {
+                **_perfil(cve),
+                "similitud": porcentaje(fila["Similitud"]),
+                **_similitud_cultivos(fila),
+                "componentes": {
+                    componente["nombre"]: {
+                        "base": _valor(fila[f"{componente['nombre']}_base"]),
+                        "similar": _valor(fila[f"{componente['nombre']}_otro"]),
+                        "similitud": porcentaje(fila[componente["nombre"]]),
+                        "entra_en_promedio": bool(componente["peso"]),
+                    }
+                    for componente in ESPECIFICACION_DETALLE
+                },
+                "cultivos_en_comun": fila["cultivos_comunes"],
+                "cultivos_faltantes": fila["cultivos_faltantes"],
+            }
+            for cve, fila in zip(tabla.index, tabla.to_dict("records"))
+        ],
+    }
+
+
+# GET /municipio/{cvegeo}/sequia
+def historial_sequia(cvegeo):
+    niveles = sequia_anual([cvegeo])
+    if niveles.empty:
+        return None
+    fila = niveles.iloc[0].dropna()
+    return [{"anio": int(anio), "valor": int(valor)} for anio, valor in fila.items()]
+
+
+# GET /municipio/{cvegeo}/produccion_anual
+def produccion_anual(cvegeo):
+    produccion = obtener_produccion_anual()
+    cvegeo = normalizar_cvegeo(cvegeo)
+    if cvegeo not in produccion.index:
+        return None
+    fila = produccion.loc[cvegeo].dropna()
+    return [{"anio": int(anio), "produccion": float(valor)} for anio, valor in fila.items()]
+
+
+# GET /cultivos/{id}/municipios
+def municipios_productores(idcultivo, top_n=10):
+    """
+    Los top_n municipios con mayor producción del cultivo en el año más
+    reciente que tiene registros de ese cultivo.
+    """
+    totales = principales_municipios(idcultivo, medida="Volumenproduccion", top_n=top_n)
+    if totales is None:
+        return None
+    totales = totales["Volumenproduccion"]
+    return [
+        {"cvegeo": cve, "nombre": _perfil(cve)["municipio"], "produccion_ton": float(valor)}
+        for cve, valor in totales.items()
+    ]
+
+
+# GET /top10_productores
+def top10_productores(top_n=10):
+    """
+    Los top_n pares (estado, cultivo) con mayor producción (toneladas) en
+    el año más reciente del cierre agrícola.
+    """
+    anio = ultimo_anio()
+    if anio is None:
+        return []
+    totales = agregado(["Idestado", "Idcultivo"], Anio=anio)["Volumenproduccion"].nlargest(top_n)
+    estados = obtener_nombres_estados()
+    nombres_cultivos = obtener_nombres_cultivos()
+    return [
+        {
+            "estado": estados.get(int(estado), str(estado)),
+            "cultivo": nombres_cultivos.get(cultivo, str(cultivo)),
+            "produccion_ton": float(valor),
+        }
+        for (estado, cultivo), valor in totales.items()
+    ]
@@ -0,0 +1,170 @@
+#comando para correr la API: python -m api.servidor   (o: uvicorn api.servidor:app --port 5000)
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import APIRouter, FastAPI, HTTPException, Query
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
+from api import respuestas
+from calculos.cache_resultados import MODOS_SIMILITUD, estadisticas_cache_resultados
+from data.instrumentacion import exportar_prometheus, solicitud
+
+# API JSON para el frontend de React (front_bueno). Los datos se cargan una
+# vez al arrancar y quedan en memoria; los cálculos corren en un pool de hilos
+# para no bloquear el loop mientras se atienden otras peticiones.
+
+# Hilos del pool de cálculo
+TRABAJADORES = int(os.environ.get("AGRO_API_TRABAJADORES", os.cpu_count() or 4))
+
+# Segundos máximos por petición (el frontend corta a los 4 s)
+TIEMPO_MAXIMO = float(os.environ.get("AGRO_API_TIEMPO_MAXIMO", 3.5))
+
+# Orígenes del frontend en desarrollo (Vite)
+ORIGENES = os.environ.get(
+    "AGRO_API_ORIGENES", "http://localhost:5173,http://127.0.0.1:5173"
+).split(",")
+
+# Máximo de municipios similares por consulta de detalle
+MAX_SIMILARES_DETALLE = 50
+
+_pool = ThreadPoolExecutor(max_workers=TRABAJADORES, thread_name_prefix="agro-api")
+
+
+def _en_solicitud(funcion, *args):
+    # la solicitud se abre en el hilo del pool, donde corre el cálculo
+    # (y donde cProfile puede verlo)
+    with solicitud(f"{funcion.__name__}({', '.join(map(str, args))})"):
+        return funcion(*args)
+
+
+async def ejecutar(funcion, *args):
+    """
+    Corre funcion(*args) en el pool y regresa su resultado.
+    Responde 404 si regresa None, 503 si faltan archivos de datos
+    y 504 si tarda más de TIEMPO_MAXIMO.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        resultado = await asyncio.wait_for(
+            loop.run_in_executor(_pool, _en_solicitud, funcion, *args), TIEMPO_MAXIMO
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(504, "La consulta tardó demasiado")
+    except FileNotFoundError as e:
+        raise HTTPException(503, f"Datos no disponibles: {e.filename}")
+
+    if resultado is None:
+        raise HTTPException(404, "Sin datos para la consulta")
+    return resultado
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        _pool, respuestas.precargar, lambda texto: print(texto, file=sys.stderr)
+    )
+    yield
+    _pool.shutdown(wait=False, cancel_futures=True)
+
+
+rutas = APIRouter(prefix="/api")
+
+
+@rutas.get("/municipios")
+async def municipios():
+    return await ejecutar(respuestas.lista_municipios)
+
+
+@rutas.get("/municipio/{cvegeo}/similar")
+async def municipio_similar(cvegeo: str, k: int = 10):
+    return await ejecutar(respuestas.municipio_similar, cvegeo, k)
+
+
+@rutas.get("/municipio/{cvegeo}/cercanos")
+async def municipios_cercanos(cvegeo: str, radio_km: float = 100, k: int = 10):
+    return await ejecutar(respuestas.municipios_cercanos, cvegeo, radio_km, k)
+
+
+@rutas.get("/punto")
+async def municipio_de_punto(lat: float, lon: float):
+    return await ejecutar(respuestas.municipio_de_punto, lat, lon)
+
+
+@rutas.get("/geometrias")
+async def geometrias(zoom: int = 6, formato: str = "topojson"):
+    # archivo ya simplificado y guardado; se manda tal cual
+    ruta = await ejecutar(respuestas.archivo_geometrias, zoom, formato)
+    return FileResponse(ruta, media_type="application/json")
+
+
+@rutas.get("/capas/{nombre}")
+async def capa_mapa(nombre: str, zoom: int = 6):
+    ruta = await ejecutar(respuestas.archivo_capa_mapa, nombre, zoom)
+    return FileResponse(ruta, media_type="application/geo+json")
+
+
+@rutas.get("/municipio/{cvegeo}/comparacion")
+async def comparacion(cvegeo: str, base: str):
+    return await ejecutar(respuestas.detalle_comparacion, base, cvegeo)
+
+
+@rutas.get("/municipio/{cvegeo}/detalle")
+async def detalle_similares(
+    cvegeo: str,
+    k: int = Query(10, ge=1, le=MAX_SIMILARES_DETALLE),
+    modo: Literal[MODOS_SIMILITUD] = "ambiente",
+):
+    return await ejecutar(respuestas.detalle_similares_municipio, cvegeo, k, modo)
+
+
+@rutas.get("/municipio/{cvegeo}/sequia")
+async def sequia(cvegeo: str):
+    return await ejecutar(respuestas.historial_sequia, cvegeo)
+
+
+@rutas.get("/municipio/{cvegeo}/produccion_anual")
+async def produccion_anual(cvegeo: str):
+    return await ejecutar(respuestas.produccion_anual, cvegeo)
+
+
+@rutas.get("/cultivos/{idcultivo}/municipios")
+async def municipios_productores(idcultivo: int, top_n: int = 10):
+    return await ejecutar(respuestas.municipios_productores, idcultivo, top_n)
+
+
+@rutas.get("/top10_productores")
+async def top10_productores():
+    return await ejecutar(respuestas.top10_productores)
+
+
+@rutas.get("/estado_cache")
+async def estado_cache():
+    return estadisticas_cache_resultados()
+
+
+@rutas.get("/metricas", response_class=PlainTextResponse)
+async def metricas():
+    # vacío si no se activó AGRO_INSTRUMENTAR
+    return exportar_prometheus()
+
+
+app = FastAPI(title="AgroAnalytics API", lifespan=ciclo_de_vida)
+app.add_middleware(CORSMiddleware, allow_origins=ORIGENES, allow_methods=["GET"])
+app.include_router(rutas)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API JSON de AgroAnalytics.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=5000)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.puerto)
@@ -9,6 +9,7 @@ from frontend.pantallas.inicio import pantalla_inicio
 from frontend.pantallas.municipios import pantalla_municipios
 from frontend.pantallas.cultivos import pantalla_cultivos
 from frontend.pantallas.cultivo_detalles import pantalla_cultivo_detalles
+from data.instrumentacion import solicitud
 
 aplicar_estilos()
 
@@ -16,12 +17,14 @@ pagina = st.sidebar.radio(
     "Navegación:",
     ["Inicio", "Buscador de municipios", "Cultivos"]
 )
-if pagina == "Inicio":
-    st.title("Bienvenido a AgroAnalytics")
-    pantalla_inicio()
-elif pagina == "Buscador de municipios":
-    st.title("Buscador de municipios")
-    pantalla_municipios()
-elif pagina == "Cultivos":
-    st.title("Análisis de cultivos")
-    pantalla_cultivos()
\ No newline at end of file
+# cada ejecución del script es una solicitud (métricas con AGRO_INSTRUMENTAR)
+with solicitud(f"streamlit:{pagina}"):
+    if pagina == "Inicio":
+        st.title("Bienvenido a AgroAnalytics")
+        pantalla_inicio()
+    elif pagina == "Buscador de municipios":
+        st.title("Buscador de municipios")
+        pantalla_municipios()
+    elif pagina == "Cultivos":
+        st.title("Análisis de cultivos")
+        pantalla_cultivos()
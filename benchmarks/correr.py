@@ -0,0 +1,375 @@
+#comando para correr los benchmarks: python -m benchmarks.correr --escala 1 10 100
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from benchmarks.datos_sinteticos import RAIZ, generar_datos
+
+# Benchmarks del modelo de similitud, la carga de datos y las consultas de
+# cultivos y sequía. Cada escala corre en un proceso aparte con los datos en
+# su propia carpeta (las rutas de data/ son relativas al directorio actual),
+# así ninguna corrida aprovecha los caches de otra.
+#
+# El resultado es un JSON con los datos de la máquina y una lista de
+# mediciones {"prueba", "medida", "valor", "unidad"} por escala, que se puede
+# comparar contra otra corrida con --comparar.
+
+CARPETA_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+CARPETA_SINTETICOS = os.path.join(tempfile.gettempdir(), "agroanalytics_benchmarks")
+
+# Municipios de muestra por prueba y filas máximas del top-k de todos contra
+# todos (con más municipios se mide una parte y se extrapola)
+MUESTRA = 50
+MAX_FILAS_TOP_K = 2048
+
+# Elementos por bloque al calcular similitudes (bloque × N)
+ELEMENTOS_POR_BLOQUE = 5_000_000
+
+
+def _medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def _latencias(prueba, medida, segundos):
+    ms = 1000 * np.asarray(segundos)
+    return [
+        {"prueba": prueba, "medida": f"{medida}_media", "valor": float(ms.mean()), "unidad": "ms"},
+        {"prueba": prueba, "medida": f"{medida}_p50", "valor": float(np.percentile(ms, 50)), "unidad": "ms"},
+        {"prueba": prueba, "medida": f"{medida}_p95", "valor": float(np.percentile(ms, 95)), "unidad": "ms"},
+    ]
+
+
+def medir_importacion(raiz, repeticiones=5):
+    """
+    Importación en frío de data.acceso_data, en procesos nuevos.
+    """
+    codigo = (
+        "import time; inicio = time.perf_counter(); import data.acceso_data; "
+        "print(time.perf_counter() - inicio)"
+    )
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", codigo], cwd=raiz, env=_entorno(),
+            capture_output=True, text=True, check=True,
+        )
+        tiempos.append(float(salida.stdout.strip()))
+    return _latencias("importacion_fria", "data.acceso_data", tiempos)
+
+
+def prueba_carga():
+    from data.acceso_data import obtener_arreglos_modelo
+
+    segundos, c = _medir(obtener_arreglos_modelo)
+    return [
+        {"prueba": "carga", "medida": "arreglos_modelo_primera_vez", "valor": segundos, "unidad": "s"},
+        {"prueba": "carga", "medida": "municipios_modelo", "valor": len(c["cvegeo"]), "unidad": "municipios"},
+    ]
+
+
+def prueba_uno_contra_todos(muestra):
+    from data.acceso_data import obtener_arreglos_modelo
+    from calculos.modelo import comparar_municipio_contra_todos
+
+    cvegeo = obtener_arreglos_modelo()["cvegeo"][muestra]
+    frio = [_medir(comparar_municipio_contra_todos, cve)[0] for cve in cvegeo]
+    caliente = [_medir(comparar_municipio_contra_todos, cve)[0] for cve in cvegeo]
+    return (
+        _latencias("uno_contra_todos", "cache_frio", frio)
+        + _latencias("uno_contra_todos", "cache_caliente", caliente)
+    )
+
+
+def prueba_todos_top_k(k=10, max_filas=MAX_FILAS_TOP_K):
+    from data.acceso_data import obtener_arreglos_modelo
+    from calculos.vecinos import vecinos_por_bloques
+
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    tam_bloque = int(np.clip(ELEMENTOS_POR_BLOQUE // n, 1, 256))
+    bloques = -(-min(n, max_filas) // tam_bloque)
+
+    inicio = time.perf_counter()
+    filas = sum(
+        bloque["CVEGEO"].nunique()
+        for bloque in itertools.islice(vecinos_por_bloques(k, tam_bloque), bloques)
+    )
+    segundos = time.perf_counter() - inicio
+    return [
+        {"prueba": "todos_top_k", "medida": "municipios_medidos", "valor": filas, "unidad": "municipios"},
+        {"prueba": "todos_top_k", "medida": "municipios_por_segundo", "valor": filas / segundos, "unidad": "mun/s"},
+        {"prueba": "todos_top_k", "medida": "total_estimado", "valor": n * segundos / filas, "unidad": "s"},
+    ]
+
+
+def prueba_cultivos(muestra):
+    from calculos.aez_comp import (
+        comparar_cultivos_en_bloque,
+        cultivos_frecuentes_faltantes,
+        obtener_cultivos,
+        obtener_matriz_cultivos,
+    )
+
+    segundos, m = _medir(obtener_matriz_cultivos)
+    cvegeo = m["cvegeo"][muestra % len(m["cvegeo"])]
+    otros = [list(np.roll(m["cvegeo"], -int(i))[1:11]) for i in muestra % len(m["cvegeo"])]
+
+    return (
+        [{"prueba": "cultivos", "medida": "matriz_primera_vez", "valor": segundos, "unidad": "s"}]
+        + _latencias("cultivos", "obtener_cultivos", [_medir(obtener_cultivos, cve)[0] for cve in cvegeo])
+        + _latencias("cultivos", "comparar_en_bloque_10", [
+            _medir(comparar_cultivos_en_bloque, cve, o)[0] for cve, o in zip(cvegeo, otros)
+        ])
+        + _latencias("cultivos", "frecuentes_faltantes_10", [
+            _medir(cultivos_frecuentes_faltantes, cve, o)[0] for cve, o in zip(cvegeo, otros)
+        ])
+    )
+
+
+def prueba_similitud_cultivos(muestra):
+    from data.acceso_data import obtener_arreglos_modelo
+    from calculos.similitud_cultivos import municipios_similares_con_cultivos, obtener_perfiles_cultivos
+
+    segundos, _ = _medir(obtener_perfiles_cultivos)
+    cvegeo = obtener_arreglos_modelo()["cvegeo"][muestra]
+    return (
+        [{"prueba": "similitud_cultivos", "medida": "perfiles_primera_vez", "valor": segundos, "unidad": "s"}]
+        + _latencias("similitud_cultivos", "top10_jaccard", [
+            _medir(municipios_similares_con_cultivos, cve)[0] for cve in cvegeo
+        ])
+        + _latencias("similitud_cultivos", "top10_coseno", [
+            _medir(lambda cve: municipios_similares_con_cultivos(cve, medida="coseno"), cve)[0] for cve in cvegeo
+        ])
+    )
+
+
+def prueba_sequia(muestra):
+    from data.sequia import obtener_sequia_anual, sequia_anual
+
+    segundos, s = _medir(obtener_sequia_anual)
+    cvegeo = s["cvegeo"]
+    grupos = [list(np.roll(cvegeo, -int(i))[:11]) for i in muestra % len(cvegeo)]
+    return (
+        [{"prueba": "sequia", "medida": "agregado_anual_primera_vez", "valor": segundos, "unidad": "s"}]
+        + _latencias("sequia", "sequia_anual_11", [_medir(sequia_anual, g)[0] for g in grupos])
+    )
+
+
+def prueba_paralelo(max_filas=MAX_FILAS_TOP_K):
+    from calculos.paralelo import medir_escalabilidad
+
+    cpus = os.cpu_count() or 1
+    trabajadores = sorted({2 ** p for p in range(cpus.bit_length()) if 2 ** p <= cpus} | {cpus})
+    resultados = []
+    for r in medir_escalabilidad(trabajadores, max_filas):
+        if r["trabajadores"] == 0:
+            resultados.append({"prueba": "paralelo", "medida": "sin_pool", "valor": r["segundos"], "unidad": "s"})
+            continue
+        t = r["trabajadores"]
+        resultados += [
+            {"prueba": "paralelo", "medida": f"trabajadores_{t}", "valor": r["segundos"], "unidad": "s"},
+            {"prueba": "paralelo", "medida": f"aceleracion_{t}", "valor": r["aceleracion"], "unidad": "x"},
+            {"prueba": "paralelo", "medida": f"eficiencia_{t}", "valor": r["eficiencia"], "unidad": "fraccion"},
+        ]
+    return resultados
+
+
+def prueba_cubo():
+    from data.acceso_data import cargar_tabla
+    from calculos.cubo_produccion import (
+        construir_cubo,
+        obtener_cubo,
+        principales_cultivos,
+        principales_municipios,
+        superficie_anual,
+    )
+
+    df = cargar_tabla("tabla_cierre_agricola")
+    construir = _medir(construir_cubo, df)[0]
+    obtener_cubo()
+    cultivos = list(principales_cultivos().index)
+    vistas = [lambda: principales_cultivos(), lambda: superficie_anual(10)]
+    vistas += [lambda c=c: principales_municipios(c) for c in cultivos]
+    return (
+        [{"prueba": "cubo", "medida": "construir", "valor": construir, "unidad": "s"}]
+        + _latencias("cubo", "vista_inicio", [_medir(vista)[0] for vista in vistas])
+    )
+
+
+def prueba_capas():
+    from data.capas import CAPAS, construir_capa, obtener_capa, texto_capa
+    from data.geometrias import cargar_geometria, construir_geometrias
+
+    resultados = [
+        {"prueba": "capas", "medida": "geometrias_construir", "valor": _medir(construir_geometrias)[0], "unidad": "s"},
+        {"prueba": "capas", "medida": "geometrias_leer", "valor": _medir(cargar_geometria, 6, "geojson")[0], "unidad": "s"},
+    ]
+    try:
+        from frontend.componentes.mapas.mapa import mapa_capa
+    except ImportError:
+        mapa_capa = None
+
+    for nombre in CAPAS:
+        unir, capa = _medir(construir_capa, nombre)
+        serializar, texto = _medir(lambda: json.dumps(capa, ensure_ascii=False, separators=(",", ":")))
+        texto_capa(nombre)
+        resultados += [
+            {"prueba": "capas", "medida": f"{nombre}_unir_y_colorear", "valor": unir, "unidad": "s"},
+            {"prueba": "capas", "medida": f"{nombre}_serializar", "valor": serializar, "unidad": "s"},
+            {"prueba": "capas", "medida": f"{nombre}_tamano", "valor": len(texto) / 2**20, "unidad": "MB"},
+            {"prueba": "capas", "medida": f"{nombre}_desde_cache", "valor": _medir(obtener_capa, nombre)[0], "unidad": "s"},
+        ]
+        if mapa_capa is not None:
+            render = _medir(lambda: mapa_capa(nombre).get_root().render())[0]
+            resultados.append({"prueba": "capas", "medida": f"{nombre}_render_folium", "valor": render, "unidad": "s"})
+    return resultados
+
+
+PRUEBAS = {
+    "carga": lambda muestra: prueba_carga(),
+    "uno_contra_todos": prueba_uno_contra_todos,
+    "todos_top_k": lambda muestra: prueba_todos_top_k(),
+    "paralelo": lambda muestra: prueba_paralelo(),
+    "cultivos": prueba_cultivos,
+    "similitud_cultivos": prueba_similitud_cultivos,
+    "sequia": prueba_sequia,
+    "cubo": lambda muestra: prueba_cubo(),
+    "capas": lambda muestra: prueba_capas(),
+}
+
+
+def correr_pruebas(nombres, tam_muestra=MUESTRA, semilla=0):
+    """
+    Corre las pruebas en el proceso actual (con los datos del directorio
+    actual). Las que no tienen sus archivos de datos se marcan como omitidas.
+    """
+    from data.acceso_data import obtener_arreglos_modelo
+
+    resultados = []
+    for nombre in nombres:
+        try:
+            # la carga va primero; las demás parten de los arreglos ya listos
+            n = len(obtener_arreglos_modelo()["cvegeo"]) if nombre != "carga" else 1
+            muestra = np.random.default_rng(semilla).choice(n, size=min(tam_muestra, n), replace=False)
+            resultados += PRUEBAS[nombre](muestra)
+        except FileNotFoundError as e:
+            resultados.append({"prueba": nombre, "medida": "omitida", "valor": None, "unidad": f"falta {e.filename}"})
+    return resultados
+
+
+def _entorno():
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [RAIZ, entorno.get("PYTHONPATH")]))
+    return entorno
+
+
+def correr_escala(raiz, nombres, tam_muestra):
+    """
+    Corre las pruebas en un proceso nuevo con 'raiz' como directorio actual.
+    """
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.correr", "--hijo", "--pruebas", *nombres,
+         "--muestra", str(tam_muestra)],
+        cwd=raiz, env=_entorno(), capture_output=True, text=True,
+    )
+    if salida.returncode != 0:
+        raise RuntimeError(f"Falló el benchmark en {raiz}:\n{salida.stderr}")
+    resultados = json.loads(salida.stdout)
+    if "importacion_fria" in nombres:
+        resultados = medir_importacion(raiz) + resultados
+    return resultados
+
+
+def descripcion_maquina():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(ruta_base, ruta_nueva):
+    """
+    Tabla con cada medición de las dos corridas y la razón nueva / base
+    (para tiempos, menos de 1 es mejor).
+    """
+    def aplanar(ruta):
+        with open(ruta) as f:
+            corrida = json.load(f)
+        return pd.DataFrame([
+            {"datos": escala["datos"], **r}
+            for escala in corrida["escalas"] for r in escala["resultados"]
+        ]).set_index(["datos", "prueba", "medida"])
+
+    base, nueva = aplanar(ruta_base), aplanar(ruta_nueva)
+    tabla = base[["valor", "unidad"]].join(nueva[["valor"]], rsuffix="_nuevo", how="outer")
+    tabla["razon"] = tabla["valor_nuevo"] / tabla["valor"]
+    return tabla
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de AgroAnalytics.")
+    parser.add_argument("--escala", type=int, nargs="*", default=[],
+                        help="escalas de datos sintéticos (p. ej. 1 10 100); sin escalas usa data/")
+    parser.add_argument("--pruebas", nargs="+", default=["importacion_fria", *PRUEBAS],
+                        choices=["importacion_fria", *PRUEBAS])
+    parser.add_argument("--muestra", type=int, default=MUESTRA, help="municipios de muestra por prueba")
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="compara dos corridas")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        nombres = [nombre for nombre in args.pruebas if nombre in PRUEBAS]
+        print(json.dumps(correr_pruebas(nombres, args.muestra)))
+        sys.exit()
+
+    if args.comparar:
+        with pd.option_context("display.width", 160, "display.max_rows", None, "display.max_columns", None):
+            print(comparar(*args.comparar))
+        sys.exit()
+
+    escalas = []
+    for escala in args.escala or [None]:
+        if escala is None:
+            raiz, datos = RAIZ, "reales"
+        else:
+            print(f"Generando datos sintéticos ×{escala}...", file=sys.stderr)
+            raiz = generar_datos(os.path.join(CARPETA_SINTETICOS, f"x{escala}"), escala)
+            datos = f"sinteticos_x{escala}"
+
+        print(f"Corriendo benchmarks ({datos})...", file=sys.stderr)
+        resultados = correr_escala(raiz, args.pruebas, args.muestra)
+        escalas.append({"datos": datos, "escala": escala, "resultados": resultados})
+
+        for r in resultados:
+            valor = "—" if r["valor"] is None else f"{r['valor']:.4g}"
+            print(f"  {r['prueba']:<18} {r['medida']:<32} {valor:>10} {r['unidad']}", file=sys.stderr)
+
+    salida = args.salida or os.path.join(
+        CARPETA_RESULTADOS, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w") as f:
+        json.dump({"maquina": descripcion_maquina(), "escalas": escalas}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {salida}")
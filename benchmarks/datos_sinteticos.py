@@ -0,0 +1,220 @@
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Datos sintéticos para los benchmarks: las tablas por municipio de data/
+# replicadas 'escala' veces (cada copia con CVEGEO distintos) y un cierre
+# agrícola y una tabla AEZ generados al azar, con las mismas columnas que
+# los archivos reales. Se escriben en <destino>/data/ con los nombres de
+# data.acceso_data.ARCHIVOS. Hasta MAX_ESCALA_GEOMETRIAS también se escribe
+# un shapefile con una retícula de municipios (data.geometrias).
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TABLAS_REPLICADAS = {
+    "mun_edafologia.csv",
+    "mun_sist_topoformas.csv",
+    "mun_precip_media_anual.csv",
+    "mun_temp_media_anual.csv",
+    "mun_unidades_climaticas_final.csv",
+    "tabla_municipios.parquet",
+    "Sequia_mensual.parquet",
+}
+
+# Tamaño del cierre agrícola y de la tabla AEZ sintéticos
+CULTIVOS_POR_MUNICIPIO = 6
+ANIOS_CIERRE = (2022, 2023)
+CULTIVOS_AEZ_POR_MUNICIPIO = 20
+
+# Escala máxima con shapefile sintético y vértices por lado de cada municipio
+MAX_ESCALA_GEOMETRIAS = 10
+VERTICES_POR_LADO = 60
+CAJA_MEXICO = (-117.0, 14.5, -86.7, 32.7)
+
+
+def replicar(df, escala):
+    """
+    Concatena 'escala' copias de la tabla. La primera conserva sus CVEGEO;
+    la copia k antepone k al CVEGEO de 5 dígitos ("01001" -> "301001").
+    """
+    cvegeo = df["CVEGEO"].astype(str).str.zfill(5)
+    copias = []
+    for k in range(escala):
+        copia = df.copy()
+        copia["CVEGEO"] = cvegeo if k == 0 else f"{k}" + cvegeo
+        copias.append(copia)
+    return pd.concat(copias, ignore_index=True)
+
+
+def leer(nombre):
+    ruta = os.path.join(RAIZ, "data", nombre)
+    return pd.read_parquet(ruta) if nombre.endswith(".parquet") else pd.read_csv(ruta)
+
+
+def escribir(df, destino, nombre):
+    ruta = os.path.join(destino, "data", nombre)
+    if nombre.endswith(".parquet"):
+        df.to_parquet(ruta, index=False)
+    else:
+        df.to_csv(ruta, index=False)
+
+
+def cierre_sintetico(municipios, catalogo, rng):
+    """
+    Cierre agrícola al azar: CULTIVOS_POR_MUNICIPIO cultivos por municipio
+    (los más comunes con más probabilidad) en cada año de ANIOS_CIERRE.
+    """
+    cultivos = catalogo["Idcultivo"].unique()
+    probabilidad = 1.0 / np.arange(1, len(cultivos) + 1)
+    probabilidad /= probabilidad.sum()
+
+    cvegeo = municipios["CVEGEO"].astype(str).to_numpy()
+    n = len(cvegeo) * CULTIVOS_POR_MUNICIPIO
+    partes = []
+    for anio in ANIOS_CIERRE:
+        mun = np.repeat(cvegeo, CULTIVOS_POR_MUNICIPIO)
+        sembrada = rng.gamma(2.0, 150.0, n)
+        cosechada = sembrada * rng.uniform(0.6, 1.0, n)
+        volumen = cosechada * rng.gamma(2.0, 3.0, n)
+        partes.append(pd.DataFrame({
+            "Anio": anio,
+            "Idestado": [int(cve[-5:-3]) for cve in mun],
+            "CVEGEO": mun,
+            "Idmunicipio": [int(cve[-3:]) for cve in mun],
+            "Idcultivo": rng.choice(cultivos, n, p=probabilidad),
+            "Sembrada": sembrada,
+            "Cosechada": cosechada,
+            "Volumenproduccion": volumen,
+            "Valorproduccion": volumen * rng.gamma(2.0, 2500.0, n),
+        }))
+    return pd.concat(partes, ignore_index=True).drop_duplicates(["Anio", "CVEGEO", "Idcultivo"])
+
+
+def aez_sintetico(municipios, catalogo, rng):
+    """
+    Tabla AEZ al azar: CULTIVOS_AEZ_POR_MUNICIPIO cultivos por municipio
+    con APTITUD entre 0 y 100.
+    """
+    cultivos = catalogo["Idcultivo"].unique()[:4 * CULTIVOS_AEZ_POR_MUNICIPIO]
+    cvegeo = municipios["CVEGEO"].astype(str).to_numpy()
+    n = len(cvegeo) * CULTIVOS_AEZ_POR_MUNICIPIO
+    df = pd.DataFrame({
+        "CVEGEO": np.repeat(cvegeo, CULTIVOS_AEZ_POR_MUNICIPIO),
+        "CULTIVO": rng.choice(cultivos, n),
+        "APTITUD": np.round(rng.uniform(0, 100, n), 2),
+    })
+    return df.drop_duplicates(["CVEGEO", "CULTIVO"])
+
+
+def reticula_sintetica(n, rng, vertices=VERTICES_POR_LADO):
+    """
+    n polígonos (un anillo cerrado en sentido horario cada uno) en una
+    retícula sobre CAJA_MEXICO, con lados ondulados compartidos entre
+    vecinos, como las fronteras reales.
+    """
+    columnas = int(np.ceil(np.sqrt(n)))
+    filas = int(np.ceil(n / columnas))
+    x = np.linspace(CAJA_MEXICO[0], CAJA_MEXICO[2], columnas + 1)
+    y = np.linspace(CAJA_MEXICO[1], CAJA_MEXICO[3], filas + 1)
+    paso = min(x[1] - x[0], y[1] - y[0])
+    esquinas = np.stack(np.meshgrid(x, y, indexing="ij"), axis=-1)
+    esquinas[1:-1, 1:-1] += rng.normal(0, paso / 10, (columnas - 1, filas - 1, 2))
+
+    lados = {}
+
+    def lado(a, b):
+        if (b, a) in lados:
+            return lados[(b, a)][::-1]
+        if (a, b) not in lados:
+            p, q = esquinas[a], esquinas[b]
+            t = np.linspace(0, 1, vertices)[:, None]
+            normal = np.array([q[1] - p[1], p[0] - q[0]])
+            onda = np.sin(np.pi * t * rng.integers(1, 4)) * rng.normal(0, 0.05)
+            lados[(a, b)] = p + (q - p) * t + normal * onda
+        return lados[(a, b)]
+
+    anillos = []
+    for k in range(n):
+        i, j = divmod(k, filas)
+        esquina = [(i, j), (i, j + 1), (i + 1, j + 1), (i + 1, j)]
+        partes = [lado(esquina[m], esquina[(m + 1) % 4])[:-1] for m in range(4)]
+        anillos.append(np.concatenate(partes + [esquinas[esquina[0]][None]]))
+    return anillos
+
+
+def escribir_shapefile(base, anillos, atributos):
+    """
+    Escribe base.shp, base.dbf y base.cpg: un polígono de un anillo por
+    registro y las columnas de texto de 'atributos'.
+    """
+    registros = []
+    for k, anillo in enumerate(anillos):
+        contenido = (
+            struct.pack("<i4d", 5, *anillo.min(axis=0), *anillo.max(axis=0))
+            + struct.pack("<iii", 1, len(anillo), 0)
+            + anillo.astype("<f8").tobytes()
+        )
+        registros.append(struct.pack(">ii", k + 1, len(contenido) // 2) + contenido)
+    cuerpo = b"".join(registros)
+    todos = np.concatenate(anillos)
+    encabezado = (
+        struct.pack(">i20xi", 9994, (100 + len(cuerpo)) // 2)
+        + struct.pack("<ii4d32x", 1000, 5, *todos.min(axis=0), *todos.max(axis=0))
+    )
+    with open(base + ".shp", "wb") as f:
+        f.write(encabezado + cuerpo)
+
+    textos = {col: atributos[col].astype(str).str.encode("utf-8") for col in atributos.columns}
+    largos = {col: max(1, int(textos[col].str.len().max())) for col in textos}
+    dbf = struct.pack("<BBBBIHH20x", 3, 125, 1, 1, len(atributos), 33 + 32 * len(largos), 1 + sum(largos.values()))
+    for col, largo in largos.items():
+        dbf += col.encode("ascii").ljust(11, b"\0") + b"C" + bytes(4) + bytes([largo]) + bytes(15)
+    dbf += b"\r"
+    dbf += b"".join(
+        b" " + b"".join(valores[col].ljust(largos[col]) for col in largos)
+        for _, valores in pd.DataFrame(textos).iterrows()
+    )
+    with open(base + ".dbf", "wb") as f:
+        f.write(dbf + b"\x1a")
+    with open(base + ".cpg", "w") as f:
+        f.write("UTF-8")
+
+
+def generar_datos(destino, escala, semilla=0):
+    """
+    Escribe los datos sintéticos de la escala en <destino>/data/ y regresa
+    'destino'. Si ya existen para la misma escala y semilla, no hace nada.
+    """
+    marca = os.path.join(destino, "data", "sinteticos.json")
+    descripcion = {"escala": escala, "semilla": semilla}
+    if os.path.exists(marca):
+        with open(marca) as f:
+            if json.load(f) == descripcion:
+                return destino
+
+    os.makedirs(os.path.join(destino, "data"), exist_ok=True)
+    rng = np.random.default_rng(semilla)
+
+    for nombre in sorted(TABLAS_REPLICADAS):
+        escribir(replicar(leer(nombre), escala), destino, nombre)
+
+    catalogo = leer("catalogo_cultivos.csv")
+    escribir(catalogo, destino, "catalogo_cultivos.csv")
+
+    municipios = replicar(leer("tabla_municipios.parquet"), escala)
+    escribir(cierre_sintetico(municipios, catalogo, rng), destino, "final_cierreAgricola.csv")
+    escribir(aez_sintetico(municipios, catalogo, rng), destino, "aez_cultivos_municipios_final.csv")
+
+    if escala <= MAX_ESCALA_GEOMETRIAS:
+        from data.geometrias import RUTA_SHAPEFILE
+        base = os.path.join(destino, RUTA_SHAPEFILE)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        atributos = municipios.drop_duplicates("CVEGEO")[["CVEGEO", "NOMGEO", "NOM_ENT"]]
+        escribir_shapefile(base, reticula_sintetica(len(atributos), rng), atributos)
+
+    with open(marca, "w") as f:
+        json.dump(descripcion, f)
+    return destino
@@ -1,25 +1,77 @@
+import numpy as np
 import pandas as pd
-from data.acceso_data import *
+from data.acceso_data import cache_datos, cargar_tabla
+from data.instrumentacion import instrumentar
 
-nombres_cultivos = df_catalogo_cultivos.set_index("Idcultivo")["Nomcultivo"].to_dict()
+@cache_datos
+def obtener_nombres_cultivos():
+    """
+    Diccionario Idcultivo -> Nomcultivo del catálogo de cultivos.
+    """
+    df_catalogo_cultivos = cargar_tabla("tabla_catalogo_cultivos")
+    return df_catalogo_cultivos.set_index("Idcultivo")["Nomcultivo"].to_dict()
 
 def ids_a_nombres(lista_ids):
+    nombres_cultivos = obtener_nombres_cultivos()
     return [nombres_cultivos.get(i, f"{i}") for i in lista_ids]
 
+# Matriz municipio × cultivo del cierre agrícola: se construye una sola vez y
+# con ella las consultas de cultivos son operaciones de conjuntos sobre filas.
+# Es densa (≈1 byte por municipio y cultivo, unos pocos MB en total).
+@cache_datos
+def obtener_matriz_cultivos():
+    """
+    Regresa un diccionario con:
+    - "matriz": arreglo booleano (municipios × cultivos), True si el municipio
+      tiene registros del cultivo en el cierre agrícola
+    - "cvegeo": CVEGEO de cada fila
+    - "posicion": diccionario CVEGEO -> fila
+    - "cultivos": Idcultivo de cada columna
+    """
+    df_cierre_agricola = cargar_tabla("tabla_cierre_agricola")
+    df = df_cierre_agricola[["CVEGEO", "Idcultivo"]].dropna()
+
+    mun_cod, municipios = pd.factorize(df["CVEGEO"].astype(str).str.zfill(5), sort=True)
+    cul_cod, cultivos = pd.factorize(df["Idcultivo"], sort=True)
+
+    matriz = np.zeros((len(municipios), len(cultivos)), dtype=bool)
+    matriz[mun_cod, cul_cod] = True
+
+    return {
+        "matriz": matriz,
+        "cvegeo": np.asarray(municipios),
+        "posicion": {cve: i for i, cve in enumerate(municipios)},
+        "cultivos": np.asarray(cultivos),
+    }
+
+def fila_cultivos(cvegeo_municipio):
+    """
+    Fila booleana de cultivos del municipio (todo False si no tiene registros).
+    """
+    m = obtener_matriz_cultivos()
+    i = m["posicion"].get(str(cvegeo_municipio).zfill(5))
+    if i is None:
+        return np.zeros(len(m["cultivos"]), dtype=bool)
+    return m["matriz"][i]
+
+def filas_cultivos(lista_cvegeo):
+    """
+    Filas de cultivos de varios municipios (municipios × cultivos).
+    """
+    return np.array([fila_cultivos(cve) for cve in lista_cvegeo], dtype=bool).reshape(
+        len(lista_cvegeo), len(obtener_matriz_cultivos()["cultivos"])
+    )
+
+def ids_de_fila(fila):
+    return obtener_matriz_cultivos()["cultivos"][fila].tolist()
+
 # Función para obtener todos los cultivos de un municipio: esto para comparar cultivos entre muncipios y sacar los similares
+@instrumentar()
 def obtener_cultivos(cvegeo_municipio):
     """
     Devuelve lista de Idcultivo presentes en el municipio.
     """
-    cvegeo_municipio = str(cvegeo_municipio).zfill(5)
-
-    df = df_cierre_agricola[
-        df_cierre_agricola["CVEGEO"].astype(str).str.zfill(5) == cvegeo_municipio
-    ]
-    if df.empty:
-        return []
-    ids= df["Idcultivo"].dropna().unique().tolist()
-    return ids_a_nombres(ids)
+    return ids_a_nombres(ids_de_fila(fila_cultivos(cvegeo_municipio)))
 
 
 # función para obtener los cultivos similares entre dos municipios
@@ -27,21 +79,96 @@ def cultivos_similares(cvegeo_a, cvegeo_b):
     """
     Devuelve los cultivos que ambos municipios comparten.
     """
-    cultivos_a = set(obtener_cultivos(cvegeo_a))
-    cultivos_b = set(obtener_cultivos(cvegeo_b))
-
-    ids_sim= list(cultivos_a.intersection(cultivos_b))
-    return ids_a_nombres(ids_sim)
+    comunes = fila_cultivos(cvegeo_a) & fila_cultivos(cvegeo_b)
+    return ids_a_nombres(ids_de_fila(comunes))
 
 #función para saber qué cultivos no tiene el municipio base pero sí el otro municipio
 def cultivos_que_le_faltan(base, otro):
     """
     Cultivos del municipio 'otro' que no existen en el municipio 'base'.
     """
-    cult_base = set(obtener_cultivos(base))
-    cult_otro = set(obtener_cultivos(otro))
+    faltantes = fila_cultivos(otro) & ~fila_cultivos(base)
+    return ids_a_nombres(ids_de_fila(faltantes))
 
-    return ids_a_nombres(list(cult_otro - cult_base))
+# función para comparar los cultivos del municipio base contra varios municipios a la vez
+# (p. ej. sus 10 municipios más similares)
+def comparar_cultivos_en_bloque(base, otros):
+    """
+    Regresa un DataFrame indexado por CVEGEO de 'otros' con los cultivos
+    comunes con la base, los que le faltan a la base y sus conteos.
+    """
+    otros = [str(cve).zfill(5) for cve in otros]
+    fila_base = fila_cultivos(base)
+    filas_otros = filas_cultivos(otros)
+
+    comunes = filas_otros & fila_base
+    faltantes = filas_otros & ~fila_base
+
+    return pd.DataFrame(
+        {
+            "cultivos_comunes": [ids_a_nombres(ids_de_fila(f)) for f in comunes],
+            "cultivos_faltantes": [ids_a_nombres(ids_de_fila(f)) for f in faltantes],
+            "n_comunes": comunes.sum(axis=1),
+            "n_faltantes": faltantes.sum(axis=1),
+        },
+        index=pd.Index(otros, name="CVEGEO"),
+    )
+
+# cuántos de los municipios 'otros' siembran cada cultivo que no tiene la base
+def cultivos_frecuentes_faltantes(base, otros):
+    """
+    Regresa una Serie (nombre de cultivo -> número de municipios de 'otros'
+    que lo siembran) con los cultivos que no tiene la base, de mayor a menor.
+    """
+    m = obtener_matriz_cultivos()
+    conteo = filas_cultivos(otros).sum(axis=0) * ~fila_cultivos(base)
+    hay = conteo > 0
+    serie = pd.Series(conteo[hay], index=ids_a_nombres(m["cultivos"][hay].tolist()), name="municipios")
+    return serie.sort_values(ascending=False, kind="stable")
+
+# Índice de aptitud AEZ: matriz densa municipio × cultivo con los órdenes de
+# mayor a menor aptitud ya calculados por cultivo y por municipio, así los
+# top-N son rebanadas de esos órdenes.
+@cache_datos
+def obtener_indice_aptitud():
+    """
+    Regresa un diccionario con:
+    - "aptitud": arreglo (municipios × cultivos) con APTITUD, NaN si no hay dato
+    - "cvegeo" / "posicion": CVEGEO de cada fila y CVEGEO -> fila
+    - "cultivos" / "posicion_cultivo": CULTIVO de cada columna y CULTIVO -> columna
+    - "orden_por_cultivo": para cada columna, filas de mayor a menor aptitud
+    - "orden_por_municipio": para cada fila, columnas de mayor a menor aptitud
+    - "n_por_cultivo" / "n_por_municipio": cuántos valores hay (sin NaN)
+    """
+    df_aez = cargar_tabla("tabla_aez")
+    df = df_aez[["CVEGEO", "CULTIVO", "APTITUD"]].dropna()
+
+    mun_cod, municipios = pd.factorize(df["CVEGEO"].astype(str).str.zfill(5), sort=True)
+    cul_cod, cultivos = pd.factorize(df["CULTIVO"], sort=True)
+
+    aptitud = np.full((len(municipios), len(cultivos)), np.nan)
+    aptitud[mun_cod, cul_cod] = df["APTITUD"].to_numpy(dtype=np.float64)
+    hay = ~np.isnan(aptitud)
+
+    # -NaN queda al final al ordenar, así los faltantes nunca entran al top
+    return {
+        "aptitud": aptitud,
+        "cvegeo": np.asarray(municipios),
+        "posicion": {cve: i for i, cve in enumerate(municipios)},
+        "cultivos": np.asarray(cultivos),
+        "posicion_cultivo": {c: j for j, c in enumerate(cultivos)},
+        "orden_por_cultivo": np.argsort(-aptitud, axis=0, kind="stable").astype(np.int32),
+        "orden_por_municipio": np.argsort(-aptitud, axis=1, kind="stable").astype(np.int32),
+        "n_por_cultivo": hay.sum(axis=0),
+        "n_por_municipio": hay.sum(axis=1),
+    }
+
+def _tabla_cultivos(ids, aptitudes):
+    return pd.DataFrame({
+        "CULTIVO": ids,
+        "NombreCultivo": ids_a_nombres(list(ids)),
+        "APTITUD": aptitudes,
+    })
 
 #función para saber qué tan apto es el municipio base en los cultivos del otro municipio
 def aptitud_municipio_para_cultivos(cvegeo_base, cultivos):
@@ -49,57 +176,106 @@ def aptitud_municipio_para_cultivos(cvegeo_base, cultivos):
     Regresa un dataframe con el puntaje de aptitud del municipio base
     hacia una lista de cultivos.
     """
-    df = df_aez[df_aez["CVEGEO"] == cvegeo_base]
+    indice = obtener_indice_aptitud()
+    i = indice["posicion"].get(str(cvegeo_base).zfill(5))
 
-    if df.empty:
+    if i is None:
         return pd.DataFrame()
 
-    df_filtrado = df[df["CULTIVO"].isin(cultivos)]
-    df_filtrado["NombreCultivo"] = df_filtrado["CULTIVO"].map(nombres_cultivos)
+    columnas = [indice["posicion_cultivo"][c] for c in cultivos if c in indice["posicion_cultivo"]]
+    columnas = [j for j in columnas if not np.isnan(indice["aptitud"][i, j])]
 
-    return df_filtrado[["CULTIVO", "NombreCultivo","APTITUD"]]
+    return _tabla_cultivos(indice["cultivos"][columnas], indice["aptitud"][i, columnas])
 
 # función para recomendar los cultivos donde el municioio base salió mejor (los puntajes más altos)
 def recomendar_mejores_cultivos(cvegeo_base, top_n=5):
     """
     Recomienda los mejores cultivos para un municipio basados en su aptitud AEZ.
     """
-    df = df_aez[df_aez["CVEGEO"] == cvegeo_base]
+    indice = obtener_indice_aptitud()
+    i = indice["posicion"].get(str(cvegeo_base).zfill(5))
 
-    if df.empty:
+    if i is None or indice["n_por_municipio"][i] == 0:
         return pd.DataFrame()
 
-    df_ordenado = df.sort_values(by="APTITUD", ascending=False)
-    df["NombreCultivo"] = df["CULTIVO"].map(nombres_cultivos)
+    columnas = indice["orden_por_municipio"][i, :min(top_n, indice["n_por_municipio"][i])]
 
-    return df_ordenado.head(top_n)[["CULTIVO", "NombreCultivo", "APTITUD"]]
+    return _tabla_cultivos(indice["cultivos"][columnas], indice["aptitud"][i, columnas])
 
 # función que toma el cultivo y busca en el aez a los municipios más aptos para ese cultivo
 def municipios_mas_apto_por_cultivo(cultivo, top_n=10):
     """
     Regresa los municipios más aptos para un cultivo usando la tabla AEZ.
     """
-    df = df_aez[df_aez["CULTIVO"] == cultivo]
+    indice = obtener_indice_aptitud()
+    j = indice["posicion_cultivo"].get(cultivo)
 
-    if df.empty:
+    if j is None or indice["n_por_cultivo"][j] == 0:
         return pd.DataFrame()
 
-    df_orden = df.sort_values(by="APTITUD", ascending=False)
+    filas = indice["orden_por_cultivo"][:min(top_n, indice["n_por_cultivo"][j]), j]
+
+    return pd.DataFrame({
+        "CVEGEO": indice["cvegeo"][filas],
+        "APTITUD": indice["aptitud"][filas, j],
+    })
+
+# consultas en bloque: los mejores municipios de varios cultivos, o los mejores
+# cultivos de varios municipios, en una sola llamada
+def municipios_mas_aptos_por_cultivos(cultivos, top_n=10):
+    """
+    Regresa un DataFrame largo (CULTIVO, RANGO, CVEGEO, APTITUD) con los top_n
+    municipios más aptos para cada cultivo de la lista.
+    """
+    indice = obtener_indice_aptitud()
+    cultivos = [c for c in cultivos if c in indice["posicion_cultivo"]]
+    columnas = np.array([indice["posicion_cultivo"][c] for c in cultivos], dtype=np.int64)
+
+    filas = indice["orden_por_cultivo"][:top_n, columnas]          # top_n × cultivos
+    aptitudes = indice["aptitud"][filas, columnas]
+    rango = np.broadcast_to(np.arange(1, len(filas) + 1)[:, None], filas.shape)
+    hay = ~np.isnan(aptitudes)
+
+    return pd.DataFrame({
+        "CULTIVO": np.broadcast_to(indice["cultivos"][columnas], filas.shape).T[hay.T],
+        "RANGO": rango.T[hay.T],
+        "CVEGEO": indice["cvegeo"][filas].T[hay.T],
+        "APTITUD": aptitudes.T[hay.T],
+    })
+
+def mejores_cultivos_por_municipios(lista_cvegeo, top_n=5):
+    """
+    Regresa un DataFrame largo (CVEGEO, RANGO, CULTIVO, NombreCultivo, APTITUD)
+    con los top_n cultivos más aptos de cada municipio de la lista.
+    """
+    indice = obtener_indice_aptitud()
+    lista_cvegeo = [str(cve).zfill(5) for cve in lista_cvegeo]
+    lista_cvegeo = [cve for cve in lista_cvegeo if cve in indice["posicion"]]
+    filas = np.array([indice["posicion"][cve] for cve in lista_cvegeo], dtype=np.int64)
+
+    columnas = indice["orden_por_municipio"][filas, :top_n]        # municipios × top_n
+    aptitudes = indice["aptitud"][filas[:, None], columnas]
+    rango = np.broadcast_to(np.arange(1, columnas.shape[1] + 1), columnas.shape)
+    hay = ~np.isnan(aptitudes)
+    ids = indice["cultivos"][columnas][hay]
 
-    return df_orden.head(top_n)[["CVEGEO", "APTITUD"]]
+    return pd.DataFrame({
+        "CVEGEO": np.broadcast_to(np.array(lista_cvegeo, dtype=object)[:, None], columnas.shape)[hay],
+        "RANGO": rango[hay],
+        "CULTIVO": ids,
+        "NombreCultivo": ids_a_nombres(list(ids)),
+        "APTITUD": aptitudes[hay],
+    })
 
 
 def comparar_municipios_cultivo(cvegeo_a, cvegeo_b):
+    ids_faltantes = ids_de_fila(fila_cultivos(cvegeo_b) & ~fila_cultivos(cvegeo_a))
     return {
         "cultivos_comunes": cultivos_similares(cvegeo_a, cvegeo_b),
-        "cultivos_faltantes": cultivos_que_le_faltan(cvegeo_a, cvegeo_b),
+        "cultivos_faltantes": ids_a_nombres(ids_faltantes),
         "aptitud_base_en_cultivos_del_otro": aptitud_municipio_para_cultivos(
             cvegeo_a,
-            cultivos_que_le_faltan(cvegeo_a, cvegeo_b)
+            ids_faltantes
         ),
         "recomendaciones_base": recomendar_mejores_cultivos(cvegeo_a)
     }
-
-
-
-
@@ -0,0 +1,248 @@
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import ARCHIVOS, archivo_leido, limpiar_cache_datos, obtener_nombres_municipios, registrar_cache
+from data.caracteristicas import normalizar_cvegeo
+from data.instrumentacion import contar
+from calculos.matriz_similitud import ARCHIVOS_MODELO, VERSION_MODELO, hash_datos
+from calculos.matriz_similitud import municipios_mas_similares
+from calculos.aez_comp import comparar_cultivos_en_bloque, comparar_municipios_cultivo
+from calculos.modelo import desglose_detallado
+from calculos.similitud_cultivos import municipios_similares_con_cultivos
+
+# Cache de resultados de consultas por municipio (similares, comparación de
+# cultivos), compartido por la pantalla de Streamlit y la API dentro del
+# mismo proceso. La llave lleva la versión del modelo y el hash de los datos:
+# si cambia algún archivo se vacía el cache y se vuelven a leer las tablas.
+
+# Rankings de similares: solo ambiente (el modelo) o ambiente y cultivos
+# (calculos.similitud_cultivos)
+MODOS_SIMILITUD = ("ambiente", "cultivos")
+
+# Argumentos que son un CVEGEO: se normalizan antes de armar la llave, así
+# "1001" y "01001" son la misma entrada
+ARGUMENTOS_CVEGEO = ("cvegeo", "cvegeo_a", "cvegeo_b", "base")
+
+# Memoria máxima del cache (aproximada), en MB
+MAX_MB_RESULTADOS = float(os.environ.get("AGRO_CACHE_MB", 64))
+
+# Archivos de los que dependen los resultados (además de ARCHIVOS_MODELO)
+ARCHIVOS_RESULTADOS = [
+    ARCHIVOS["tabla_catalogo_cultivos"],
+    ARCHIVOS["tabla_aez"],
+    ARCHIVOS["tabla_cierre_agricola"],
+]
+
+
+def hash_resultados():
+    """
+    Hash de los datos de los que dependen los resultados (los que existen).
+    """
+    archivos = ARCHIVOS_MODELO + [
+        ruta for ruta in ARCHIVOS_RESULTADOS if os.path.exists(archivo_leido(ruta))
+    ]
+    return hash_datos(archivos)
+
+
+def tamano_aproximado(valor):
+    """
+    Bytes aproximados que ocupa un resultado en memoria.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(valor, pd.DataFrame) else uso)
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            tamano_aproximado(k) + tamano_aproximado(v) for k, v in valor.items()
+        )
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamano_aproximado(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheResultados:
+    """
+    Cache LRU con límite de memoria y contadores de aciertos y fallos.
+    Se puede usar desde varios hilos (API) a la vez.
+    """
+
+    def __init__(self, max_mb=MAX_MB_RESULTADOS):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._datos = OrderedDict()   # llave -> (resultado, bytes)
+        self._bytes = 0
+        self._hash = None
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+
+    def llave(self, nombre, args):
+        """
+        Llave de una consulta. Si cambió el hash de los datos, vacía el cache
+        y las tablas cargadas antes de regresarla.
+        """
+        h = hash_resultados()
+        if self._hash is not None and h != self._hash:
+            limpiar_cache_datos()
+            self.invalidaciones += 1
+        self._hash = h
+        return (nombre, args, VERSION_MODELO, h)
+
+    def obtener(self, llave):
+        with self._candado:
+            if llave in self._datos:
+                self._datos.move_to_end(llave)
+                self.aciertos += 1
+                contar(f"cache_resultados.aciertos.{llave[0].rsplit('.', 1)[-1]}")
+                return True, self._datos[llave][0]
+            self.fallos += 1
+        contar(f"cache_resultados.fallos.{llave[0].rsplit('.', 1)[-1]}")
+        return False, None
+
+    def guardar(self, llave, resultado):
+        tamano = tamano_aproximado(resultado)
+        if tamano > self.max_bytes:
+            return
+        with self._candado:
+            if llave in self._datos:
+                self._bytes -= self._datos.pop(llave)[1]
+            self._datos[llave] = (resultado, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, liberado) = self._datos.popitem(last=False)
+                self._bytes -= liberado
+                self.expulsiones += 1
+
+    def cache_clear(self):
+        with self._candado:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._datos),
+            "mb": self._bytes / (1024 * 1024),
+            "max_mb": self.max_bytes / (1024 * 1024),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "expulsiones": self.expulsiones,
+            "invalidaciones": self.invalidaciones,
+        }
+
+
+cache_resultados = registrar_cache(CacheResultados())
+
+
+def cache_resultado(funcion):
+    """
+    Decorador: guarda el resultado de 'funcion' en cache_resultados por
+    argumentos. El resultado se comparte entre llamadas; no hay que modificarlo.
+    Los argumentos de ARGUMENTOS_CVEGEO llegan ya normalizados a 'funcion'.
+    """
+    firma = inspect.signature(funcion)
+
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        argumentos = firma.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        for nombre in ARGUMENTOS_CVEGEO:
+            if argumentos.arguments.get(nombre) is not None:
+                argumentos.arguments[nombre] = normalizar_cvegeo(argumentos.arguments[nombre])
+        llave = cache_resultados.llave(
+            f"{funcion.__module__}.{funcion.__qualname__}", tuple(argumentos.arguments.values())
+        )
+        hay, resultado = cache_resultados.obtener(llave)
+        if not hay:
+            resultado = funcion(*argumentos.args, **argumentos.kwargs)
+            cache_resultados.guardar(llave, resultado)
+        return resultado
+
+    return envoltura
+
+
+def configurar_cache_resultados(max_mb):
+    """
+    Cambia el límite de memoria; expulsa lo que sobre en el siguiente guardado.
+    """
+    cache_resultados.max_bytes = int(max_mb * 1024 * 1024)
+
+
+def estadisticas_cache_resultados():
+    return cache_resultados.estadisticas()
+
+
+# Consultas con cache
+
+@cache_resultado
+def similares_municipio(cvegeo, k=10):
+    """
+    municipios_mas_similares() con cache. Regresa la misma Serie (o None).
+    """
+    return municipios_mas_similares(cvegeo, k)
+
+
+@cache_resultado
+def comparacion_cultivos(cvegeo_a, cvegeo_b):
+    """
+    comparar_municipios_cultivo() con cache.
+    """
+    return comparar_municipios_cultivo(cvegeo_a, cvegeo_b)
+
+
+@cache_resultado
+def similares_con_cultivos(cvegeo, k=10, medida="jaccard"):
+    """
+    municipios_similares_con_cultivos() con cache.
+    """
+    return municipios_similares_con_cultivos(cvegeo, k, medida=medida)
+
+
+@cache_resultado
+def detalle_similares(cvegeo, k=10, modo="ambiente"):
+    """
+    El detalle de la comparación del municipio con sus k más similares en
+    una sola tabla indexada por CVEGEO (en el orden del ranking): NOM_ENT,
+    NOMGEO, las columnas de desglose_detallado() y las de
+    comparar_cultivos_en_bloque(). None si no tiene datos completos.
+
+    Con modo "cultivos" el ranking es el de similares_con_cultivos() y se
+    agregan "similitud_cultivos", "similitud_aptitud" y
+    "similitud_combinada" ("Similitud" sigue siendo la ambiental).
+    """
+    if modo not in MODOS_SIMILITUD:
+        raise ValueError(f"Modo de similitud desconocido: {modo}")
+    if modo == "cultivos":
+        ranking = similares_con_cultivos(cvegeo, k)
+    else:
+        ranking = similares_municipio(cvegeo, k)
+    if ranking is None:
+        return None
+    otros = list(ranking.index)
+    detalle = desglose_detallado(cvegeo, otros)
+    if detalle is None:
+        return None
+    detalle = (
+        obtener_nombres_municipios()
+        .reindex(otros)
+        .join(detalle, how="inner")
+        .join(comparar_cultivos_en_bloque(cvegeo, otros))
+        .rename_axis("CVEGEO")
+    )
+    if modo == "cultivos":
+        detalle = detalle.join(ranking[["cultivos", "aptitud", "Similitud"]].rename(columns={
+            "cultivos": "similitud_cultivos",
+            "aptitud": "similitud_aptitud",
+            "Similitud": "similitud_combinada",
+        }))
+    return detalle
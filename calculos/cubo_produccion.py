@@ -0,0 +1,241 @@
+#comando para construir el cubo de producción: python -m calculos.cubo_produccion
+import argparse
+import glob
+import itertools
+import os
+import shutil
+import time
+
+import pandas as pd
+from data.acceso_data import ARCHIVOS, cache_datos, cargar_tabla
+from calculos.matriz_similitud import CARPETA_CACHE, hash_datos
+
+# Cubo de agregados del cierre agrícola: las medidas sumadas por año,
+# estado, municipio y cultivo, y todos sus agregados (rollups) ya
+# materializados, para que cada vista nacional de Inicio sea una búsqueda
+# en una tabla chica en vez de un groupby sobre la tabla de varios años.
+#
+# El municipio determina el estado, así que no hay agregados con los dos:
+# los de municipio se filtran por estado con el CVEGEO. Cada agregado se
+# calcula a partir del agregado más chico que lo contiene y se guarda en
+# CARPETA_CUBO (Parquet) junto al hash del cierre agrícola: se reconstruye
+# solo cuando cambian los datos.
+
+CARPETA_CUBO = os.path.join(CARPETA_CACHE, "cubo_produccion")
+
+DIMENSIONES = ["Anio", "Idestado", "CVEGEO", "Idcultivo"]
+MEDIDAS = ["Sembrada", "Cosechada", "Volumenproduccion", "Valorproduccion"]
+
+# Superficie sembrada mínima (ha) para entrar al ranking de rentabilidad
+MIN_SEMBRADA = 1000
+
+
+def agregados_posibles():
+    """
+    Las combinaciones de DIMENSIONES que se materializan (en el orden de
+    DIMENSIONES), de la más grande a la más chica.
+    """
+    combinaciones = []
+    for r in range(len(DIMENSIONES) - 1, -1, -1):
+        for dims in itertools.combinations(DIMENSIONES, r):
+            if not ("CVEGEO" in dims and "Idestado" in dims):
+                combinaciones.append(dims)
+    return combinaciones
+
+
+def nombre_agregado(dims):
+    return "_".join(dims) if dims else "total"
+
+
+def construir_cubo(df):
+    """
+    Regresa {dimensiones: DataFrame} con las MEDIDAS sumadas por cada
+    combinación de agregados_posibles(), indexado y ordenado por esas
+    dimensiones (el total, sin dimensiones, es un DataFrame de una fila).
+    """
+    df = df[DIMENSIONES + MEDIDAS].copy()
+    df["CVEGEO"] = df["CVEGEO"].astype(str)
+
+    cubo = {}
+    base = ("Anio", "CVEGEO", "Idcultivo")
+    cubo[base] = df.groupby(list(base), observed=True)[MEDIDAS].sum().sort_index()
+    # los agregados con estado salen de la tabla original
+    cubo[("Anio", "Idestado", "Idcultivo")] = (
+        df.groupby(["Anio", "Idestado", "Idcultivo"], observed=True)[MEDIDAS].sum().sort_index()
+    )
+
+    for dims in agregados_posibles():
+        if dims in cubo:
+            continue
+        # el agregado ya calculado más chico que contiene estas dimensiones
+        padre = min((d for d in cubo if set(dims) <= set(d)), key=lambda d: len(cubo[d]))
+        if dims:
+            cubo[dims] = cubo[padre].groupby(level=list(dims), observed=True).sum().sort_index()
+        else:
+            cubo[dims] = cubo[padre].sum().to_frame().T
+    return cubo
+
+
+def ruta_cubo(h):
+    return os.path.join(CARPETA_CUBO, h)
+
+
+def guardar_cubo(cubo, h):
+    """
+    Escribe cada agregado en CARPETA_CUBO/<h>/ y borra los de otros datos.
+    """
+    carpeta = ruta_cubo(h)
+    temporal = carpeta + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    for dims, tabla in cubo.items():
+        tabla.reset_index(drop=not dims).to_parquet(os.path.join(temporal, nombre_agregado(dims) + ".parquet"))
+    shutil.rmtree(carpeta, ignore_errors=True)
+    os.replace(temporal, carpeta)
+
+    for vieja in glob.glob(os.path.join(CARPETA_CUBO, "*")):
+        if os.path.basename(vieja) != h:
+            shutil.rmtree(vieja, ignore_errors=True)
+    return carpeta
+
+
+def leer_cubo(h):
+    """
+    Lee el cubo guardado para el hash h, o None si no existe.
+    """
+    carpeta = ruta_cubo(h)
+    if not os.path.isdir(carpeta):
+        return None
+    cubo = {}
+    for dims in agregados_posibles():
+        ruta = os.path.join(carpeta, nombre_agregado(dims) + ".parquet")
+        if not os.path.exists(ruta):
+            return None
+        tabla = pd.read_parquet(ruta)
+        cubo[dims] = tabla.set_index(list(dims)).sort_index() if dims else tabla
+    return cubo
+
+
+@cache_datos
+def obtener_cubo():
+    """
+    El cubo de los datos actuales: lo lee de CARPETA_CUBO o, si no existe
+    para estos datos, lo construye y lo guarda.
+    """
+    h = hash_datos([ARCHIVOS["tabla_cierre_agricola"]])
+    cubo = leer_cubo(h)
+    if cubo is None:
+        cubo = construir_cubo(cargar_tabla("tabla_cierre_agricola"))
+        guardar_cubo(cubo, h)
+    return cubo
+
+
+def agregado(dimensiones, **filtros):
+    """
+    Las MEDIDAS sumadas por 'dimensiones', solo de las filas que cumplen
+    'filtros' (dimensión=valor). Regresa un DataFrame indexado por
+    'dimensiones' (vacío si ninguna fila cumple los filtros).
+
+    Filtrar por Idestado un agregado con CVEGEO usa los dos primeros
+    dígitos del CVEGEO.
+    """
+    estado = None
+    if "CVEGEO" in dimensiones or "CVEGEO" in filtros:
+        estado = filtros.pop("Idestado", None)
+    dims = tuple(d for d in DIMENSIONES if d in dimensiones or d in filtros)
+    tabla = obtener_cubo()[dims]
+
+    for dim, valor in filtros.items():
+        tabla = tabla[tabla.index.get_level_values(dim) == valor]
+    if estado is not None:
+        cvegeo = tabla.index.get_level_values("CVEGEO")
+        tabla = tabla[cvegeo.str[-5:-3].astype(int) == int(estado)]
+
+    if not dimensiones:
+        return tabla[MEDIDAS].sum().to_frame().T
+    if list(tabla.index.names) != list(dimensiones):
+        tabla = tabla.groupby(level=list(dimensiones), observed=True).sum()
+    return tabla
+
+
+def ultimo_anio(**filtros):
+    """
+    El año más reciente con registros (que cumplan 'filtros'), o None.
+    """
+    anios = agregado(["Anio"], **filtros)
+    return int(anios.index.max()) if len(anios) else None
+
+
+# === VISTAS DE INICIO ===
+
+def principales_cultivos(anio=None, medida="Valorproduccion", top_n=10):
+    """
+    Los top_n cultivos del país por 'medida' en el año (el más reciente si
+    es None). DataFrame indexado por Idcultivo con MEDIDAS.
+    """
+    anio = anio or ultimo_anio()
+    if anio is None:
+        return None
+    return agregado(["Idcultivo"], Anio=anio).nlargest(top_n, medida)
+
+
+def principales_municipios(idcultivo=None, anio=None, medida="Volumenproduccion", top_n=10):
+    """
+    Los top_n municipios por 'medida' en el año (el más reciente con
+    registros del cultivo si es None), de un cultivo o de todos.
+    DataFrame indexado por CVEGEO con MEDIDAS, o None sin registros.
+    """
+    filtros = {} if idcultivo is None else {"Idcultivo": idcultivo}
+    anio = anio or ultimo_anio(**filtros)
+    if anio is None:
+        return None
+    return agregado(["CVEGEO"], Anio=anio, **filtros).nlargest(top_n, medida)
+
+
+def superficie_anual(anios=10, idestado=None):
+    """
+    Superficie sembrada y cosechada por año en los últimos 'anios' años,
+    del país o de un estado. DataFrame indexado por Anio.
+    """
+    filtros = {} if idestado is None else {"Idestado": idestado}
+    tabla = agregado(["Anio"], **filtros)[["Sembrada", "Cosechada"]]
+    return tabla.tail(anios)
+
+
+def cultivos_mas_rentables(anio=None, top_n=10, min_sembrada=MIN_SEMBRADA):
+    """
+    Los top_n cultivos con mayor valor de producción por hectárea sembrada
+    en el año, entre los que tienen al menos min_sembrada ha.
+    DataFrame indexado por Idcultivo con MEDIDAS y "ValorPorHectarea".
+    """
+    anio = anio or ultimo_anio()
+    if anio is None:
+        return None
+    tabla = agregado(["Idcultivo"], Anio=anio)
+    tabla = tabla[tabla["Sembrada"] >= min_sembrada]
+    tabla = tabla.assign(ValorPorHectarea=tabla["Valorproduccion"] / tabla["Sembrada"])
+    return tabla.nlargest(top_n, "ValorPorHectarea")
+
+
+def municipios_mas_rentables(anio=None, idcultivo=None, top_n=10):
+    """
+    Los top_n municipios con mayor valor de producción en el año, en
+    general o de un cultivo.
+    """
+    return principales_municipios(idcultivo, anio, "Valorproduccion", top_n)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye el cubo de agregados del cierre agrícola.")
+    parser.add_argument("--forzar", action="store_true", help="reconstruir aunque ya exista")
+    args = parser.parse_args()
+
+    h = hash_datos([ARCHIVOS["tabla_cierre_agricola"]])
+    if leer_cubo(h) is not None and not args.forzar:
+        print(f"El cubo ya existe para estos datos: {ruta_cubo(h)}")
+    else:
+        inicio = time.time()
+        cubo = construir_cubo(cargar_tabla("tabla_cierre_agricola"))
+        carpeta = guardar_cubo(cubo, h)
+        filas = sum(len(tabla) for tabla in cubo.values())
+        print(f"{len(cubo)} agregados ({filas} filas) en {carpeta} ({time.time() - inicio:.1f} s)")
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from data.acceso_data import cache_datos, obtener_arreglos_modelo
+from data.caracteristicas import normalizar_cvegeo
+from data.geometrias import obtener_geometrias, punto_en_anillo
+from calculos.modelo import evaluar_modelo
+
+# Consultas espaciales sobre las geometrías de los municipios: en qué
+# municipio cae un punto y qué municipios están a menos de X km.
+#
+# Las cajas (bounding boxes) de los municipios se indexan en un R-tree
+# empaquetado con STR (Sort-Tile-Recursive): cada nodo junta CAPACIDAD
+# nodos del nivel de abajo, y una consulta baja nivel por nivel revisando
+# solo los nodos cuya caja toca la zona buscada. Después se hace la prueba
+# exacta (punto en polígono o distancia entre centroides).
+
+# Hijos por nodo del R-tree
+CAPACIDAD = 16
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def distancia_km(lon1, lat1, lon2, lat2):
+    """
+    Distancia de gran círculo (haversine) en km; acepta arreglos.
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def orden_str(cajas, capacidad=CAPACIDAD):
+    """
+    Orden Sort-Tile-Recursive: franjas verticales por el centro en x y,
+    dentro de cada franja, por el centro en y.
+    """
+    n = len(cajas)
+    centros = (cajas[:, :2] + cajas[:, 2:]) / 2
+    franjas = max(1, int(np.ceil(np.sqrt(n / capacidad))))
+    por_franja = franjas * capacidad
+    orden = np.argsort(centros[:, 0], kind="stable")
+    partes = [
+        parte[np.argsort(centros[parte, 1], kind="stable")]
+        for parte in np.split(orden, np.arange(por_franja, n, por_franja))
+    ]
+    return np.concatenate(partes) if partes else orden
+
+
+def construir_rtree(cajas, capacidad=CAPACIDAD):
+    """
+    R-tree empaquetado con las cajas (N × 4: x_min, y_min, x_max, y_max).
+    Las cajas con NaN (geometría vacía) no se indexan.
+
+    Regresa un diccionario con "orden" (posición original de cada hoja),
+    "hojas" (cajas en ese orden) y "niveles" (cajas de los nodos, de la raíz
+    hacia abajo); los hijos del nodo j son las posiciones
+    j * capacidad ... (j + 1) * capacidad - 1 del nivel siguiente.
+    """
+    validas = np.flatnonzero(~np.isnan(cajas).any(axis=1))
+    orden = validas[orden_str(cajas[validas], capacidad)]
+    hojas = cajas[orden]
+
+    niveles = []
+    actual = hojas
+    while len(actual) > 1 or (len(actual) == 1 and not niveles):
+        inicios = np.arange(0, len(actual), capacidad)
+        actual = np.column_stack([
+            np.minimum.reduceat(actual[:, 0], inicios),
+            np.minimum.reduceat(actual[:, 1], inicios),
+            np.maximum.reduceat(actual[:, 2], inicios),
+            np.maximum.reduceat(actual[:, 3], inicios),
+        ])
+        niveles.append(actual)
+    return {"orden": orden, "hojas": hojas, "niveles": niveles[::-1], "capacidad": capacidad}
+
+
+def consultar_rtree(rtree, caja):
+    """
+    Posiciones originales de las cajas que tocan 'caja' (x_min, y_min,
+    x_max, y_max).
+    """
+    x_min, y_min, x_max, y_max = caja
+    capacidad = rtree["capacidad"]
+    candidatos = np.zeros(1, dtype=np.int64)
+    for cajas in rtree["niveles"] + [rtree["hojas"]]:
+        candidatos = candidatos[candidatos < len(cajas)]
+        c = cajas[candidatos]
+        toca = (c[:, 0] <= x_max) & (c[:, 2] >= x_min) & (c[:, 1] <= y_max) & (c[:, 3] >= y_min)
+        if cajas is rtree["hojas"]:
+            return rtree["orden"][candidatos[toca]]
+        candidatos = (candidatos[toca][:, None] * capacidad + np.arange(capacidad)).ravel()
+    return candidatos
+
+
+@cache_datos
+def obtener_indice_espacial():
+    """
+    R-tree de las cajas de los municipios (ver construir_rtree).
+    """
+    return construir_rtree(obtener_geometrias()["cajas"])
+
+
+def municipio_en_punto(lat, lon):
+    """
+    CVEGEO del municipio que contiene el punto, o None si no cae en ninguno.
+    """
+    g = obtener_geometrias()
+    for i in consultar_rtree(obtener_indice_espacial(), (lon, lat, lon, lat)):
+        # par-impar sobre todos los anillos: los huecos quedan fuera
+        dentro = False
+        for poligono in g["poligonos"][i]:
+            for anillo in poligono:
+                dentro ^= punto_en_anillo(anillo, lon, lat)
+        if dentro:
+            return g["cvegeo"][i]
+    return None
+
+
+def caja_de_radio(lon, lat, radio_km):
+    """
+    Caja en grados que contiene el círculo de radio_km alrededor del punto.
+    """
+    dlat = np.degrees(radio_km / RADIO_TIERRA_KM)
+    coseno = np.cos(np.radians(min(abs(lat) + dlat, 89.9)))
+    dlon = min(np.degrees(radio_km / (RADIO_TIERRA_KM * coseno)), 180.0)
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+
+def municipios_en_radio(mun, radio_km):
+    """
+    Municipios cuyo centroide está a menos de radio_km del centroide de
+    'mun' (sin incluirlo). Regresa una Serie "distancia_km" indexada por
+    CVEGEO, de menor a mayor, o None si el municipio no tiene geometría.
+    """
+    g = obtener_geometrias()
+    i = g["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
+        return None
+
+    lon, lat = g["centroides"][i]
+    # el centroide siempre cae dentro de la caja de su municipio
+    candidatos = consultar_rtree(obtener_indice_espacial(), caja_de_radio(lon, lat, radio_km))
+    candidatos = candidatos[candidatos != i]
+    distancias = distancia_km(lon, lat, g["centroides"][candidatos, 0], g["centroides"][candidatos, 1])
+    cerca = distancias <= radio_km
+
+    resultado = pd.Series(distancias[cerca], index=g["cvegeo"][candidatos[cerca]], name="distancia_km")
+    resultado.index.name = "CVEGEO"
+    return resultado.sort_values(kind="stable")
+
+
+def similares_en_radio(mun, radio_km, k=10, especificacion=None):
+    """
+    Los k municipios más similares a 'mun' (según el modelo) entre los que
+    están a menos de radio_km. Regresa un DataFrame indexado por CVEGEO con
+    "Similitud" y "distancia_km", o None si el municipio no tiene datos
+    completos o geometría.
+    """
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    cercanos = municipios_en_radio(mun, radio_km)
+    if i is None or cercanos is None:
+        return None
+
+    cercanos = cercanos[cercanos.index.isin(list(c["posicion"]))]
+    indices = np.array([c["posicion"][cve] for cve in cercanos.index], dtype=np.int64)
+    # solo se evalúa el modelo contra los cercanos
+    similitud, _ = evaluar_modelo(i, indices, especificacion)
+
+    tabla = pd.DataFrame({"Similitud": similitud, "distancia_km": cercanos.to_numpy()}, index=cercanos.index)
+    return tabla.sort_values(["Similitud", "distancia_km"], ascending=[False, True], kind="stable").head(k)
@@ -0,0 +1,248 @@
+#comando para medir el índice: python -m calculos.indice_vecinos --k 10 --candidatos 40 80
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from data.acceso_data import cache_datos, obtener_arreglos_modelo
+from calculos.modelo import (
+    COLUMNAS_COMPONENTE,
+    ESPECIFICACION_GENERAL,
+    evaluar_modelo,
+    integrar_componentes,
+    normalizar_cvegeo,
+    similitudes_por_componente,
+)
+from calculos.matriz_similitud import top_k
+
+# Índice aproximado de vecinos: cada municipio se representa con un vector
+# (embedding) cuyas distancias aproximan 1 - similitud del modelo, y se
+# indexa con un KD-tree. Una consulta toma del árbol unos cuantos candidatos
+# y los reordena con el modelo exacto, así la respuesta final usa la
+# similitud real.
+#
+# El embedding de cada componente sale de un escalamiento multidimensional
+# clásico (MDS) sobre sus valores distintos, que son pocos (decenas, y unos
+# 1,600 en edafología), y se pondera con el peso del componente.
+#
+# Está apagado por defecto: con los ~2,500 municipios del país la búsqueda
+# exacta tarda menos de 1 ms y el índice no es más rápido (solo el
+# reordenamiento cuesta lo mismo que la pasada exacta) y además pierde
+# vecinos. Con menos de MIN_MUNICIPIOS_INDICE municipios las consultas usan
+# la búsqueda exacta.
+
+# Dimensiones máximas por componente y varianza que deben explicar
+MAX_DIMENSIONES = 16
+VARIANZA_EXPLICADA = 0.95
+
+# Candidatos por consulta que se reordenan con el modelo exacto
+CANDIDATOS = 80
+
+# Municipios a partir de los cuales se usa el índice (abajo, búsqueda exacta)
+MIN_MUNICIPIOS_INDICE = 50_000
+
+
+def codificar_componente(c, nombre):
+    """
+    Regresa (codigos, representantes): el código de valor distinto de cada
+    municipio y la posición de un municipio con cada valor.
+    """
+    columnas = pd.DataFrame({col: c[col] for col in COLUMNAS_COMPONENTE[nombre]})
+    codigos = columnas.groupby(list(columnas.columns), dropna=False, sort=False).ngroup().to_numpy()
+    _, representantes = np.unique(codigos, return_index=True)
+    return codigos, representantes
+
+
+def mds_clasico(distancias, max_dimensiones=MAX_DIMENSIONES, varianza=VARIANZA_EXPLICADA):
+    """
+    Coordenadas (m × d) cuyas distancias euclidianas aproximan la matriz
+    de distancias m × m.
+    """
+    m = len(distancias)
+    centrado = np.eye(m) - 1.0 / m
+    b = -0.5 * centrado @ (distancias ** 2) @ centrado
+    valores, vectores = np.linalg.eigh(b)
+    valores, vectores = valores[::-1], vectores[:, ::-1]
+
+    positivos = valores[valores > 1e-12]
+    if len(positivos) == 0:
+        return np.zeros((m, 1))
+    acumulada = np.cumsum(positivos) / positivos.sum()
+    d = min(max_dimensiones, int(np.searchsorted(acumulada, varianza)) + 1)
+    return vectores[:, :d] * np.sqrt(valores[:d])
+
+
+def construir_indice(especificacion=None, max_dimensiones=MAX_DIMENSIONES):
+    """
+    Construye el embedding y el KD-tree para una especificación del modelo
+    (ESPECIFICACION_GENERAL si es None), con hasta max_dimensiones por
+    componente.
+
+    Regresa un diccionario con "arbol", "embedding" (N × d), "especificacion"
+    y "dimensiones" (componente -> número de dimensiones).
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+    c = obtener_arreglos_modelo()
+    total = sum(componente["peso"] for componente in especificacion)
+
+    partes = []
+    dimensiones = {}
+    for componente in especificacion:
+        if not componente["peso"]:
+            continue
+        codigos, representantes = codificar_componente(c, componente["nombre"])
+        similitud = componente["comparador"](c, representantes, representantes)
+        distancias = 1.0 - (similitud + similitud.T) / 2
+        np.fill_diagonal(distancias, 0.0)
+
+        coordenadas = mds_clasico(distancias, max_dimensiones)
+        partes.append(coordenadas[codigos] * (componente["peso"] / total))
+        dimensiones[componente["nombre"]] = coordenadas.shape[1]
+
+    embedding = np.ascontiguousarray(np.hstack(partes))
+    return {
+        "arbol": cKDTree(embedding),
+        "embedding": embedding,
+        "especificacion": especificacion,
+        "dimensiones": dimensiones,
+    }
+
+
+@cache_datos
+def obtener_indice():
+    """
+    Índice de la especificación general, construido una sola vez.
+    """
+    return construir_indice()
+
+
+def reordenar(indice, i, candidatos, k):
+    """
+    Reordena con el modelo exacto los candidatos de la posición i y regresa
+    la Serie "Similitud" con los k mejores (sin la propia posición).
+    """
+    c = obtener_arreglos_modelo()
+    especificacion = indice["especificacion"]
+    similitud = integrar_componentes(similitudes_por_componente(i, candidatos, especificacion), especificacion)
+    propia = np.flatnonzero(candidatos == i)
+    return top_k(similitud, c["cvegeo"][candidatos], k, excluir=propia[0] if len(propia) else None)
+
+
+def vecinos_exactos(i, k, especificacion=None):
+    # búsqueda exacta contra todos (sin el índice)
+    c = obtener_arreglos_modelo()
+    return top_k(evaluar_modelo(i, especificacion=especificacion)[0], c["cvegeo"], k, excluir=i)
+
+
+def vecinos_aproximados(mun, k=10, candidatos=CANDIDATOS, indice=None, minimo=MIN_MUNICIPIOS_INDICE):
+    """
+    Los k municipios más similares a 'mun' según el índice aproximado, con
+    su similitud exacta: una Serie "Similitud" indexada por CVEGEO, como
+    municipios_mas_similares(). Regresa None si el municipio no tiene datos.
+    Con menos de 'minimo' municipios hace la búsqueda exacta.
+    """
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
+        return None
+    if len(c["cvegeo"]) < minimo:
+        return vecinos_exactos(i, k, indice["especificacion"] if indice else None)
+    if indice is None:
+        indice = obtener_indice()
+
+    candidatos = min(max(candidatos, k + 1), len(c["cvegeo"]))
+    _, vecinos = indice["arbol"].query(indice["embedding"][i], k=candidatos)
+    return reordenar(indice, i, np.asarray(vecinos), k)
+
+
+def vecinos_aproximados_bloque(
+    lista_cvegeo, k=10, candidatos=CANDIDATOS, indice=None, minimo=MIN_MUNICIPIOS_INDICE
+):
+    """
+    vecinos_aproximados() para varios municipios, consultando el árbol una
+    sola vez. Regresa un diccionario CVEGEO -> Serie (omite los que no
+    tienen datos).
+    """
+    c = obtener_arreglos_modelo()
+    lista_cvegeo = [cve for cve in map(normalizar_cvegeo, lista_cvegeo) if cve in c["posicion"]]
+    posiciones = np.array([c["posicion"][cve] for cve in lista_cvegeo], dtype=np.int64)
+    if len(c["cvegeo"]) < minimo:
+        especificacion = indice["especificacion"] if indice else None
+        return {cve: vecinos_exactos(i, k, especificacion) for cve, i in zip(lista_cvegeo, posiciones)}
+    if indice is None:
+        indice = obtener_indice()
+
+    candidatos = min(max(candidatos, k + 1), len(c["cvegeo"]))
+    _, vecinos = indice["arbol"].query(indice["embedding"][posiciones], k=candidatos)
+    return {
+        cve: reordenar(indice, i, fila, k)
+        for cve, i, fila in zip(lista_cvegeo, posiciones, vecinos.reshape(len(posiciones), -1))
+    }
+
+
+def medir_recall(k=10, candidatos=CANDIDATOS, muestra=500, semilla=0, indice=None):
+    """
+    Compara el índice contra la búsqueda exacta en una muestra de municipios.
+
+    El recall@k cuenta, por consulta, cuántos de los k resultados aproximados
+    tienen una similitud exacta mayor o igual al k-ésimo mejor valor exacto
+    (así los empates no cuentan como errores), dividido entre k.
+
+    Regresa un diccionario con recall promedio y mínimo, y milisegundos por
+    consulta del índice (con reordenamiento) y de la búsqueda exacta.
+    """
+    if indice is None:
+        indice = obtener_indice()
+    c = obtener_arreglos_modelo()
+    n = len(c["cvegeo"])
+    rng = np.random.default_rng(semilla)
+    posiciones = rng.choice(n, size=min(muestra, n), replace=False)
+
+    # cada método en su propia pasada, para que ninguno aproveche el cache
+    # de textos que llenó el otro
+    inicio = time.perf_counter()
+    aproximados = [vecinos_aproximados(c["cvegeo"][i], k, candidatos, indice, minimo=0) for i in posiciones]
+    t_aprox = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    exactos = [vecinos_exactos(i, k, indice["especificacion"]) for i in posiciones]
+    t_exacto = time.perf_counter() - inicio
+
+    recalls = [
+        np.sum(aprox.to_numpy() >= exacto.iloc[-1]) / len(exacto)
+        for aprox, exacto in zip(aproximados, exactos)
+    ]
+
+    return {
+        "k": k,
+        "candidatos": candidatos,
+        "consultas": len(posiciones),
+        "recall": float(np.mean(recalls)),
+        "recall_minimo": float(np.min(recalls)),
+        "ms_aproximado": 1000 * t_aprox / len(posiciones),
+        "ms_exacto": 1000 * t_exacto / len(posiciones),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mide el recall@k y la latencia del índice aproximado de vecinos."
+    )
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidatos", type=int, nargs="+", default=[CANDIDATOS])
+    parser.add_argument("--muestra", type=int, default=500, help="municipios a consultar")
+    args = parser.parse_args()
+
+    inicio = time.time()
+    indice = obtener_indice()
+    print(f"Índice construido en {time.time() - inicio:.1f} s, dimensiones: {indice['dimensiones']}")
+
+    for candidatos in args.candidatos:
+        r = medir_recall(args.k, candidatos, args.muestra, indice=indice)
+        print(
+            f"k={r['k']} candidatos={r['candidatos']}: recall@k {r['recall']:.3f} "
+            f"(mínimo {r['recall_minimo']:.2f}), {r['ms_aproximado']:.2f} ms/consulta "
+            f"vs {r['ms_exacto']:.2f} ms exacta"
+        )
@@ -0,0 +1,373 @@
+#comando para actualizar la matriz por componentes: python -m calculos.matriz_componentes --reporte cambios.csv
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import limpiar_cache_datos, obtener_arreglos_modelo
+from calculos.modelo import COLUMNAS_COMPONENTE, ESPECIFICACION_GENERAL
+from calculos.matriz_similitud import CARPETA_CACHE, VERSION_MODELO, hash_datos, rutas_cache
+from calculos.vecinos import top_k_bloque
+
+# Matrices N×N de similitud por componente (precipitación, temperatura, ...)
+# guardadas en disco junto con los valores de cada municipio con que se
+# calcularon. Cuando se reemplaza una tabla (p. ej. una nueva capa de
+# precipitación), actualizar_componentes() recalcula solo las filas y
+# columnas de los municipios cuyo valor cambió, en los componentes que
+# cambiaron, y vuelve a mezclar la matriz general (la de matriz_similitud)
+# solo en esas filas y columnas.
+#
+# La matriz general se mezcla siempre a partir de los componentes guardados
+# en float32, así una actualización da lo mismo que construirla de cero.
+
+CARPETA_COMPONENTES = os.path.join(CARPETA_CACHE, "componentes")
+
+# Arreglos con códigos de texto: se guardan los textos, no los códigos,
+# porque los códigos cambian al cambiar el conjunto de valores distintos
+TEXTOS = {"eda_cod": "eda_valores", "topo_cod": "topo_valores"}
+
+TAM_BLOQUE = 256
+
+
+def ruta_componente(nombre):
+    return os.path.join(CARPETA_COMPONENTES, f"{nombre}.npy")
+
+
+def rutas_estado():
+    """
+    Regresa las rutas (estado, cvegeo, valores) de los componentes guardados.
+    """
+    return (
+        os.path.join(CARPETA_COMPONENTES, "estado.json"),
+        os.path.join(CARPETA_COMPONENTES, "cvegeo.npy"),
+        os.path.join(CARPETA_COMPONENTES, "valores.npz"),
+    )
+
+
+def valores_componentes(c, especificacion):
+    """
+    Valores por municipio de los arreglos de cada componente de la
+    especificación (columna -> arreglo), con los textos ya decodificados.
+    """
+    valores = {}
+    for componente in especificacion:
+        for col in COLUMNAS_COMPONENTE[componente["nombre"]]:
+            if col in TEXTOS:
+                valores[col] = np.asarray(c[TEXTOS[col]], dtype=str)[c[col]]
+            else:
+                valores[col] = c[col]
+    return valores
+
+
+def filas_cambiadas(anteriores, actuales, nombre):
+    """
+    Posiciones de los municipios cuyo valor del componente 'nombre' cambió.
+    """
+    cambio = np.zeros(len(next(iter(actuales.values()))), dtype=bool)
+    for col in COLUMNAS_COMPONENTE[nombre]:
+        viejo, nuevo = pd.Series(anteriores[col]), pd.Series(actuales[col])
+        cambio |= (viejo.ne(nuevo) & ~(viejo.isna() & nuevo.isna())).to_numpy()
+    return np.flatnonzero(cambio)
+
+
+def calcular_componente(destino, componente, filas=None, tam_bloque=TAM_BLOQUE):
+    """
+    Escribe en 'destino' (N×N) la similitud de un componente. Si se dan
+    'filas', solo recalcula esas filas y esas columnas.
+    """
+    c = obtener_arreglos_modelo()
+    n = len(c["cvegeo"])
+    comparar = componente["comparador"]
+
+    if filas is None:
+        for inicio in range(0, n, tam_bloque):
+            bloque = np.arange(inicio, min(inicio + tam_bloque, n))
+            destino[bloque] = comparar(c, bloque, slice(None))
+        return destino
+
+    for inicio in range(0, len(filas), tam_bloque):
+        bloque = filas[inicio:inicio + tam_bloque]
+        destino[bloque] = comparar(c, bloque, slice(None))
+    for inicio in range(0, n, tam_bloque):
+        bloque = np.arange(inicio, min(inicio + tam_bloque, n))
+        destino[inicio:inicio + len(bloque), filas] = comparar(c, bloque, filas)
+    return destino
+
+
+def mezclar(matrices, especificacion, filas, columnas=slice(None)):
+    """
+    Promedio ponderado de las matrices por componente en filas × columnas.
+    """
+    total = 0
+    for componente in especificacion:
+        if componente["peso"]:
+            parcial = matrices[componente["nombre"]][filas][:, columnas].astype(np.float64)
+            total = total + componente["peso"] * parcial
+    return total / sum(componente["peso"] for componente in especificacion)
+
+
+def escribir_general(destino, matrices, especificacion, filas=None, tam_bloque=TAM_BLOQUE):
+    """
+    Mezcla la matriz general en 'destino': completa, o solo las filas y
+    columnas en 'filas'.
+    """
+    n = len(destino)
+    if filas is None:
+        for inicio in range(0, n, tam_bloque):
+            bloque = np.arange(inicio, min(inicio + tam_bloque, n))
+            destino[bloque] = mezclar(matrices, especificacion, bloque)
+        return destino
+
+    for inicio in range(0, len(filas), tam_bloque):
+        bloque = filas[inicio:inicio + tam_bloque]
+        destino[bloque] = mezclar(matrices, especificacion, bloque)
+    for inicio in range(0, n, tam_bloque):
+        bloque = np.arange(inicio, min(inicio + tam_bloque, n))
+        destino[inicio:inicio + len(bloque), filas] = mezclar(matrices, especificacion, bloque, filas)
+    return destino
+
+
+def comparar_matrices(vieja, nueva, cvegeo, k=10, tam_bloque=TAM_BLOQUE):
+    """
+    Compara dos matrices generales fila por fila.
+
+    Regresa un DataFrame indexado por CVEGEO con "cambio_maximo" y
+    "cambio_medio" (diferencia absoluta de similitud en la fila) y
+    "vecinos_nuevos" (cuántos de sus k más similares no estaban antes).
+    """
+    n = len(cvegeo)
+    maximo = np.zeros(n)
+    medio = np.zeros(n)
+    nuevos = np.zeros(n, dtype=np.int64)
+
+    for inicio in range(0, n, tam_bloque):
+        bloque = np.arange(inicio, min(inicio + tam_bloque, n))
+        antes = np.array(vieja[bloque], dtype=np.float64)
+        despues = np.array(nueva[bloque], dtype=np.float64)
+        diferencia = np.abs(despues - antes)
+        maximo[bloque] = diferencia.max(axis=1)
+        medio[bloque] = diferencia.mean(axis=1)
+
+        vecinos_antes, _ = top_k_bloque(antes, bloque, k)
+        vecinos_despues, _ = top_k_bloque(despues, bloque, k)
+        nuevos[bloque] = [
+            len(set(d) - set(a)) for a, d in zip(vecinos_antes, vecinos_despues)
+        ]
+
+    return pd.DataFrame(
+        {"cambio_maximo": maximo, "cambio_medio": medio, "vecinos_nuevos": nuevos},
+        index=pd.Index(cvegeo, name="CVEGEO"),
+    )
+
+
+def leer_estado():
+    """
+    Regresa (estado, cvegeo, valores) de los componentes guardados, o None
+    si no hay.
+    """
+    ruta_estado, ruta_cvegeo, ruta_valores = rutas_estado()
+    if not all(map(os.path.exists, rutas_estado())):
+        return None
+    with open(ruta_estado) as f:
+        estado = json.load(f)
+    with np.load(ruta_valores, allow_pickle=False) as valores:
+        valores = dict(valores)
+    return estado, np.load(ruta_cvegeo), valores
+
+
+def guardar_estado(h, especificacion, cvegeo, valores):
+    ruta_estado, ruta_cvegeo, ruta_valores = rutas_estado()
+    np.save(ruta_cvegeo, cvegeo)
+    np.savez(ruta_valores, **valores)
+    with open(ruta_estado, "w") as f:
+        json.dump({
+            "version": VERSION_MODELO,
+            "hash": h,
+            "pesos": {componente["nombre"]: componente["peso"] for componente in especificacion},
+        }, f, indent=2)
+
+
+def abrir_componentes(especificacion, modo="r+", n=None):
+    return {
+        componente["nombre"]: np.lib.format.open_memmap(
+            ruta_componente(componente["nombre"]), mode=modo,
+            **({"dtype": np.float32, "shape": (n, n)} if modo == "w+" else {}),
+        )
+        for componente in especificacion
+    }
+
+
+def _escribir_matriz_general(h, cvegeo, matrices, especificacion, anterior=None, filas=None):
+    # Escribe la matriz general de los datos con hash h. Con 'anterior' copia
+    # esa matriz y solo vuelve a mezclar 'filas'; sin ella la mezcla completa.
+    ruta_matriz, ruta_cvegeo = rutas_cache(h)
+    temporal = ruta_matriz + ".tmp"
+    n = len(cvegeo)
+    destino = np.lib.format.open_memmap(temporal, mode="w+", dtype=np.float32, shape=(n, n))
+    if anterior is None:
+        escribir_general(destino, matrices, especificacion)
+    else:
+        for inicio in range(0, n, TAM_BLOQUE):
+            destino[inicio:inicio + TAM_BLOQUE] = anterior[inicio:inicio + TAM_BLOQUE]
+        escribir_general(destino, matrices, especificacion, filas)
+    destino.flush()
+    del destino
+
+    np.save(ruta_cvegeo, cvegeo)
+    os.replace(temporal, ruta_matriz)
+    return ruta_matriz
+
+
+def _borrar_matrices_viejas(h):
+    for viejo in glob.glob(os.path.join(CARPETA_CACHE, "similitud_*.npy")):
+        if h not in os.path.basename(viejo):
+            os.remove(viejo)
+
+
+def construir_componentes(especificacion=None):
+    """
+    Calcula y guarda todas las matrices por componente y la matriz general
+    de los datos actuales. Regresa la ruta de la matriz general.
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+    c = obtener_arreglos_modelo()
+    cvegeo = c["cvegeo"].astype("U5")
+    n = len(cvegeo)
+    h = hash_datos()
+
+    os.makedirs(CARPETA_COMPONENTES, exist_ok=True)
+    # el estado se borra primero: si el cálculo se interrumpe no queda un
+    # estado que no corresponda con las matrices
+    for ruta in rutas_estado():
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    matrices = abrir_componentes(especificacion, "w+", n)
+    for componente in especificacion:
+        calcular_componente(matrices[componente["nombre"]], componente)
+        matrices[componente["nombre"]].flush()
+
+    ruta = _escribir_matriz_general(h, cvegeo, matrices, especificacion)
+    guardar_estado(h, especificacion, cvegeo, valores_componentes(c, especificacion))
+    _borrar_matrices_viejas(h)
+    return ruta
+
+
+def actualizar_componentes(k=10, especificacion=None, forzar=False):
+    """
+    Pone al día las matrices con los datos actuales, recalculando solo lo
+    que cambió desde la última vez (todo si no hay matrices guardadas, si
+    cambió el conjunto de municipios o la especificación, o con 'forzar').
+
+    Regresa un diccionario con:
+    - "tipo": "completa", "incremental" o "sin_cambios"
+    - "componentes": componente -> municipios cuyo valor cambió
+    - "municipios_recalculados", "pares_recalculados", "cambio_maximo"
+    - "detalle": DataFrame de comparar_matrices() con los municipios cuya
+      fila cambió y los componentes en que cambiaron sus propios valores,
+      ordenado por vecinos nuevos y cambio máximo
+    - "ruta" de la matriz general y "segundos"
+    """
+    inicio = time.time()
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+    pesos = {componente["nombre"]: componente["peso"] for componente in especificacion}
+
+    # las tablas pudieron cambiar en disco desde que se cargaron
+    limpiar_cache_datos()
+    c = obtener_arreglos_modelo()
+    cvegeo = c["cvegeo"].astype("U5")
+    h = hash_datos()
+    valores = valores_componentes(c, especificacion)
+
+    guardado = None if forzar else leer_estado()
+    completa = (
+        guardado is None
+        or guardado[0]["version"] != VERSION_MODELO
+        or guardado[0]["pesos"] != pesos
+        or not np.array_equal(guardado[1], cvegeo)
+        or not all(os.path.exists(ruta_componente(nombre)) for nombre in pesos)
+    )
+    if completa:
+        ruta = construir_componentes(especificacion)
+        return {
+            "tipo": "completa",
+            "componentes": {nombre: len(cvegeo) for nombre in pesos},
+            "municipios_recalculados": len(cvegeo),
+            "pares_recalculados": None,
+            "cambio_maximo": None,
+            "detalle": None,
+            "ruta": ruta,
+            "segundos": time.time() - inicio,
+        }
+
+    estado, _, anteriores = guardado
+    cambiadas = {nombre: filas_cambiadas(anteriores, valores, nombre) for nombre in pesos}
+    filas = np.unique(np.concatenate([np.zeros(0, dtype=np.int64), *cambiadas.values()]))
+
+    # matriz general anterior: la guardada o, si se borró, la mezcla de
+    # los componentes antes de modificarlos
+    matrices = abrir_componentes(especificacion)
+    ruta_anterior, _ = rutas_cache(estado["hash"])
+    if os.path.exists(ruta_anterior):
+        anterior = np.load(ruta_anterior, mmap_mode="r")
+    else:
+        anterior = escribir_general(np.empty((len(cvegeo),) * 2, dtype=np.float32), matrices, especificacion)
+
+    for componente in especificacion:
+        if len(cambiadas[componente["nombre"]]):
+            calcular_componente(matrices[componente["nombre"]], componente, cambiadas[componente["nombre"]])
+            matrices[componente["nombre"]].flush()
+
+    ruta = _escribir_matriz_general(h, cvegeo, matrices, especificacion, anterior, filas)
+    guardar_estado(h, especificacion, cvegeo, valores)
+
+    detalle = comparar_matrices(anterior, np.load(ruta, mmap_mode="r"), cvegeo, k)
+    del anterior
+    _borrar_matrices_viejas(h)
+
+    propios = [[] for _ in range(len(cvegeo))]
+    for nombre, filas_componente in cambiadas.items():
+        for i in filas_componente:
+            propios[i].append(nombre)
+    detalle["componentes_cambiados"] = [", ".join(nombres) for nombres in propios]
+    detalle = detalle[(detalle["cambio_maximo"] > 0) | (detalle["vecinos_nuevos"] > 0)]
+    return {
+        "tipo": "incremental" if len(filas) else "sin_cambios",
+        "componentes": {nombre: len(filas_componente) for nombre, filas_componente in cambiadas.items()},
+        "municipios_recalculados": len(filas),
+        "pares_recalculados": int(len(filas) * (2 * len(cvegeo) - len(filas))),
+        "cambio_maximo": float(detalle["cambio_maximo"].max()) if len(detalle) else 0.0,
+        "detalle": detalle.sort_values(["vecinos_nuevos", "cambio_maximo"], ascending=False),
+        "ruta": ruta,
+        "segundos": time.time() - inicio,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Actualiza las matrices de similitud por componente con los datos actuales."
+    )
+    parser.add_argument("--k", type=int, default=10, help="vecinos a comparar en el reporte")
+    parser.add_argument("--forzar", action="store_true", help="recalcular todo")
+    parser.add_argument("--reporte", help="archivo CSV con el detalle por municipio")
+    args = parser.parse_args()
+
+    r = actualizar_componentes(args.k, forzar=args.forzar)
+    print(f"Actualización {r['tipo']} en {r['segundos']:.1f} s -> {r['ruta']}")
+    for nombre, cambios in r["componentes"].items():
+        print(f"  {nombre:<18} {cambios} municipios con valores nuevos")
+
+    if r["detalle"] is not None:
+        print(
+            f"{r['municipios_recalculados']} municipios recalculados, {r['pares_recalculados']} pares, "
+            f"cambio máximo {r['cambio_maximo']:.4f}"
+        )
+        print(r["detalle"].head(20).to_string())
+        if args.reporte:
+            r["detalle"].to_csv(args.reporte)
+            print(f"Detalle en {args.reporte}")
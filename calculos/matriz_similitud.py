@@ -0,0 +1,192 @@
+#comando para construir la matriz: python -m calculos.matriz_similitud
+import argparse
+import glob
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import archivo_leido, obtener_arreglos_modelo
+from calculos.modelo import (
+    comparar_municipio_contra_todos,
+    integrar_componentes,
+    normalizar_cvegeo,
+    similitudes_por_componente,
+)
+
+# Matriz N×N de modelo_gral() entre todos los municipios, guardada en disco.
+# El nombre del archivo lleva un hash del contenido de los datos de entrada,
+# así que al cambiar cualquier archivo la matriz vieja deja de usarse.
+
+ARCHIVOS_MODELO = [
+    "data/mun_precip_media_anual.csv",
+    "data/mun_temp_media_anual.csv",
+    "data/mun_unidades_climaticas_final.csv",
+    "data/mun_edafologia.csv",
+    "data/mun_sist_topoformas.csv",
+    "data/tabla_municipios.parquet",
+]
+
+CARPETA_CACHE = "data/cache"
+
+# Cambiar si cambia la forma de calcular la similitud
+VERSION_MODELO = "1"
+
+_hashes = {}
+_matriz_cargada = None
+
+
+def hash_datos(archivos=ARCHIVOS_MODELO):
+    """
+    Hash SHA-256 del contenido de los archivos de entrada y de VERSION_MODELO.
+    Se recalcula solo si cambia el tamaño o la fecha de algún archivo.
+    De cada archivo se usa el que se lee de verdad (archivo_leido): el del
+    paquete Parquet si está vigente, así funciona sin los originales.
+    """
+    archivos = [archivo_leido(ruta) for ruta in archivos]
+    firma = tuple(
+        (ruta, os.stat(ruta).st_size, os.stat(ruta).st_mtime_ns) for ruta in archivos
+    )
+    if firma not in _hashes:
+        h = hashlib.sha256(VERSION_MODELO.encode())
+        for ruta in archivos:
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(1 << 20), b""):
+                    h.update(bloque)
+        _hashes[firma] = h.hexdigest()[:16]
+    return _hashes[firma]
+
+
+def rutas_cache(h):
+    """
+    Regresa las rutas (matriz, cvegeo) de la matriz para el hash h.
+    """
+    base = os.path.join(CARPETA_CACHE, f"similitud_{h}")
+    return base + ".npy", base + "_cvegeo.npy"
+
+
+def calcular_matriz(destino, dtype=np.float32, tam_bloque=256):
+    """
+    Calcula la matriz completa por bloques de filas y la escribe en 'destino'
+    (un arreglo N×N, normalmente un memmap).
+    """
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    for inicio in range(0, n, tam_bloque):
+        filas = np.arange(inicio, min(inicio + tam_bloque, n))
+        destino[filas] = integrar_componentes(similitudes_por_componente(filas)).astype(dtype)
+    return destino
+
+
+def construir_cache(dtype=np.float32):
+    """
+    Construye la matriz para los datos actuales y la guarda en CARPETA_CACHE.
+    Borra las matrices de versiones anteriores de los datos.
+    Regresa la ruta de la matriz.
+    """
+    h = hash_datos()
+    ruta_matriz, ruta_cvegeo = rutas_cache(h)
+    os.makedirs(CARPETA_CACHE, exist_ok=True)
+
+    cvegeo = obtener_arreglos_modelo()["cvegeo"].astype("U5")
+    n = len(cvegeo)
+
+    # Se escribe en un archivo temporal y se renombra al terminar,
+    # para que nunca se lea una matriz a medias
+    temporal = ruta_matriz + ".tmp"
+    destino = np.lib.format.open_memmap(temporal, mode="w+", dtype=dtype, shape=(n, n))
+    calcular_matriz(destino, dtype)
+    destino.flush()
+    del destino
+
+    np.save(ruta_cvegeo, cvegeo)
+    os.replace(temporal, ruta_matriz)
+
+    for viejo in glob.glob(os.path.join(CARPETA_CACHE, "similitud_*.npy")):
+        if h not in os.path.basename(viejo):
+            os.remove(viejo)
+
+    return ruta_matriz
+
+
+def cargar_matriz():
+    """
+    Abre con memory-map la matriz de los datos actuales.
+    Regresa (matriz, cvegeo, posicion) donde posicion es un diccionario
+    CVEGEO -> fila, o None si la matriz no se ha construido para estos datos.
+    """
+    global _matriz_cargada
+    h = hash_datos()
+    if _matriz_cargada is not None and _matriz_cargada[0] == h:
+        return _matriz_cargada[1:]
+
+    ruta_matriz, ruta_cvegeo = rutas_cache(h)
+    if not (os.path.exists(ruta_matriz) and os.path.exists(ruta_cvegeo)):
+        return None
+
+    matriz = np.load(ruta_matriz, mmap_mode="r")
+    cvegeo = np.load(ruta_cvegeo)
+    posicion = {cve: i for i, cve in enumerate(cvegeo)}
+    _matriz_cargada = (h, matriz, cvegeo, posicion)
+    return matriz, cvegeo, posicion
+
+
+def top_k(similitudes, cvegeo, k, excluir=None):
+    """
+    Regresa una Serie con los k valores más altos de 'similitudes',
+    ordenada de mayor a menor e indexada por CVEGEO.
+    'excluir' es una posición que no debe aparecer (el propio municipio).
+    """
+    similitudes = np.array(similitudes, dtype=np.float64)
+    if excluir is not None:
+        similitudes[excluir] = -np.inf
+    k = min(k, len(similitudes) - (excluir is not None))
+    if k <= 0:
+        return pd.Series(dtype=np.float64, name="Similitud")
+
+    candidatos = np.argpartition(-similitudes, k - 1)[:k]
+    orden = candidatos[np.argsort(-similitudes[candidatos], kind="stable")]
+    return pd.Series(similitudes[orden], index=np.asarray(cvegeo)[orden], name="Similitud")
+
+
+def municipios_mas_similares(mun, k=10):
+    """
+    Regresa los k municipios más similares a 'mun' (sin incluirlo),
+    como una Serie "Similitud" indexada por CVEGEO y ordenada de mayor a menor.
+
+    Usa la matriz en disco si ya existe para los datos actuales; si no,
+    calcula la fila con comparar_municipio_contra_todos().
+    Regresa None si el municipio no tiene datos completos.
+    """
+    mun = normalizar_cvegeo(mun)
+    cargada = cargar_matriz()
+
+    if cargada is not None:
+        matriz, cvegeo, posicion = cargada
+        i = posicion.get(mun)
+        if i is None:
+            return None
+        return top_k(matriz[i], cvegeo, k, excluir=i)
+
+    similitudes = comparar_municipio_contra_todos(mun)
+    if similitudes is None:
+        return None
+    i = similitudes.index.get_loc(mun)
+    return top_k(similitudes.to_numpy(), similitudes.index, k, excluir=i)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Construye la matriz de similitud entre todos los municipios."
+    )
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--forzar", action="store_true", help="reconstruir aunque ya exista")
+    args = parser.parse_args()
+
+    ruta, _ = rutas_cache(hash_datos())
+    if os.path.exists(ruta) and not args.forzar:
+        print(f"La matriz ya existe para estos datos: {ruta}")
+    else:
+        inicio = time.time()
+        ruta = construir_cache(np.dtype(args.dtype))
+        print(f"Matriz guardada en {ruta} ({time.time() - inicio:.1f} s)")
@@ -1,19 +1,24 @@
+from functools import lru_cache
+
 import Levenshtein
+import numpy as np
 import pandas as pd
+from data.acceso_data import obtener_arreglos_modelo, obtener_caracteristicas, registrar_cache
+from data.instrumentacion import contar, instrumentar, medir
+from data.caracteristicas import (
+    CATEGORIA_H2O,
+    CATEGORIA_NO_APLICA,
+    CATEGORIA_NUMERICA,
+    es_numerico,
+    es_rango,
+    normalizar_cvegeo,
+    normalizar_precipitacion,
+    rango_a_promedio,
+    unir_edafologia,
+)
 
 # modelo similitud proporcional
 
-def normalizar_cvegeo(valor):
-    """
-    Convierte un CVEGEO a string de 5 dígitos, rellenando con ceros a la izquierda.
-    Ejemplo: 1002 -> "01002"
-    """
-    try:
-        return str(valor).zfill(5)
-    except:
-        return None
-
-
 def similitud_proporcional(x1, x2):
     """
     Calcula la similitud proporcional entre dos valores numéricos
@@ -28,47 +33,6 @@ def similitud_proporcional(x1, x2):
     similitud = 1 - (diff / max_val)
     return similitud
 
-def es_numerico(valor):
-    try:
-        float(valor)
-        return True
-    except:
-        return False
-
-
-
-def es_rango(valor):
-    return isinstance(valor, str) and "-" in valor
-
-
-def normalizar_precipitacion(valor):
-    if isinstance(valor, str):
-        v = valor.strip().lower()
-        if v in ["no aplica", "na", "n/a"]:
-            return "no_aplica"
-        if v in ["h2o", "agua", "mojado"]:
-            return "h2o"
-    return valor
-
-# pasar rango a int y sacar el promedio
-def rango_a_promedio(rango):
-    """
-    Convierte un rango en una tupla de enteros y devuelve su promedio.
-
-    Ejemplo: "3-7" -> (3, 7) -> 5.0
-    """
-    try:
-        partes = rango.split('-')
-        if len(partes) != 2:
-            raise ValueError("El rango debe tener el formato 'min-max'")
-        min_val = int(partes[0].strip())
-        max_val = int(partes[1].strip())
-        promedio = (min_val + max_val) / 2
-        return promedio
-    except Exception as e:
-        raise ValueError(f"Error al convertir el rango: {e}")
-    
-
 # modelo comparador de rangos
 
 def comparador_de_rangos(rango1, rango2):
@@ -141,7 +105,7 @@ def precip(v1, v2):
     return 0.0
 
 
-    
+@instrumentar()
 def modelo_gral(val1_prec, val2_prec, val1_temp, val2_temp, val1_uni, val2_uni, val1_eda, val2_eda, val1_topo, val2_topo):
 
     similitud_precip = precip(val1_prec, val2_prec)
@@ -160,208 +124,434 @@ def modelo_gral(val1_prec, val2_prec, val1_temp, val2_temp, val1_uni, val2_uni,
 
     return integracion
 
-def unir_edafologia(fila):
-    return " ".join([
-        str(fila["CLAVE_WRB"]),
-        str(fila["GRUPO1"]),
-        str(fila["GRUPO2"]),
-        str(fila["GRUPO3"]),
-        str(fila["CLASE_TEXT"]),
-        str(fila["FRUDICA"]),
-    ])
 
+# -----------------------------------------------------------
+# Versiones vectorizadas sobre valores ya interpretados
+# -----------------------------------------------------------
 
-#leer datos 
-topoforma = pd.read_csv('data/mun_sist_topoformas.csv')
-topoforma["CVEGEO"] = topoforma["CVEGEO"].apply(normalizar_cvegeo)
+def similitud_proporcional_vec(x1, x2):
+    """
+    Versión de similitud_proporcional() sobre arreglos de NumPy.
+    Da exactamente los mismos valores que la versión escalar.
+    """
+    x1 = np.asarray(x1, dtype=np.float64)
+    x2 = np.asarray(x2, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        max_val = np.maximum(np.abs(x1), np.abs(x2))
+        similitud = 1 - (np.abs(x1 - x2) / max_val)
+    similitud = np.where(max_val == 0, 0.0, similitud)
+    return np.where((x1 == 0) & (x2 == 0), 1.0, similitud)
 
-edafologia = pd.read_csv('data/mun_edafologia.csv')
-edafologia["CVEGEO"] = edafologia["CVEGEO"].apply(normalizar_cvegeo)
 
-unidades_clima = pd.read_csv('data/mun_unidades_climaticas_final.csv')
-unidades_clima["CVEGEO"] = unidades_clima["CVEGEO"].apply(normalizar_cvegeo)
+def precip_vec(cat1, num1, cat2, num2):
+    """
+    Versión de precip() sobre valores ya interpretados con interpretar_valor().
+    Acepta escalares o arreglos (se aplica broadcasting).
+    """
+    ambos_numericos = (cat1 == CATEGORIA_NUMERICA) & (cat2 == CATEGORIA_NUMERICA)
+    misma_categoria = (cat1 == cat2) & (
+        (cat1 == CATEGORIA_NO_APLICA) | (cat1 == CATEGORIA_H2O)
+    )
+    similitud = np.where(ambos_numericos, similitud_proporcional_vec(num1, num2), 0.0)
+    return np.where(misma_categoria, 1.0, similitud)
 
-precipitacion = pd.read_csv('data/mun_precip_media_anual.csv')
-precipitacion["CVEGEO"] = precipitacion["CVEGEO"].apply(normalizar_cvegeo)
 
-temperatura = pd.read_csv('data/mun_temp_media_anual.csv')
-temperatura["CVEGEO"] = temperatura["CVEGEO"].apply(normalizar_cvegeo)
+# Comparadores de texto por componente y límite de filas guardadas en memoria.
+# Cada fila ocupa 8 bytes por valor distinto (≈12 KB en edafología).
+COMPARADORES_TEXTO = {
+    "edafologia": ("eda_valores", comparar_edafologia),
+    "topoforma": ("topo_valores", comparar_topoforma),
+}
+MAX_FILAS_CACHE_TEXTOS = 1024
 
-municipios = pd.read_parquet('data/tabla_municipios.parquet')
-municipios["CVEGEO"] = municipios["CVEGEO"].apply(normalizar_cvegeo)
+# Con pocos municipios por comparar (p. ej. al reordenar candidatos) conviene
+# compararlos directamente en lugar de calcular la fila completa: se hace si
+# son menos de 1/FRACCION_COMPARACION_DIRECTA de los valores distintos.
+FRACCION_COMPARACION_DIRECTA = 16
 
 
-# función para comparar 2 municipios
-def comparar_municipios(mun1, mun2):
+@registrar_cache
+@lru_cache(maxsize=MAX_FILAS_CACHE_TEXTOS)
+@instrumentar()
+def fila_similitud_textos(componente, base):
     """
-    Compara dos municipios usando todos los modelos parciales:
-    precipitación, temperatura, unidad climática, edafología y topoforma.
-    Retorna una similitud entre 0 y 1.
+    Similitud del valor distinto 'base' de un componente de texto
+    ("edafologia" o "topoforma") contra todos sus valores distintos.
+
+    Las filas se calculan la primera vez que se piden y se guardan en un
+    LRU acotado, así cada par de municipios cuesta una lectura por índice.
     """
+    # solo llega aquí cuando la fila no está en el LRU
+    contar(f"modelo.textos.{componente}.fallos")
+    llave, comparar = COMPARADORES_TEXTO[componente]
+    valores = obtener_arreglos_modelo()[llave]
+    fila = np.array([comparar(valores[base], v) for v in valores])
+    fila.setflags(write=False)
+    return fila
 
-    mun1 = normalizar_cvegeo(mun1)
-    mun2 = normalizar_cvegeo(mun2)
 
-    # -----------------------------
-    # 1. Extraer datos de cada DF
-    # -----------------------------
-
-    # Precipitación
-    fila_prec_m1 = precipitacion[precipitacion["CVEGEO"] == mun1]
-    fila_prec_m2 = precipitacion[precipitacion["CVEGEO"] == mun2]
-
-    # Temperatura
-    fila_temp_m1 = temperatura[temperatura["CVEGEO"] == mun1]
-    fila_temp_m2 = temperatura[temperatura["CVEGEO"] == mun2]
-
-    # Unidades climáticas
-    fila_uni_m1 = unidades_clima[unidades_clima["CVEGEO"] == mun1]
-    fila_uni_m2 = unidades_clima[unidades_clima["CVEGEO"] == mun2]
-    # Edafología
-    fila_eda_m1 = edafologia[edafologia["CVEGEO"] == mun1]
-    fila_eda_m2 = edafologia[edafologia["CVEGEO"] == mun2]
-
-    # Topoforma
-    fila_topo_m1 = topoforma[topoforma["CVEGEO"] == mun1]
-    fila_topo_m2 = topoforma[topoforma["CVEGEO"] == mun2]
-
-    # -----------------------------
-    # 2. Validar que existan datos
-    # -----------------------------
-    if fila_prec_m1.empty or fila_prec_m2.empty:
-        return None
-    if fila_temp_m1.empty or fila_temp_m2.empty:
-        return None
-    if fila_uni_m1.empty or fila_uni_m2.empty:
-        return None
-    if fila_eda_m1.empty or fila_eda_m2.empty:
+def estadisticas_cache_textos():
+    """
+    Regresa aciertos, fallos y ocupación del cache de similitudes de texto.
+    """
+    info = fila_similitud_textos.cache_info()
+    total = info.hits + info.misses
+    return {
+        "aciertos": info.hits,
+        "fallos": info.misses,
+        "tasa_aciertos": info.hits / total if total else 0.0,
+        "filas": info.currsize,
+        "max_filas": info.maxsize,
+    }
+
+
+def similitudes_textos(componente, codigos, i, indices):
+    """
+    Similitud de texto ("edafologia" o "topoforma") entre la posición i (o el
+    bloque de posiciones i) y las posiciones en 'indices', leída del cache
+    de filas por valor distinto (o comparada directamente si son pocas).
+    """
+    if np.ndim(i) == 0:
+        destino = codigos[indices]
+        llave, comparar = COMPARADORES_TEXTO[componente]
+        valores = obtener_arreglos_modelo()[llave]
+        if np.size(destino) * FRACCION_COMPARACION_DIRECTA < len(valores):
+            base = valores[codigos[i]]
+            return np.array([comparar(base, valores[k]) for k in destino], dtype=np.float64)
+        return fila_similitud_textos(componente, int(codigos[i]))[destino]
+    filas = np.stack([fila_similitud_textos(componente, int(k)) for k in codigos[i]])
+    return filas[:, codigos[indices]]
+
+
+def _base(i):
+    # posición escalar o columna de posiciones (bloque × 1) para broadcasting
+    return i if np.ndim(i) == 0 else np.asarray(i)[:, None]
+
+
+# Comparadores vectorizados: reciben los arreglos de obtener_arreglos_modelo(),
+# la posición (o bloque de posiciones) base y las posiciones a comparar.
+
+def comparar_precipitacion_vec(c, i, indices):
+    b = _base(i)
+    return precip_vec(c["prec_cat"][b], c["prec_num"][b], c["prec_cat"][indices], c["prec_num"][indices])
+
+
+def comparar_precipitacion_rango_vec(c, i, indices):
+    b = _base(i)
+    return precip_vec(
+        c["prec_rango_cat"][b], c["prec_rango_num"][b],
+        c["prec_rango_cat"][indices], c["prec_rango_num"][indices],
+    )
+
+
+def comparar_temperatura_vec(c, i, indices):
+    b = _base(i)
+    return precip_vec(c["temp_cat"][b], c["temp_num"][b], c["temp_cat"][indices], c["temp_num"][indices])
+
+
+def comparar_unidad_climatica_vec(c, i, indices):
+    return similitud_proporcional_vec(c["tipo_n"][_base(i)], c["tipo_n"][indices])
+
+
+def comparar_edafologia_vec(c, i, indices):
+    return similitudes_textos("edafologia", c["eda_cod"], i, indices)
+
+
+def comparar_topoforma_vec(c, i, indices):
+    return similitudes_textos("topoforma", c["topo_cod"], i, indices)
+
+
+# Componentes disponibles para armar una especificación
+COMPARADORES_VEC = {
+    "precipitacion": comparar_precipitacion_vec,
+    "precipitacion_rango": comparar_precipitacion_rango_vec,
+    "temperatura": comparar_temperatura_vec,
+    "unidad_climatica": comparar_unidad_climatica_vec,
+    "edafologia": comparar_edafologia_vec,
+    "topoforma": comparar_topoforma_vec,
+}
+
+# Arreglos de obtener_arreglos_modelo() que definen el valor de cada componente
+COLUMNAS_COMPONENTE = {
+    "precipitacion": ("prec_cat", "prec_num"),
+    "precipitacion_rango": ("prec_rango_cat", "prec_rango_num"),
+    "temperatura": ("temp_cat", "temp_num"),
+    "unidad_climatica": ("tipo_n",),
+    "edafologia": ("eda_cod",),
+    "topoforma": ("topo_cod",),
+}
+
+
+def crear_especificacion(pesos):
+    """
+    Arma una especificación del modelo a partir de un diccionario
+    componente -> peso (componentes de COMPARADORES_VEC).
+
+    Una especificación es una lista de diccionarios con "nombre",
+    "comparador" y "peso"; la similitud es el promedio ponderado de los
+    componentes. Un peso 0 calcula el componente sin que entre al promedio.
+    """
+    desconocidos = set(pesos) - set(COMPARADORES_VEC)
+    if desconocidos:
+        raise ValueError(f"Componentes desconocidos: {sorted(desconocidos)}")
+    if sum(pesos.values()) <= 0:
+        raise ValueError("La suma de los pesos debe ser mayor que 0")
+    return [
+        {"nombre": nombre, "comparador": COMPARADORES_VEC[nombre], "peso": peso}
+        for nombre, peso in pesos.items()
+    ]
+
+
+# Especificación de modelo_gral(): cinco componentes con el mismo peso
+ESPECIFICACION_GENERAL = crear_especificacion({
+    "precipitacion": 1,
+    "temperatura": 1,
+    "unidad_climatica": 1,
+    "edafologia": 1,
+    "topoforma": 1,
+})
+
+# La del detalle agrega la precipitación por rango solo como referencia
+ESPECIFICACION_DETALLE = crear_especificacion({
+    **{componente["nombre"]: componente["peso"] for componente in ESPECIFICACION_GENERAL},
+    "precipitacion_rango": 0,
+})
+
+
+def similitudes_por_componente(i, indices=None, especificacion=None):
+    """
+    Calcula las similitudes de cada componente de la especificación
+    (ESPECIFICACION_GENERAL si es None) entre el municipio en la posición i
+    y los municipios en 'indices' (todos si es None).
+    Las posiciones son las de obtener_arreglos_modelo().
+
+    Si i es un arreglo de posiciones (un bloque de filas), cada componente
+    es una matriz len(i) × len(indices).
+
+    Regresa un diccionario componente -> arreglo; con la especificación
+    general: precipitacion, temperatura, unidad_climatica, edafologia y topoforma.
+    """
+    c = obtener_arreglos_modelo()
+    if indices is None:
+        indices = slice(None)
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+
+    destinos = len(c["cvegeo"]) if isinstance(indices, slice) else np.size(indices)
+    contar("modelo.pares_comparados", np.size(i) * destinos)
+    componentes = {}
+    for componente in especificacion:
+        with medir(f"calculos.modelo.componente.{componente['nombre']}"):
+            componentes[componente["nombre"]] = componente["comparador"](c, i, indices)
+    return componentes
+
+
+def integrar_componentes(componentes, especificacion=None):
+    """
+    Promedio ponderado de las similitudes parciales según la especificación.
+    Con ESPECIFICACION_GENERAL da exactamente lo mismo que modelo_gral().
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+
+    total = 0
+    for componente in especificacion:
+        if componente["peso"]:
+            total = total + componente["peso"] * componentes[componente["nombre"]]
+    return total / sum(componente["peso"] for componente in especificacion)
+
+
+def evaluar_modelo(i, indices=None, especificacion=None):
+    """
+    Evalúa la especificación en una sola pasada.
+
+    Regresa (similitud, componentes): la similitud ponderada y una matriz
+    con una fila por componente, en el orden de la especificación
+    (componentes × N, o componentes × bloque × N si i es un bloque).
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+    componentes = similitudes_por_componente(i, indices, especificacion)
+    matriz = np.stack([componentes[componente["nombre"]] for componente in especificacion])
+    return integrar_componentes(componentes, especificacion), matriz
+
+
+def desglose_similitud(mun, otros=None, especificacion=None):
+    """
+    Regresa un DataFrame indexado por CVEGEO de 'otros' (todos si es None)
+    con una columna por componente y la columna "Similitud", o None si el
+    municipio base no tiene datos completos. Los municipios de 'otros' sin
+    datos completos se omiten.
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_GENERAL
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
         return None
-    if fila_topo_m1.empty or fila_topo_m2.empty:
+
+    if otros is None:
+        indices = np.arange(len(c["cvegeo"]))
+    else:
+        indices = [c["posicion"][cve] for cve in map(normalizar_cvegeo, otros) if cve in c["posicion"]]
+        indices = np.asarray(indices, dtype=np.int64)
+
+    similitud, matriz = evaluar_modelo(i, indices, especificacion)
+    tabla = pd.DataFrame(
+        matriz.T,
+        index=pd.Index(c["cvegeo"][indices], name="CVEGEO"),
+        columns=[componente["nombre"] for componente in especificacion],
+    )
+    tabla["Similitud"] = similitud
+    return tabla
+
+
+# Columna de obtener_caracteristicas() que se muestra como valor de cada
+# componente en el detalle (la misma que en comparar_municipios_detallado)
+VARIABLES_DETALLE = {
+    "precipitacion": "prec_CLAVE",
+    "precipitacion_rango": "prec_RANGOS",
+    "temperatura": "temp_RANGOS",
+    "unidad_climatica": "uni_TIPO_N",
+    "edafologia": "ed_TEXTO",
+    "topoforma": "topo_CLAVE",
+}
+
+
+def desglose_detallado(mun, otros, especificacion=None):
+    """
+    desglose_similitud() con los valores de cada componente: por componente
+    las columnas "<componente>" (similitud), "<componente>_base" y
+    "<componente>_otro" (valor de VARIABLES_DETALLE), y "Similitud".
+    Una fila por municipio de 'otros' con datos completos, o None si la
+    base no tiene datos completos.
+    """
+    if especificacion is None:
+        especificacion = ESPECIFICACION_DETALLE
+    desglose = desglose_similitud(mun, otros, especificacion)
+    if desglose is None:
         return None
 
+    caracteristicas = obtener_caracteristicas()
+    base = caracteristicas.loc[normalizar_cvegeo(mun)]
+    valores_otros = caracteristicas.reindex(desglose.index)
 
-    # -----------------------------
-    # 3. Obtener valores limpios
-    # -----------------------------
+    columnas = {}
+    for componente in especificacion:
+        nombre = componente["nombre"]
+        variable = VARIABLES_DETALLE[nombre]
+        columnas[nombre] = desglose[nombre]
+        columnas[f"{nombre}_base"] = pd.Series(base[variable], index=desglose.index, dtype=object)
+        columnas[f"{nombre}_otro"] = valores_otros[variable].astype(object)
+    columnas["Similitud"] = desglose["Similitud"]
+    return pd.DataFrame(columnas, index=desglose.index)
 
-    # Suponiendo nombre de columnas:
-    v1_prec = fila_prec_m1.iloc[0]["CLAVE"]
-    v2_prec = fila_prec_m2.iloc[0]["CLAVE"]
 
-    v1_prec_2 = fila_prec_m1.iloc[0]["RANGOS"]
-    v2_prec_2 = fila_prec_m2.iloc[0]["RANGOS"]
+# función para comparar 2 municipios
+@instrumentar()
+def comparar_municipios(mun1, mun2, especificacion=None):
+    """
+    Compara dos municipios usando todos los modelos parciales:
+    precipitación, temperatura, unidad climática, edafología y topoforma
+    (o los de 'especificacion').
+    Retorna una similitud entre 0 y 1.
+    """
+    posicion = obtener_arreglos_modelo()["posicion"]
+    i = posicion.get(normalizar_cvegeo(mun1))
+    j = posicion.get(normalizar_cvegeo(mun2))
 
+    # Sin datos completos en alguno de los municipios
+    if i is None or j is None:
+        return None
 
-    v1_temp = fila_temp_m1.iloc[0]["RANGOS"]
-    v2_temp = fila_temp_m2.iloc[0]["RANGOS"]
+    similitud, _ = evaluar_modelo(i, [j], especificacion)
+    return float(similitud[0])
 
-    v1_uni  = fila_uni_m1.iloc[0]["TIPO_N"]
-    v2_uni  = fila_uni_m2.iloc[0]["TIPO_N"]
 
-    v1_eda = unir_edafologia(fila_eda_m1.iloc[0])
-    v2_eda = unir_edafologia(fila_eda_m2.iloc[0])
+@instrumentar()
+def comparar_municipio_contra_todos(mun, especificacion=None):
+    """
+    Compara un municipio contra todos los municipios en una sola pasada.
 
-    v1_topo = fila_topo_m1.iloc[0]["CLAVE"]
-    v2_topo = fila_topo_m2.iloc[0]["CLAVE"]
+    Da los mismos valores que comparar_municipios(mun, otro) para cada otro
+    municipio, pero con los datos ya unidos e interpretados.
+    Regresa una Serie "Similitud" indexada por CVEGEO (incluye al propio
+    municipio) o None si el municipio no tiene datos completos.
+    """
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
+        return None
 
+    integracion, _ = evaluar_modelo(i, especificacion=especificacion)
 
-    # -----------------------------
-    # 4. Llamar al modelo general
-    # -----------------------------
-    similitud = modelo_gral(
-        v1_prec, v2_prec,
-        v1_temp, v2_temp,
-        v1_uni,  v2_uni,
-        v1_eda,  v2_eda,
-        v1_topo, v2_topo
-    )
+    return pd.Series(integracion, index=c["cvegeo"], name="Similitud")
 
-    return similitud
 
 def comparar_municipios_detallado(mun1, mun2):
     """
     Compara dos municipios y muestra de forma detallada
     la similitud variable por variable.
     """
+    caracteristicas = obtener_caracteristicas()
+    mun1 = normalizar_cvegeo(mun1)
+    mun2 = normalizar_cvegeo(mun2)
 
-    fila_prec_m1 = precipitacion[precipitacion["CVEGEO"] == mun1]
-    fila_prec_m2 = precipitacion[precipitacion["CVEGEO"] == mun2]
-
-    fila_temp_m1 = temperatura[temperatura["CVEGEO"] == mun1]
-    fila_temp_m2 = temperatura[temperatura["CVEGEO"] == mun2]
-    fila_uni_m1 = unidades_clima[unidades_clima["CVEGEO"] == mun1]
-    fila_uni_m2 = unidades_clima[unidades_clima["CVEGEO"] == mun2]
-
-    fila_eda_m1 = edafologia[edafologia["CVEGEO"] == mun1]
-    fila_eda_m2 = edafologia[edafologia["CVEGEO"] == mun2]
+    if mun1 not in caracteristicas.index or mun2 not in caracteristicas.index:
+        print("No hay datos del municipio.")
+        return
 
-    fila_topo_m1 = topoforma[topoforma["CVEGEO"] == mun1]
-    fila_topo_m2 = topoforma[topoforma["CVEGEO"] == mun2]
+    f1 = caracteristicas.loc[mun1]
+    f2 = caracteristicas.loc[mun2]
 
     # Validaciones
-    if fila_prec_m1.empty or fila_prec_m2.empty:
+    if not (f1["prec_presente"] and f2["prec_presente"]):
         print("No hay datos de precipitación.")
         return
-    if fila_temp_m1.empty or fila_temp_m2.empty:
+    if not (f1["temp_presente"] and f2["temp_presente"]):
         print("No hay datos de temperatura.")
         return
-    if fila_uni_m1.empty or fila_uni_m2.empty:
+    if not (f1["uni_presente"] and f2["uni_presente"]):
         print("No hay datos de unidad climática.")
         return
-    if fila_eda_m1.empty or fila_eda_m2.empty:
+    if not (f1["ed_presente"] and f2["ed_presente"]):
         print("No hay datos de edafología.")
         return
-    if fila_topo_m1.empty or fila_topo_m2.empty:
+    if not (f1["topo_presente"] and f2["topo_presente"]):
         print("No hay datos de topoforma.")
         return
 
     # ---- EXTRAER VARIABLES ----
-    v1_prec_1 = fila_prec_m1.iloc[0]["CLAVE"]
-    v2_prec_1 = fila_prec_m2.iloc[0]["CLAVE"]
+    v1_prec_1 = f1["prec_CLAVE"]
+    v2_prec_1 = f2["prec_CLAVE"]
 
-    v1_prec_2 = fila_prec_m1.iloc[0]["RANGOS"]
-    v2_prec_2 = fila_prec_m2.iloc[0]["RANGOS"]
+    v1_prec_2 = f1["prec_RANGOS"]
+    v2_prec_2 = f2["prec_RANGOS"]
 
-    v1_temp = fila_temp_m1.iloc[0]["RANGOS"]
-    v2_temp = fila_temp_m2.iloc[0]["RANGOS"]
+    v1_temp = f1["temp_RANGOS"]
+    v2_temp = f2["temp_RANGOS"]
 
-    v1_uni = fila_uni_m1.iloc[0]["TIPO_N"]
-    v2_uni = fila_uni_m2.iloc[0]["TIPO_N"]
+    v1_uni = f1["uni_TIPO_N"]
+    v2_uni = f2["uni_TIPO_N"]
 
     # Campos múltiples concatenados para texto grande
-    v1_eda = " ".join([
-        str(fila_eda_m1.iloc[0]["CLAVE_WRB"]),
-        str(fila_eda_m1.iloc[0]["GRUPO1"]),
-        str(fila_eda_m1.iloc[0]["GRUPO2"]),
-        str(fila_eda_m1.iloc[0]["GRUPO3"]),
-        str(fila_eda_m1.iloc[0]["CLASE_TEXT"]),
-        str(fila_eda_m1.iloc[0]["FRUDICA"])
-    ])
-
-    v2_eda = " ".join([
-        str(fila_eda_m2.iloc[0]["CLAVE_WRB"]),
-        str(fila_eda_m2.iloc[0]["GRUPO1"]),
-        str(fila_eda_m2.iloc[0]["GRUPO2"]),
-        str(fila_eda_m2.iloc[0]["GRUPO3"]),
-        str(fila_eda_m2.iloc[0]["CLASE_TEXT"]),
-        str(fila_eda_m2.iloc[0]["FRUDICA"])
-    ])
-
-    v1_topo = fila_topo_m1.iloc[0]["CLAVE"]
-    v2_topo = fila_topo_m2.iloc[0]["CLAVE"]
+    v1_eda = f1["ed_TEXTO"]
+    v2_eda = f2["ed_TEXTO"]
+
+    v1_topo = f1["topo_CLAVE"]
+    v2_topo = f2["topo_CLAVE"]
 
     # ---- CALCULAR SIMILITUDES ----
-    sim_prec_1 = precip(v1_prec_1, v2_prec_1)
-    sim_prec_2 = precip(v1_prec_2, v2_prec_2)
-    sim_temp = precip(v1_temp, v2_temp)
-    sim_uni = similitud_proporcional(v1_uni, v2_uni)
-    sim_eda = comparar_edafologia(v1_eda, v2_eda)
-    sim_topo = comparar_topoforma(v1_topo, v2_topo)
-
-    sim_final = (
-        sim_prec_1 + sim_prec_2 + sim_temp + sim_uni + sim_eda + sim_topo
-    ) / 6
-    # Convertir lista a string
+    # Misma evaluación que el modelo general; la precipitación por rango
+    # se muestra pero no entra al promedio
+    desglose = desglose_similitud(mun1, [mun2], ESPECIFICACION_DETALLE).iloc[0]
+    sim_prec_1 = desglose["precipitacion"]
+    sim_prec_2 = desglose["precipitacion_rango"]
+    sim_temp = desglose["temperatura"]
+    sim_uni = desglose["unidad_climatica"]
+    sim_eda = desglose["edafologia"]
+    sim_topo = desglose["topoforma"]
+    sim_final = desglose["Similitud"]
 
     # ---- construir salida en texto ----
     salida = f"""
@@ -370,7 +560,7 @@ Comparación entre {mun1} y {mun2}
 ============================================
 
 PRECIPITACIÓN (CLAVE): {v1_prec_1} vs {v2_prec_1} → {sim_prec_1:.3f}
-PRECIPITACIÓN (RANGO): {v1_prec_2} vs {v2_prec_2} → {sim_prec_2:.3f}
+PRECIPITACIÓN (RANGO): {v1_prec_2} vs {v2_prec_2} → {sim_prec_2:.3f} (no entra en el promedio)
 TEMPERATURA: {v1_temp} vs {v2_temp} → {sim_temp:.3f}
 UNIDAD CLIMÁTICA: {v1_uni} vs {v2_uni} → {sim_uni:.3f}
 
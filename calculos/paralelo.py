@@ -0,0 +1,251 @@
+#comando para medir la escalabilidad: python -m calculos.paralelo --trabajadores 1 2 4 8
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import obtener_arreglos_modelo
+from calculos.aez_comp import mejores_cultivos_por_municipios, obtener_indice_aptitud
+from calculos.modelo import integrar_componentes, normalizar_cvegeo, similitudes_por_componente
+from calculos.vecinos import calcular_bloque, vecinos_por_bloques
+
+# Ejecución en varios procesos de los cálculos en lote: uno contra todos,
+# todos contra todos (vecinos) y recomendaciones AEZ de muchos municipios.
+#
+# Los arreglos del modelo y el índice de aptitud se copian una vez a memoria
+# compartida; cada proceso trabajador los usa directamente desde ahí (ver
+# cache_datos.fijar), así no se copian ni se envían DataFrames a cada tarea.
+# Las tareas solo llevan posiciones y los resultados son arreglos chicos.
+
+# Procesos trabajadores y municipios por tarea
+TRABAJADORES = int(os.environ.get("AGRO_TRABAJADORES", os.cpu_count() or 1))
+TAM_TAREA = int(os.environ.get("AGRO_TAM_TAREA", 256))
+
+# Estructuras que se pueden compartir: nombre -> función con cache_datos
+COMPARTIBLES = {
+    "arreglos_modelo": obtener_arreglos_modelo,
+    "indice_aptitud": obtener_indice_aptitud,
+}
+
+# Diccionarios valor -> posición: se reconstruyen en cada proceso a partir
+# del arreglo indicado en vez de copiarse
+POSICIONES = {"posicion": "cvegeo", "posicion_cultivo": "cultivos"}
+
+# Memoria compartida abierta por este proceso trabajador
+_bloques_trabajador = []
+
+
+def compartir(estructura):
+    """
+    Copia los arreglos de un diccionario a memoria compartida.
+
+    Regresa (descripcion, bloques): la descripción, que se envía a los
+    procesos para que abran los arreglos, y los bloques de memoria, que el
+    proceso dueño debe cerrar y liberar al terminar.
+    """
+    descripcion = {}
+    bloques = []
+    for llave, valor in estructura.items():
+        if llave in POSICIONES:
+            descripcion[llave] = ("posiciones", POSICIONES[llave])
+        elif isinstance(valor, np.ndarray):
+            texto = valor.dtype == object
+            arreglo = valor.astype(str) if texto else valor
+            bloque = SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+            np.ndarray(arreglo.shape, arreglo.dtype, buffer=bloque.buf)[...] = arreglo
+            bloques.append(bloque)
+            descripcion[llave] = ("compartido", bloque.name, arreglo.dtype.str, arreglo.shape, texto)
+        else:
+            # listas de textos y valores chicos
+            descripcion[llave] = ("valor", valor)
+    return descripcion, bloques
+
+
+def abrir_compartido(descripcion):
+    """
+    Reconstruye en un proceso trabajador el diccionario descrito por
+    compartir(). Regresa (estructura, bloques).
+    """
+    estructura = {}
+    bloques = []
+    for llave, (tipo, *datos) in descripcion.items():
+        if tipo == "compartido":
+            nombre, dtype, forma, texto = datos
+            # con "spawn" los procesos usan el resource tracker del padre,
+            # que libera la memoria cuando el dueño hace unlink()
+            bloque = SharedMemory(name=nombre)
+            arreglo = np.ndarray(forma, np.dtype(dtype), buffer=bloque.buf)
+            arreglo.setflags(write=False)
+            estructura[llave] = arreglo.astype(object) if texto else arreglo
+            bloques.append(bloque)
+        elif tipo == "valor":
+            estructura[llave] = datos[0]
+    for llave, (tipo, *datos) in descripcion.items():
+        if tipo == "posiciones":
+            estructura[llave] = {valor: i for i, valor in enumerate(estructura[datos[0]].tolist())}
+    return estructura, bloques
+
+
+def _iniciar_trabajador(descripciones):
+    for nombre, descripcion in descripciones.items():
+        estructura, bloques = abrir_compartido(descripcion)
+        _bloques_trabajador.extend(bloques)
+        COMPARTIBLES[nombre].fijar(estructura)
+
+
+class GrupoTrabajadores:
+    """
+    Procesos trabajadores con las estructuras indicadas en memoria
+    compartida. Se usa con 'with' para cerrar los procesos y liberar la
+    memoria al terminar:
+
+        with GrupoTrabajadores(8) as grupo:
+            vecinos = list(vecinos_por_bloques(20, grupo=grupo))
+    """
+
+    def __init__(self, trabajadores=None, compartidos=("arreglos_modelo",)):
+        self.trabajadores = trabajadores or TRABAJADORES
+        self._bloques = []
+        descripciones = {}
+        for nombre in compartidos:
+            descripciones[nombre], bloques = compartir(COMPARTIBLES[nombre]())
+            self._bloques += bloques
+        # "spawn": procesos nuevos, sin heredar hilos ni estado del padre
+        self.pool = ProcessPoolExecutor(
+            self.trabajadores, mp_context=get_context("spawn"),
+            initializer=_iniciar_trabajador, initargs=(descripciones,),
+        )
+
+    def mapear(self, funcion, tareas):
+        """
+        Iterador con funcion(tarea) para cada tarea, en el mismo orden.
+        """
+        return self.pool.map(funcion, tareas)
+
+    def calentar(self):
+        """
+        Arranca todos los procesos (importan los módulos y abren la memoria
+        compartida), para no contar ese tiempo en la primera tarea.
+        """
+        list(self.mapear(time.sleep, [0.1] * self.trabajadores))
+        return self
+
+    def cerrar(self):
+        self.pool.shutdown(cancel_futures=True)
+        for bloque in self._bloques:
+            bloque.close()
+            bloque.unlink()
+        self._bloques = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+def _similitud_columnas(tarea):
+    i, inicio, fin = tarea
+    return integrar_componentes(similitudes_por_componente(i, np.arange(inicio, fin)))
+
+
+def comparar_contra_todos_paralelo(mun, grupo, tam_tarea=None):
+    """
+    comparar_municipio_contra_todos() repartiendo las columnas entre los
+    procesos del grupo (tam_tarea columnas por tarea; por omisión, partes
+    iguales). Regresa una Serie "Similitud" indexada por CVEGEO, o None.
+    """
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
+        return None
+
+    n = len(c["cvegeo"])
+    tam_tarea = tam_tarea or -(-n // grupo.trabajadores)
+    tareas = [(i, inicio, min(inicio + tam_tarea, n)) for inicio in range(0, n, tam_tarea)]
+    similitud = np.concatenate(list(grupo.mapear(_similitud_columnas, tareas)))
+    return pd.Series(similitud, index=c["cvegeo"], name="Similitud")
+
+
+def vecinos_paralelo(grupo, k=20, tam_tarea=TAM_TAREA, tam_columnas=None):
+    """
+    Todos contra todos: DataFrame largo con los k vecinos de cada
+    municipio (ver calculos.vecinos), con tam_tarea filas por tarea.
+    """
+    return pd.concat(vecinos_por_bloques(k, tam_tarea, tam_columnas, grupo=grupo), ignore_index=True)
+
+
+def _mejores_cultivos(tarea):
+    lista_cvegeo, top_n = tarea
+    return mejores_cultivos_por_municipios(lista_cvegeo, top_n)
+
+
+def mejores_cultivos_paralelo(lista_cvegeo, grupo, top_n=5, tam_tarea=TAM_TAREA):
+    """
+    mejores_cultivos_por_municipios() para muchos municipios, tam_tarea
+    municipios por tarea. El grupo debe compartir "indice_aptitud".
+    """
+    lista_cvegeo = list(lista_cvegeo)
+    tareas = [
+        (lista_cvegeo[inicio:inicio + tam_tarea], top_n)
+        for inicio in range(0, len(lista_cvegeo), tam_tarea)
+    ]
+    return pd.concat(grupo.mapear(_mejores_cultivos, tareas), ignore_index=True)
+
+
+def medir_escalabilidad(lista_trabajadores, filas=None, k=20, tam_tarea=64):
+    """
+    Mide el todos contra todos de las primeras 'filas' posiciones (todas si
+    es None) en un proceso y con cada número de trabajadores.
+
+    Regresa una lista de diccionarios con trabajadores, segundos, aceleración
+    (contra un proceso sin pool) y eficiencia (aceleración / trabajadores).
+    El arranque de los procesos no se cuenta.
+    """
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    filas = min(filas or n, n)
+    tareas = [(inicio, min(inicio + tam_tarea, filas), k, None) for inicio in range(0, filas, tam_tarea)]
+
+    inicio = time.perf_counter()
+    for tarea in tareas:
+        calcular_bloque(tarea)
+    base = time.perf_counter() - inicio
+
+    resultados = [{"trabajadores": 0, "segundos": base, "aceleracion": 1.0, "eficiencia": None}]
+    for trabajadores in lista_trabajadores:
+        with GrupoTrabajadores(trabajadores) as grupo:
+            grupo.calentar()
+            inicio = time.perf_counter()
+            list(grupo.mapear(calcular_bloque, tareas))
+            segundos = time.perf_counter() - inicio
+        resultados.append({
+            "trabajadores": trabajadores,
+            "segundos": segundos,
+            "aceleracion": base / segundos,
+            "eficiencia": base / segundos / trabajadores,
+        })
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mide la escalabilidad del cálculo de vecinos en varios procesos."
+    )
+    parser.add_argument("--trabajadores", type=int, nargs="+", default=[TRABAJADORES])
+    parser.add_argument("--filas", type=int, help="municipios a calcular (por omisión, todos)")
+    parser.add_argument("--tam-tarea", type=int, default=64, help="municipios por tarea")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    for r in medir_escalabilidad(args.trabajadores, args.filas, args.k, args.tam_tarea):
+        if r["trabajadores"] == 0:
+            print(f"un proceso, sin pool: {r['segundos']:.2f} s")
+        else:
+            print(
+                f"{r['trabajadores']:>3} trabajadores: {r['segundos']:.2f} s, "
+                f"aceleración {r['aceleracion']:.2f}×, eficiencia {r['eficiencia']:.0%}"
+            )
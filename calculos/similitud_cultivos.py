@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from data.acceso_data import cache_datos, cargar_tabla, obtener_arreglos_modelo
+from data.caracteristicas import normalizar_cvegeo
+from calculos.aez_comp import obtener_indice_aptitud, obtener_matriz_cultivos
+from calculos.matriz_similitud import top_k
+from calculos.modelo import evaluar_modelo
+
+# Similitud "parecido y siembra cosas parecidas": el modelo ambiental
+# (calculos.modelo) combinado con la similitud del portafolio de cultivos
+# del cierre agrícola y la de los vectores de aptitud AEZ.
+#
+# Los perfiles son matrices dispersas (CSR) con las filas en el orden de
+# obtener_arreglos_modelo(), así un municipio (o un bloque) contra todos es
+# un producto de matriz dispersa por su transpuesta y se combina elemento a
+# elemento con la similitud ambiental.
+
+# Pesos de cada parte en la similitud combinada
+PESOS_CULTIVOS = {"ambiente": 0.5, "cultivos": 0.3, "aptitud": 0.2}
+
+# Medidas del portafolio: Jaccard sobre los cultivos sembrados, o coseno
+# sobre la superficie sembrada de cada cultivo
+MEDIDAS_CULTIVOS = ("jaccard", "coseno")
+
+
+def _en_orden_del_modelo(valores, filas, columnas, num_columnas):
+    """
+    CSR (municipios del modelo × num_columnas) a partir de triples; las
+    filas son CVEGEO y se omiten las que no están en el modelo.
+    """
+    posicion = obtener_arreglos_modelo()["posicion"]
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    i = np.array([posicion.get(cve, -1) for cve in filas], dtype=np.int64)
+    hay = (i >= 0) & (np.asarray(valores) != 0)
+    return sparse.csr_matrix(
+        (np.asarray(valores, dtype=np.float64)[hay], (i[hay], np.asarray(columnas)[hay])),
+        shape=(n, num_columnas),
+    )
+
+
+def _normalizar_filas(matriz):
+    # filas de norma 1 (las vacías se quedan en cero)
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+    return sparse.diags(inversas) @ matriz
+
+
+@cache_datos
+def obtener_perfiles_cultivos():
+    """
+    Regresa un diccionario con matrices CSR (municipios del modelo × cultivos):
+    - "presencia": 1 si el municipio tiene registros del cultivo
+    - "superficie": superficie sembrada (todos los años), filas de norma 1
+    - "aptitud": aptitud AEZ (0 sin dato), filas de norma 1
+    y "n_cultivos" / "con_aptitud": cultivos sembrados y si hay aptitud AEZ
+    por municipio.
+    """
+    m = obtener_matriz_cultivos()
+    filas, columnas = np.nonzero(m["matriz"])
+    presencia = _en_orden_del_modelo(np.ones(len(filas)), m["cvegeo"][filas], columnas, len(m["cultivos"]))
+
+    df = cargar_tabla("tabla_cierre_agricola")[["CVEGEO", "Idcultivo", "Sembrada"]]
+    df = df.assign(CVEGEO=df["CVEGEO"].map(normalizar_cvegeo))
+    sembrada = df.groupby(["CVEGEO", "Idcultivo"], observed=True)["Sembrada"].sum()
+    superficie = _en_orden_del_modelo(
+        sembrada.fillna(0).to_numpy(),
+        sembrada.index.get_level_values("CVEGEO"),
+        pd.Index(m["cultivos"]).get_indexer(sembrada.index.get_level_values("Idcultivo")),
+        len(m["cultivos"]),
+    )
+
+    indice = obtener_indice_aptitud()
+    filas, columnas = np.nonzero(~np.isnan(indice["aptitud"]))
+    aptitud = _en_orden_del_modelo(
+        indice["aptitud"][filas, columnas], indice["cvegeo"][filas], columnas, len(indice["cultivos"])
+    )
+
+    return {
+        "presencia": presencia,
+        "superficie": _normalizar_filas(superficie),
+        "aptitud": _normalizar_filas(aptitud),
+        "n_cultivos": np.asarray(presencia.sum(axis=1)).ravel(),
+        "con_aptitud": np.diff(aptitud.indptr) > 0,
+    }
+
+
+def similitud_cultivos(i, medida="jaccard"):
+    """
+    Similitud del portafolio de cultivos entre el municipio en la posición
+    i (o un bloque de posiciones) y todos los del modelo. NaN si alguno de
+    los dos no tiene cultivos registrados.
+    """
+    if medida not in MEDIDAS_CULTIVOS:
+        raise ValueError(f"Medida de cultivos desconocida: {medida}")
+    p = obtener_perfiles_cultivos()
+    filas = np.atleast_1d(i)
+
+    if medida == "jaccard":
+        comunes = (p["presencia"][filas] @ p["presencia"].T).toarray()
+        union = p["n_cultivos"][filas, None] + p["n_cultivos"][None, :] - comunes
+        similitud = np.divide(comunes, union, out=np.zeros_like(comunes), where=union > 0)
+    else:
+        similitud = (p["superficie"][filas] @ p["superficie"].T).toarray()
+
+    sin_datos = (p["n_cultivos"][filas, None] == 0) | (p["n_cultivos"][None, :] == 0)
+    similitud[sin_datos] = np.nan
+    return similitud if np.ndim(i) else similitud[0]
+
+
+def similitud_aptitud(i):
+    """
+    Coseno entre los vectores de aptitud AEZ del municipio en la posición i
+    (o un bloque) y todos los del modelo. NaN si alguno no tiene aptitud.
+    """
+    p = obtener_perfiles_cultivos()
+    filas = np.atleast_1d(i)
+    similitud = (p["aptitud"][filas] @ p["aptitud"].T).toarray()
+    similitud[~(p["con_aptitud"][filas, None] & p["con_aptitud"][None, :])] = np.nan
+    return similitud if np.ndim(i) else similitud[0]
+
+
+def similitud_combinada(i, pesos=None, medida="jaccard", especificacion=None):
+    """
+    Promedio ponderado (PESOS_CULTIVOS si es None) de la similitud
+    ambiental, la de cultivos y la de aptitud entre la posición i (o un
+    bloque) y todos los municipios del modelo. Una parte sin datos (NaN)
+    cuenta como similitud 0: un municipio sin cultivos registrados no sube
+    en el ranking por faltarle la parte de cultivos.
+
+    Regresa (similitud, partes) con partes un diccionario parte -> arreglo.
+    """
+    if pesos is None:
+        pesos = PESOS_CULTIVOS
+    desconocidas = set(pesos) - set(PESOS_CULTIVOS)
+    if desconocidas:
+        raise ValueError(f"Partes desconocidas: {sorted(desconocidas)}")
+    if sum(pesos.values()) <= 0:
+        raise ValueError("La suma de los pesos debe ser mayor que 0")
+
+    partes = {
+        "ambiente": evaluar_modelo(i, especificacion=especificacion)[0],
+        "cultivos": similitud_cultivos(i, medida),
+        "aptitud": similitud_aptitud(i),
+    }
+    total = 0
+    for nombre, peso in pesos.items():
+        if peso:
+            total = total + peso * np.nan_to_num(partes[nombre], nan=0.0)
+    return total / sum(pesos.values()), partes
+
+
+def comparar_con_cultivos_contra_todos(mun, pesos=None, medida="jaccard"):
+    """
+    DataFrame indexado por CVEGEO (todos los del modelo, incluido 'mun')
+    con "ambiente", "cultivos", "aptitud" y "Similitud" (la combinada), o
+    None si el municipio no tiene datos completos.
+    """
+    c = obtener_arreglos_modelo()
+    i = c["posicion"].get(normalizar_cvegeo(mun))
+    if i is None:
+        return None
+    similitud, partes = similitud_combinada(i, pesos, medida)
+    tabla = pd.DataFrame(partes, index=pd.Index(c["cvegeo"], name="CVEGEO"))
+    tabla["Similitud"] = similitud
+    return tabla
+
+
+def municipios_similares_con_cultivos(mun, k=10, pesos=None, medida="jaccard"):
+    """
+    Los k municipios (sin incluir a 'mun') con mayor similitud combinada,
+    de mayor a menor: DataFrame como comparar_con_cultivos_contra_todos(),
+    o None si el municipio no tiene datos completos.
+    """
+    tabla = comparar_con_cultivos_contra_todos(mun, pesos, medida)
+    if tabla is None:
+        return None
+    i = tabla.index.get_loc(normalizar_cvegeo(mun))
+    mejores = top_k(tabla["Similitud"].to_numpy(), tabla.index, k, excluir=i)
+    return tabla.loc[mejores.index]
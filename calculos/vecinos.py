@@ -0,0 +1,317 @@
+#comando para exportar vecinos: python -m calculos.vecinos --k 20 --salida data/vecinos_top20.parquet
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data.acceso_data import obtener_arreglos_modelo
+from calculos.modelo import MAX_FILAS_CACHE_TEXTOS, integrar_componentes, similitudes_por_componente
+from calculos.matriz_similitud import VERSION_MODELO, hash_datos
+
+# Exportación en lote de los k municipios más similares a cada municipio.
+# Se calcula por bloques de filas (bloque × N a la vez) y cada bloque se
+# escribe en cuanto está listo, sin guardar la matriz completa.
+#
+# Para muchas unidades (localidades, celdas) un bloque × N ya no cabe en
+# memoria: con un tope de memoria cada bloque de filas se recorre también
+# por bloques de columnas y se guarda solo el top-k acumulado de cada fila.
+# Con una carpeta de avance, cada bloque de filas terminado se guarda en
+# disco y una corrida interrumpida continúa donde se quedó.
+
+COLUMNAS = ["CVEGEO", "RANGO", "CVEGEO_VECINO", "SIMILITUD"]
+
+# Bytes por par (fila, columna) al calcular un bloque: los componentes en
+# float64, la mezcla y la selección del top-k (medido: ~56, con holgura)
+BYTES_POR_PAR = 96
+
+# Columnas mínimas por bloque antes de reducir las filas del bloque
+MIN_COLUMNAS = 1024
+
+
+def seleccionar_top_k(similitudes, columnas, k):
+    """
+    Los k mayores de cada fila de 'similitudes' (columnas: posición de cada
+    columna), de mayor a menor similitud y, a igual similitud, el de menor
+    posición, igual que unir_top_k(). Los empates en el límite del top-k
+    entran todos como candidatos antes de desempatar.
+
+    Regresa (vecinos, valores), dos matrices filas × k.
+    """
+    k = min(k, similitudes.shape[1])
+    umbral = -np.partition(-similitudes, k - 1, axis=1)[:, k - 1]
+    m = int((similitudes >= umbral[:, None]).sum(axis=1).max())
+
+    candidatos = np.argpartition(-similitudes, m - 1, axis=1)[:, :m]
+    vecinos = columnas[candidatos]
+    valores = np.take_along_axis(similitudes, candidatos, axis=1)
+    orden = np.lexsort((vecinos, -valores), axis=1)[:, :k]
+    return np.take_along_axis(vecinos, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
+
+
+def top_k_bloque(similitudes, filas, k):
+    """
+    similitudes: matriz bloque × N; filas: posición de cada fila del bloque,
+    que se excluye de sus propios vecinos.
+
+    Regresa (vecinos, valores), dos matrices bloque × k ordenadas de mayor a
+    menor similitud (a igual similitud, el vecino de menor posición).
+    """
+    similitudes[np.arange(len(filas)), filas] = -np.inf
+    k = min(k, similitudes.shape[1] - 1)
+    return seleccionar_top_k(similitudes, np.arange(similitudes.shape[1]), k)
+
+
+def unir_top_k(vecinos, valores, nuevos_vecinos, nuevos_valores, k):
+    """
+    Une dos top-k parciales (matrices bloque × k) en uno solo, ordenado de
+    mayor a menor similitud (a igual similitud, el vecino de menor posición).
+    """
+    vecinos = np.concatenate([vecinos, nuevos_vecinos], axis=1)
+    valores = np.concatenate([valores, nuevos_valores], axis=1)
+    orden = np.lexsort((vecinos, -valores), axis=1)[:, :k]
+    return np.take_along_axis(vecinos, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
+
+
+def top_k_por_columnas(filas, k, tam_columnas):
+    """
+    Top-k de las filas contra todas las columnas, recorriendo las columnas
+    en bloques de tam_columnas. En memoria solo hay un bloque filas ×
+    tam_columnas y el top-k acumulado.
+
+    Regresa (vecinos, valores) como top_k_bloque().
+    """
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    k = min(k, n - 1)
+    vecinos = np.full((len(filas), 0), -1, dtype=np.int64)
+    valores = np.full((len(filas), 0), -np.inf)
+
+    for inicio in range(0, n, tam_columnas):
+        columnas = np.arange(inicio, min(inicio + tam_columnas, n))
+        similitudes = integrar_componentes(similitudes_por_componente(filas, columnas))
+
+        propias = (filas >= inicio) & (filas < inicio + len(columnas))
+        similitudes[propias, filas[propias] - inicio] = -np.inf
+
+        nuevos_vecinos, nuevos_valores = seleccionar_top_k(similitudes, columnas, k)
+        vecinos, valores = unir_top_k(vecinos, valores, nuevos_vecinos, nuevos_valores, k)
+    return vecinos, valores
+
+
+def tamanos_para_memoria(memoria_mb, tam_bloque=256):
+    """
+    Filas y columnas por bloque para que el cálculo de un bloque no pase
+    de memoria_mb (sin contar los arreglos del modelo ya cargados). El
+    cache de filas de textos (fila_similitud_textos) se llena en el recorrido
+    y se descuenta lleno del presupuesto.
+    Regresa (tam_bloque, tam_columnas).
+    """
+    c = obtener_arreglos_modelo()
+    n = len(c["cvegeo"])
+    distintos = max(len(c["eda_valores"]), len(c["topo_valores"]))
+    presupuesto = memoria_mb * 2**20 - 8 * MAX_FILAS_CACHE_TEXTOS * distintos
+    # las filas de textos apiladas para cada fila del bloque
+    por_fila = 8 * (len(c["eda_valores"]) + len(c["topo_valores"]))
+
+    filas = min(tam_bloque, n)
+    while filas > 1 and filas * (por_fila + BYTES_POR_PAR * min(n, MIN_COLUMNAS)) > presupuesto:
+        filas //= 2
+    columnas = int(min(n, (presupuesto - filas * por_fila) // (filas * BYTES_POR_PAR)))
+    if columnas < 1:
+        raise ValueError(f"{memoria_mb} MB no alcanzan para calcular ni una fila")
+    return filas, columnas
+
+
+def preparar_avance(carpeta, k, tam_bloque):
+    """
+    Prepara la carpeta de avance: si es de otra corrida (otros datos, k o
+    tamaño de bloque) borra sus bloques guardados.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    descripcion = {
+        "version": VERSION_MODELO,
+        "datos": hash_datos(),
+        "municipios": len(obtener_arreglos_modelo()["cvegeo"]),
+        "k": k,
+        "tam_bloque": tam_bloque,
+    }
+    ruta = os.path.join(carpeta, "avance.json")
+    if os.path.exists(ruta):
+        with open(ruta) as f:
+            if json.load(f) == descripcion:
+                return
+    for nombre in os.listdir(carpeta):
+        if nombre.startswith("bloque_") and nombre.endswith(".npz"):
+            os.remove(os.path.join(carpeta, nombre))
+    with open(ruta, "w") as f:
+        json.dump(descripcion, f)
+
+
+def ruta_bloque(carpeta, inicio):
+    return os.path.join(carpeta, f"bloque_{inicio:09d}.npz")
+
+
+def calcular_bloque(tarea):
+    """
+    Top-k del bloque de filas [inicio, fin): tarea = (inicio, fin, k,
+    tam_columnas). Regresa (vecinos, valores). Es la unidad de trabajo de
+    los procesos de calculos.paralelo.
+    """
+    inicio, fin, k, tam_columnas = tarea
+    filas = np.arange(inicio, fin)
+    if tam_columnas is None or tam_columnas >= len(obtener_arreglos_modelo()["cvegeo"]):
+        return top_k_bloque(integrar_componentes(similitudes_por_componente(filas)), filas, k)
+    return top_k_por_columnas(filas, k, tam_columnas)
+
+
+def vecinos_por_bloques(k=20, tam_bloque=256, tam_columnas=None, carpeta_avance=None, grupo=None):
+    """
+    Generador: por cada bloque de municipios regresa un DataFrame largo con
+    COLUMNAS (k filas por municipio).
+
+    Con tam_columnas cada bloque se calcula por bloques de columnas (ver
+    top_k_por_columnas). Con carpeta_avance los bloques ya guardados ahí se
+    leen en vez de calcularse, y cada bloque nuevo se guarda al terminar.
+    Con un grupo de calculos.paralelo los bloques se calculan en sus procesos.
+    """
+    c = obtener_arreglos_modelo()
+    n = len(c["cvegeo"])
+    if carpeta_avance is not None:
+        preparar_avance(carpeta_avance, k, tam_bloque)
+
+    guardados = {
+        inicio for inicio in range(0, n, tam_bloque)
+        if carpeta_avance is not None and os.path.exists(ruta_bloque(carpeta_avance, inicio))
+    }
+    tareas = [
+        (inicio, min(inicio + tam_bloque, n), k, tam_columnas)
+        for inicio in range(0, n, tam_bloque) if inicio not in guardados
+    ]
+    calculados = iter(map(calcular_bloque, tareas) if grupo is None else grupo.mapear(calcular_bloque, tareas))
+
+    for inicio in range(0, n, tam_bloque):
+        filas = np.arange(inicio, min(inicio + tam_bloque, n))
+        ruta = None if carpeta_avance is None else ruta_bloque(carpeta_avance, inicio)
+
+        if inicio in guardados:
+            with np.load(ruta) as bloque:
+                vecinos, valores = bloque["vecinos"], bloque["valores"]
+        else:
+            vecinos, valores = next(calculados)
+            if ruta is not None:
+                # se escribe aparte y se renombra: nunca queda un bloque a medias
+                with open(ruta + ".tmp", "wb") as f:
+                    np.savez(f, vecinos=vecinos, valores=valores)
+                os.replace(ruta + ".tmp", ruta)
+
+        yield pd.DataFrame({
+            "CVEGEO": np.repeat(c["cvegeo"][filas], vecinos.shape[1]),
+            "RANGO": np.tile(np.arange(1, vecinos.shape[1] + 1, dtype=np.int16), len(filas)),
+            "CVEGEO_VECINO": c["cvegeo"][vecinos.ravel()],
+            "SIMILITUD": valores.ravel(),
+        })
+
+
+def escribir_vecinos(salida, k=20, tam_bloque=256, informar=None, memoria_mb=None, carpeta_avance=None,
+                     grupo=None):
+    """
+    Escribe los vecinos de todos los municipios en 'salida' (.parquet o .csv),
+    bloque por bloque. 'informar' recibe un texto de avance por bloque.
+
+    Con memoria_mb los bloques se ajustan a ese tope (ver
+    tamanos_para_memoria), por proceso si hay 'grupo'. Con carpeta_avance la
+    corrida se puede reanudar; los bloques guardados se borran al terminar
+    de escribir la salida.
+
+    Regresa un diccionario con municipios, filas escritas, segundos y
+    municipios por segundo.
+    """
+    parquet = salida.endswith(".parquet")
+    if not parquet and not salida.endswith(".csv"):
+        raise ValueError("La salida debe ser .parquet o .csv")
+
+    carpeta = os.path.dirname(salida)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+
+    n = len(obtener_arreglos_modelo()["cvegeo"])
+    tam_columnas = None
+    if memoria_mb is not None:
+        tam_bloque, tam_columnas = tamanos_para_memoria(memoria_mb, tam_bloque)
+        if informar is not None:
+            informar(f"Bloques de {tam_bloque} × {tam_columnas} para {memoria_mb} MB")
+
+    inicio = time.time()
+    municipios = 0
+    filas_escritas = 0
+    escritor = None
+
+    try:
+        for bloque in vecinos_por_bloques(k, tam_bloque, tam_columnas, carpeta_avance, grupo):
+            if parquet:
+                tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(salida, tabla.schema)
+                escritor.write_table(tabla)
+            else:
+                bloque.to_csv(salida, mode="w" if municipios == 0 else "a",
+                              header=municipios == 0, index=False)
+
+            municipios += bloque["CVEGEO"].nunique()
+            filas_escritas += len(bloque)
+            if informar is not None:
+                segundos = time.time() - inicio
+                informar(f"{municipios}/{n} municipios ({municipios / segundos:.0f} mun/s)")
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+    if carpeta_avance is not None:
+        for nombre in os.listdir(carpeta_avance):
+            if nombre.startswith("bloque_") or nombre == "avance.json":
+                os.remove(os.path.join(carpeta_avance, nombre))
+
+    segundos = time.time() - inicio
+    return {
+        "municipios": municipios,
+        "filas": filas_escritas,
+        "segundos": segundos,
+        "municipios_por_segundo": municipios / segundos if segundos else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta los k municipios más similares a cada municipio."
+    )
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--salida", default="data/vecinos_top20.parquet", help="archivo .parquet o .csv")
+    parser.add_argument("--bloque", type=int, default=256, help="municipios por bloque")
+    parser.add_argument("--memoria-mb", type=int, help="tope de memoria para calcular cada bloque")
+    parser.add_argument("--avance", help="carpeta para guardar el avance y poder reanudar")
+    parser.add_argument("--trabajadores", type=int, default=1, help="procesos para calcular los bloques")
+    args = parser.parse_args()
+
+    grupo = None
+    if args.trabajadores > 1:
+        from calculos.paralelo import GrupoTrabajadores
+        grupo = GrupoTrabajadores(args.trabajadores)
+    try:
+        resumen = escribir_vecinos(
+            args.salida, args.k, args.bloque,
+            informar=lambda texto: print(texto, file=sys.stderr),
+            memoria_mb=args.memoria_mb,
+            carpeta_avance=args.avance,
+            grupo=grupo,
+        )
+    finally:
+        if grupo is not None:
+            grupo.cerrar()
+    print(
+        f"{resumen['municipios']} municipios, {resumen['filas']} filas en {args.salida} "
+        f"({resumen['segundos']:.1f} s, {resumen['municipios_por_segundo']:.0f} municipios/s)"
+    )
@@ -1,37 +1,262 @@
+import os
+import sys
+from functools import lru_cache, wraps
+
+import numpy as np
 import pandas as pd
+from data.caracteristicas import (
+    PREFIJOS,
+    construir_arreglos_modelo,
+    construir_tabla_caracteristicas,
+    normalizar_cvegeo,
+)
+from data.instrumentacion import contar, instrumentar
+
+# === ARCHIVOS DE CADA TABLA ===
+# Las tablas se leen la primera vez que se piden (no al importar el módulo)
+# y se comparten entre todos los módulos.
+
+ARCHIVOS = {
+    "tabla_edafologia": "data/mun_edafologia.csv",
+    "tabla_topoforma": "data/mun_sist_topoformas.csv",
+    "tabla_municipios": "data/tabla_municipios.parquet",
+    "tabla_precip_media": "data/mun_precip_media_anual.csv",
+    "tabla_temp_media": "data/mun_temp_media_anual.csv",
+    "tabla_unidades_clima": "data/mun_unidades_climaticas_final.csv",
+    "tabla_sequia": "data/sequia_long.csv",
+    "tabla_sequia_mensual": "data/Sequia_mensual.parquet",
+    "tabla_aez": "data/aez_cultivos_municipios_final.csv",
+    "tabla_catalogo_cultivos": "data/catalogo_cultivos.csv",
+    "tabla_cierre_agricola": "data/final_cierreAgricola.csv",
+    #"tabla_radiacion": "data/radiacion.parquet",
+}
+
+# Paquete columnar: las mismas tablas ya tipadas en Parquet.
+# Se construye con: python -m data.paquete_parquet
+CARPETA_PAQUETE = "data/paquete"
 
-# === CARGA DE TABLAS (una sola vez) ===
-
-df_topoforma = pd.read_csv("data/mun_sist_topoformas.csv")
-#df_radiacion = pd.read_parquet("data/radiacion.parquet")
-df_municipios = pd.read_parquet("data/tabla_municipios.parquet")
-df_edafologia=pd.read_csv("data/mun_edafologia.csv")
-df_precip_media=pd.read_csv("data/mun_precip_media_anual.csv")
-df_temp_media=pd.read_csv("data/mun_temp_media_anual.csv")
-df_sequia=pd.read_csv("data/sequia_long.csv")
-df_aez=pd.read_csv("data/aez_cultivos_municipios_final.csv")
-df_catalogo_cultivos=pd.read_csv("data/catalogo_cultivos.csv")
-df_cierre_agricola=pd.read_csv("data/final_cierreAgricola.csv")
-
-
-# DICCIONARIO PARA ACCESO GLOBAL
-tablas = {
-    "tabla_edafologia": df_edafologia,
-    "tabla_topoforma": df_topoforma,
-    "tabla_municipios": df_municipios,
-    "tabla_precip_media": df_precip_media,
-    "tabla_temp_media": df_temp_media,
-    "tabla_sequia": df_sequia,
-    "tabla_aez": df_aez
+# Nombres anteriores (data.acceso_data.df_*) -> tabla
+NOMBRES_ANTERIORES = {
+    "df_edafologia": "tabla_edafologia",
+    "df_topoforma": "tabla_topoforma",
+    "df_municipios": "tabla_municipios",
+    "df_precip_media": "tabla_precip_media",
+    "df_temp_media": "tabla_temp_media",
+    "df_unidades_clima": "tabla_unidades_clima",
+    "df_sequia": "tabla_sequia",
+    "df_aez": "tabla_aez",
+    "df_catalogo_cultivos": "tabla_catalogo_cultivos",
+    "df_cierre_agricola": "tabla_cierre_agricola",
 }
 
+_funciones_cacheadas = []
 
 
+def cache_datos(funcion):
+    """
+    Decorador: guarda el resultado de 'funcion' por argumentos, una sola copia
+    por proceso.
+
+    Dentro de una app de Streamlit usa st.cache_resource, así la copia se
+    comparte entre sesiones y los reruns no vuelven a leer nada. Fuera de
+    Streamlit (CLI, procesos batch) usa un lru_cache y no importa Streamlit.
+    """
+    local = lru_cache(maxsize=None)(funcion)
+    compartida = []
+    fijado = []
+
+    @wraps(funcion)
+    def envoltura(*args):
+        if fijado and not args:
+            return fijado[0]
+        st = sys.modules.get("streamlit")
+        if st is not None and st.runtime.exists():
+            if not compartida:
+                compartida.append(st.cache_resource(show_spinner=False)(funcion))
+            return compartida[0](*args)
+        return local(*args)
+
+    def cache_clear():
+        local.cache_clear()
+        fijado.clear()
+        if compartida:
+            compartida[0].clear()
+
+    def fijar(valor):
+        # la llamada sin argumentos regresa 'valor' en vez de construirlo
+        # (p. ej. arreglos en memoria compartida en un proceso trabajador)
+        fijado[:] = [valor]
+
+    envoltura.cache_clear = cache_clear
+    envoltura.fijar = fijar
+    return registrar_cache(envoltura)
+
+
+def registrar_cache(funcion):
+    """
+    Registra una función con cache_clear() (p. ej. un lru_cache) para que se
+    limpie junto con las tablas en limpiar_cache_datos().
+    """
+    _funciones_cacheadas.append(funcion)
+    return funcion
+
+
+def limpiar_cache_datos():
+    """
+    Olvida todas las tablas cargadas y las estructuras construidas a partir
+    de ellas; se vuelven a leer en el siguiente acceso.
+    """
+    for funcion in _funciones_cacheadas:
+        funcion.cache_clear()
+
+
+def ruta_paquete(nombre):
+    return os.path.join(CARPETA_PAQUETE, f"{nombre}.parquet")
+
+
+def paquete_vigente(nombre):
+    """
+    True si la tabla está en el paquete Parquet y es más reciente que su
+    archivo original (o si el original no está, p. ej. en producción).
+    """
+    ruta = ruta_paquete(nombre)
+    if not os.path.exists(ruta):
+        return False
+    original = ARCHIVOS[nombre]
+    return not os.path.exists(original) or os.path.getmtime(ruta) >= os.path.getmtime(original)
+
+
+def archivo_leido(ruta):
+    """
+    El archivo que cargar_tabla() lee para el original 'ruta' (un valor de
+    ARCHIVOS): el del paquete si está vigente; si no, el mismo 'ruta'.
+    """
+    for nombre, original in ARCHIVOS.items():
+        if original == ruta and paquete_vigente(nombre):
+            return ruta_paquete(nombre)
+    return ruta
+
+
+def leer_original(nombre):
+    """
+    Lee la tabla 'nombre' de su archivo original (CSV o Parquet), sin tipar.
+    """
+    ruta = ARCHIVOS[nombre]
+    if ruta.endswith(".parquet"):
+        return pd.read_parquet(ruta)
+    return pd.read_csv(ruta)
+
+
+def tipar_tabla(df):
+    """
+    Ajusta los tipos de una tabla recién leída:
+    - CVEGEO como texto de 5 dígitos ("1001" -> "01001")
+    - "Fecha" como fecha
+    - enteros como int32 cuando caben
+    - textos con pocos valores distintos (incluido CVEGEO en tablas con
+      varias filas por municipio) como categorías
+    """
+    for col in df.columns:
+        serie = df[col]
+        if col == "CVEGEO":
+            serie = serie.astype(str).str.zfill(5)
+        elif col == "Fecha":
+            df[col] = pd.to_datetime(serie, errors="coerce")
+            continue
+        elif pd.api.types.is_integer_dtype(serie):
+            limites = np.iinfo(np.int32)
+            if serie.between(limites.min, limites.max).all():
+                df[col] = serie.astype(np.int32)
+            continue
+        elif not pd.api.types.is_string_dtype(serie):
+            continue
+
+        if serie.nunique() < len(serie) / 2:
+            serie = serie.astype("category")
+        df[col] = serie
+    return df
+
+
+@cache_datos
+@instrumentar("data.acceso_data.cargar_tabla")
+def cargar_tabla(nombre):
+    """
+    Regresa la tabla 'nombre' (ver ARCHIVOS), leyéndola solo la primera vez.
+    Usa el paquete Parquet si está vigente; si no, lee el archivo original
+    y le aplica tipar_tabla(), así en ambos casos la tabla es la misma.
+    """
+    if paquete_vigente(nombre):
+        contar("tablas.lecturas_paquete")
+        return pd.read_parquet(ruta_paquete(nombre))
+    contar("tablas.lecturas_original")
+    return tipar_tabla(leer_original(nombre))
+
+
+def cargar_tablas(nombres=None):
+    """
+    Carga de una vez las tablas indicadas (todas si es None) y las regresa
+    en un diccionario nombre -> DataFrame. Útil en CLI y procesos batch
+    para leer solo lo necesario antes de empezar.
+    """
+    if nombres is None:
+        nombres = list(ARCHIVOS)
+    return {nombre: cargar_tabla(nombre) for nombre in nombres}
+
+
+def __getattr__(nombre):
+    # Compatibilidad: data.acceso_data.df_aez, etc. cargan la tabla al usarse
+    if nombre in NOMBRES_ANTERIORES:
+        return cargar_tabla(NOMBRES_ANTERIORES[nombre])
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+# TABLA DE CARACTERÍSTICAS (se construye una sola vez, al primer uso)
+
+@cache_datos
+@instrumentar("data.acceso_data.obtener_caracteristicas")
+def obtener_caracteristicas():
+    """
+    Regresa la tabla de características por municipio, indexada por CVEGEO.
+    Ver data.caracteristicas.construir_tabla_caracteristicas().
+    """
+    return construir_tabla_caracteristicas(cargar_tablas(list(PREFIJOS)))
+
+
+@cache_datos
+@instrumentar("data.acceso_data.obtener_arreglos_modelo")
+def obtener_arreglos_modelo():
+    """
+    Regresa los arreglos del modelo de similitud (municipios con datos completos).
+    Ver data.caracteristicas.construir_arreglos_modelo().
+    """
+    return construir_arreglos_modelo(obtener_caracteristicas())
+
+
+@cache_datos
+def obtener_nombres_municipios():
+    """
+    DataFrame indexado por CVEGEO (normalizado) con NOM_ENT y NOMGEO.
+    """
+    tabla = cargar_tabla("tabla_municipios")
+    tabla = tabla.assign(CVEGEO=tabla["CVEGEO"].map(normalizar_cvegeo))
+    return tabla.drop_duplicates("CVEGEO").set_index("CVEGEO")[["NOM_ENT", "NOMGEO"]]
+
+
+@instrumentar()
 def get_campos(tabla, columnas, cvegeo):
     """
     Regresa un diccionario con varias columnas pedidas de la tabla especificada.
     """
-    df = tablas[tabla]
+    prefijo = PREFIJOS.get(tabla)
+    if prefijo is not None:
+        caracteristicas = obtener_caracteristicas()
+        cvegeo = normalizar_cvegeo(cvegeo)
+        if cvegeo not in caracteristicas.index or not caracteristicas.at[cvegeo, prefijo + "presente"]:
+            return {col: None for col in columnas}
+        return {col: caracteristicas.at[cvegeo, prefijo + col] for col in columnas}
+
+    # tablas con varias filas por municipio (sequía, AEZ)
+    df = cargar_tabla(tabla)
     fila = df[df["CVEGEO"] == cvegeo]
 
     if fila.empty:
@@ -51,7 +276,7 @@ def leer_caracteristicas_municipio(cvegeo):
 
         **{f"topo_{k}": v for k, v in get_campos(
             "tabla_topoforma",
-            ["CLAVE","NOMBRE","DESCRIPCION"],
+            ["CLAVE","NOMBRE","DESCRIPCIO"],
             cvegeo).items()
         },
 
@@ -0,0 +1,215 @@
+#comando para precalcular las capas de los mapas: python -m data.capas
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import ARCHIVOS, archivo_leido, cache_datos, obtener_caracteristicas
+from data.caracteristicas import PREFIJOS
+from data.geometrias import cargar_geometria, nivel_zoom, ruta_geometria
+
+# Capas de los mapas nacionales de la pantalla de Inicio: cada atributo de
+# la tabla de características ya unido a las geometrías simplificadas
+# (data.geometrias), con la clase y el color de cada municipio asignados y
+# su leyenda. Se guardan en CARPETA_CAPAS como GeoJSON listo para dibujar y
+# se regeneran si cambian las geometrías o las tablas de características.
+
+CARPETA_CAPAS = "data/cache/capas"
+
+# Zoom de las geometrías de los mapas nacionales
+ZOOM_CAPAS = 6
+
+# Clases de las capas numéricas (cuantiles)
+NUM_CLASES = 7
+
+COLOR_SIN_DATOS = "#d9d9d9"
+COLOR_OTROS = "#969696"
+
+# Paletas de ColorBrewer
+PALETAS = {
+    "Blues": ["#eff3ff", "#c6dbef", "#9ecae1", "#6baed6", "#4292c6", "#2171b5", "#084594"],
+    "YlOrRd": ["#ffffb2", "#fed976", "#feb24c", "#fd8d3c", "#fc4e2a", "#e31a1c", "#b10026"],
+    "categorias": [
+        "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2",
+        "#bcbd22", "#17becf", "#aec7e8", "#ffbb78", "#98df8a", "#ff9896", "#c5b0d5",
+        "#c49c94", "#f7b6d2", "#dbdb8d", "#9edae5",
+    ],
+}
+
+# Capas planeadas en frontend/componentes/mapas/mapa.py
+CAPAS = {
+    "topoforma": {
+        "titulo": "Sistema de topoformas", "columna": "topo_NOMBRE", "tipo": "categorica",
+    },
+    "precipitacion": {
+        "titulo": "Precipitación media anual", "columna": "prec_num", "tipo": "numerica",
+        "paleta": "Blues", "unidad": " mm",
+    },
+    "temperatura": {
+        "titulo": "Temperatura media anual", "columna": "temp_num", "tipo": "numerica",
+        "paleta": "YlOrRd", "unidad": " °C",
+    },
+    "unidades_clima": {
+        "titulo": "Unidades climáticas", "columna": "uni_TIPO_C", "tipo": "categorica",
+    },
+    "tipo_region": {
+        "titulo": "Tipo de región", "columna": "uni_CLASS_ATLA", "tipo": "categorica",
+    },
+}
+
+
+def clases_numericas(valores, paleta, unidad="", num_clases=NUM_CLASES):
+    """
+    Clasifica por cuantiles. Regresa (etiquetas, colores, leyenda): etiqueta
+    y color por municipio (None / COLOR_SIN_DATOS sin dato) y la leyenda
+    como lista de {"etiqueta", "color"}.
+    """
+    valores = np.asarray(valores, dtype=float)
+    hay = ~np.isnan(valores)
+    if not hay.any():
+        return [None] * len(valores), [COLOR_SIN_DATOS] * len(valores), []
+
+    cortes = np.unique(np.quantile(valores[hay], np.linspace(0, 1, num_clases + 1)))
+    if len(cortes) == 1:
+        cortes = np.repeat(cortes, 2)
+    # colores repartidos en la paleta si hay menos clases que colores
+    colores = np.asarray(PALETAS[paleta])
+    colores_clase = colores[np.round(np.linspace(0, len(colores) - 1, len(cortes) - 1)).astype(int)]
+    etiquetas_clase = np.array([f"{a:g} – {b:g}{unidad}" for a, b in zip(cortes[:-1], cortes[1:])], dtype=object)
+
+    clase = np.searchsorted(cortes[1:-1], np.where(hay, valores, 0), side="right")
+    etiquetas = np.where(hay, etiquetas_clase[clase], None)
+    colores = np.where(hay, colores_clase[clase], COLOR_SIN_DATOS)
+    leyenda = [{"etiqueta": e, "color": c} for e, c in zip(etiquetas_clase, colores_clase)]
+    return etiquetas.tolist(), colores.tolist(), leyenda
+
+
+def clases_categoricas(valores):
+    """
+    Un color por categoría, de la más a la menos frecuente; las que no
+    alcanzan color de la paleta van como "Otros". Regresa lo mismo que
+    clases_numericas().
+    """
+    valores = pd.Series(valores, dtype=object)
+    paleta = PALETAS["categorias"]
+    frecuentes = valores.value_counts().index
+    colores_categoria = dict(zip(frecuentes, paleta))
+
+    etiquetas = valores.where(valores.isin(colores_categoria.keys()) | valores.isna(), "Otros")
+    colores = etiquetas.map(colores_categoria).fillna(COLOR_OTROS).where(etiquetas.notna(), COLOR_SIN_DATOS)
+    leyenda = [{"etiqueta": e, "color": c} for e, c in colores_categoria.items()]
+    if len(frecuentes) > len(paleta):
+        leyenda.append({"etiqueta": "Otros", "color": COLOR_OTROS})
+    return etiquetas.where(etiquetas.notna(), None).tolist(), colores.tolist(), leyenda
+
+
+def construir_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    GeoJSON (FeatureCollection) de la capa con "titulo" y "leyenda"; cada
+    municipio lleva en sus propiedades NOMGEO, NOM_ENT, "valor", "etiqueta"
+    y "color".
+    """
+    capa = CAPAS[nombre]
+    geometria = cargar_geometria(zoom, "geojson")
+    cvegeo = [f["id"] for f in geometria["features"]]
+
+    valores = obtener_caracteristicas()[capa["columna"]].reindex(cvegeo)
+    if capa["tipo"] == "numerica":
+        etiquetas, colores, leyenda = clases_numericas(valores, capa["paleta"], capa.get("unidad", ""))
+        valores = [None if np.isnan(v) else round(float(v), 2) for v in valores.astype(float)]
+    else:
+        etiquetas, colores, leyenda = clases_categoricas(valores)
+        valores = valores.where(valores.notna(), None).tolist()
+
+    caracteristicas = [
+        {
+            "type": "Feature",
+            "id": f["id"],
+            "properties": {
+                "CVEGEO": f["id"],
+                "NOMGEO": f["properties"].get("NOMGEO"),
+                "NOM_ENT": f["properties"].get("NOM_ENT"),
+                "valor": valor,
+                "etiqueta": etiqueta if etiqueta is not None else "Sin datos",
+                "color": color,
+            },
+            "geometry": f["geometry"],
+        }
+        for f, valor, etiqueta, color in zip(geometria["features"], valores, etiquetas, colores)
+    ]
+    return {
+        "type": "FeatureCollection",
+        "titulo": capa["titulo"],
+        "leyenda": leyenda,
+        "features": caracteristicas,
+    }
+
+
+def ruta_capa(nombre, zoom=ZOOM_CAPAS):
+    return os.path.join(CARPETA_CAPAS, f"{nombre}_z{nivel_zoom(zoom)}.geojson")
+
+
+def capa_vigente(nombre, zoom=ZOOM_CAPAS):
+    """
+    True si el archivo de la capa es más reciente que sus geometrías y que
+    las tablas de características.
+    """
+    ruta = ruta_capa(nombre, zoom)
+    if not os.path.exists(ruta):
+        return False
+    leidos = [archivo_leido(ARCHIVOS[n]) for n in PREFIJOS]
+    fuentes = [ruta_geometria(zoom, "geojson")] + [ruta for ruta in leidos if os.path.exists(ruta)]
+    return all(os.path.getmtime(ruta) >= os.path.getmtime(fuente) for fuente in fuentes)
+
+
+def guardar_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    Construye la capa y la escribe en CARPETA_CAPAS. Regresa la ruta.
+    """
+    texto = json.dumps(construir_capa(nombre, zoom), ensure_ascii=False, separators=(",", ":"))
+    ruta = ruta_capa(nombre, zoom)
+    os.makedirs(CARPETA_CAPAS, exist_ok=True)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(ruta + ".tmp", ruta)
+    return ruta
+
+
+def archivo_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    Ruta de la capa guardada, construyéndola si no está vigente.
+    """
+    if not capa_vigente(nombre, zoom):
+        guardar_capa(nombre, zoom)
+    return ruta_capa(nombre, zoom)
+
+
+@cache_datos
+def texto_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    El GeoJSON de la capa como texto, tal como está guardado.
+    """
+    with open(archivo_capa(nombre, zoom), encoding="utf-8") as f:
+        return f.read()
+
+
+@cache_datos
+def obtener_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    La capa ya leída (diccionario GeoJSON con "titulo" y "leyenda").
+    """
+    return json.loads(texto_capa(nombre, zoom))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula las capas de los mapas nacionales.")
+    parser.add_argument("--zoom", type=int, default=ZOOM_CAPAS)
+    parser.add_argument("--capas", nargs="+", choices=list(CAPAS), default=list(CAPAS))
+    args = parser.parse_args()
+
+    for nombre in args.capas:
+        inicio = time.time()
+        ruta = guardar_capa(nombre, args.zoom)
+        print(f"{nombre}: {os.path.getsize(ruta) / 2**20:.1f} MB en {time.time() - inicio:.2f} s")
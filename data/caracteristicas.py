@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+# Tabla de características por municipio: une las tablas del modelo
+# (y la tabla de municipios) por CVEGEO, con los valores ya interpretados.
+
+
+def normalizar_cvegeo(valor):
+    """
+    Convierte un CVEGEO a string de 5 dígitos, rellenando con ceros a la izquierda.
+    Ejemplo: 1002 -> "01002"
+    """
+    try:
+        return str(valor).zfill(5)
+    except:
+        return None
+
+
+def es_numerico(valor):
+    try:
+        float(valor)
+        return True
+    except:
+        return False
+
+
+def es_rango(valor):
+    return isinstance(valor, str) and "-" in valor
+
+
+def normalizar_precipitacion(valor):
+    if isinstance(valor, str):
+        v = valor.strip().lower()
+        if v in ["no aplica", "na", "n/a"]:
+            return "no_aplica"
+        if v in ["h2o", "agua", "mojado"]:
+            return "h2o"
+    return valor
+
+# pasar rango a int y sacar el promedio
+def rango_a_promedio(rango):
+    """
+    Convierte un rango en una tupla de enteros y devuelve su promedio.
+
+    Ejemplo: "3-7" -> (3, 7) -> 5.0
+    """
+    try:
+        partes = rango.split('-')
+        if len(partes) != 2:
+            raise ValueError("El rango debe tener el formato 'min-max'")
+        min_val = int(partes[0].strip())
+        max_val = int(partes[1].strip())
+        promedio = (min_val + max_val) / 2
+        return promedio
+    except Exception as e:
+        raise ValueError(f"Error al convertir el rango: {e}")
+
+
+def unir_edafologia(fila):
+    return " ".join([
+        str(fila["CLAVE_WRB"]),
+        str(fila["GRUPO1"]),
+        str(fila["GRUPO2"]),
+        str(fila["GRUPO3"]),
+        str(fila["CLASE_TEXT"]),
+        str(fila["FRUDICA"]),
+    ])
+
+
+# Categorías de un valor de precipitación/temperatura ya interpretado
+CATEGORIA_NUMERICA = 0
+CATEGORIA_NO_APLICA = 1
+CATEGORIA_H2O = 2
+CATEGORIA_OTRA = 3
+
+
+def interpretar_valor(valor):
+    """
+    Interpreta una sola vez un valor de precipitación o temperatura
+    con las mismas reglas que precip().
+
+    Regresa una tupla (categoria, numero). Los rangos se convierten a su
+    promedio y las categorías ("no_aplica", "h2o") no tienen número.
+    Ejemplo: "16-18" -> (CATEGORIA_NUMERICA, 17.0)
+    """
+    v = normalizar_precipitacion(valor)
+    if v == "no_aplica":
+        return CATEGORIA_NO_APLICA, np.nan
+    if v == "h2o":
+        return CATEGORIA_H2O, np.nan
+    if es_numerico(v):
+        return CATEGORIA_NUMERICA, float(v)
+    if es_rango(v):
+        return CATEGORIA_NUMERICA, rango_a_promedio(v)
+    return CATEGORIA_OTRA, np.nan
+
+
+def interpretar_columna(serie):
+    """
+    Aplica interpretar_valor() a cada valor distinto de una columna.
+    Regresa dos arreglos: categorías (int8) y números (float64).
+    """
+    codigos, unicos = pd.factorize(serie)
+    # el código -1 (valor faltante) toma el último elemento
+    pares = [interpretar_valor(v) for v in unicos] + [interpretar_valor(np.nan)]
+    categorias = np.array([p[0] for p in pares], dtype=np.int8)[codigos]
+    numeros = np.array([p[1] for p in pares], dtype=np.float64)[codigos]
+    return categorias, numeros
+
+
+# Prefijo de columnas de cada tabla dentro de la tabla de características
+PREFIJOS = {
+    "tabla_precip_media": "prec_",
+    "tabla_temp_media": "temp_",
+    "tabla_unidades_clima": "uni_",
+    "tabla_edafologia": "ed_",
+    "tabla_topoforma": "topo_",
+    "tabla_municipios": "mun_",
+}
+
+# Tablas que necesita el modelo de similitud
+TABLAS_MODELO = [
+    "tabla_precip_media",
+    "tabla_temp_media",
+    "tabla_unidades_clima",
+    "tabla_edafologia",
+    "tabla_topoforma",
+]
+
+
+def _indexar_por_cvegeo(df, prefijo):
+    df = df.copy()
+    df["CVEGEO"] = df["CVEGEO"].astype(str).str.zfill(5)
+    df = df.drop_duplicates("CVEGEO").set_index("CVEGEO")
+    df["presente"] = True
+    return df.add_prefix(prefijo)
+
+
+def construir_tabla_caracteristicas(tablas):
+    """
+    Construye la tabla de características indexada por CVEGEO normalizado.
+
+    tablas: diccionario con las tablas de PREFIJOS (nombre -> DataFrame).
+
+    Cada columna original queda con el prefijo de su tabla (p. ej. "prec_CLAVE",
+    "topo_CLAVE") y se agregan:
+    - "<prefijo>presente": si el municipio aparece en esa tabla
+    - "completo": si el municipio tiene datos en todas las TABLAS_MODELO
+    - "prec_cat"/"prec_num", "prec_rango_cat"/"prec_rango_num",
+      "temp_cat"/"temp_num": valores interpretados con interpretar_valor()
+    - "ed_TEXTO": edafología concatenada con unir_edafologia()
+    """
+    edafologia = tablas["tabla_edafologia"].copy()
+    edafologia["TEXTO"] = edafologia.apply(unir_edafologia, axis=1)
+
+    partes = []
+    for nombre, prefijo in PREFIJOS.items():
+        df = edafologia if nombre == "tabla_edafologia" else tablas[nombre]
+        partes.append(_indexar_por_cvegeo(df, prefijo))
+
+    tabla = pd.concat(partes, axis=1, join="outer")
+    tabla.index.name = "CVEGEO"
+
+    for prefijo in PREFIJOS.values():
+        tabla[prefijo + "presente"] = tabla[prefijo + "presente"].fillna(False).astype(bool)
+    tabla["completo"] = tabla[
+        [PREFIJOS[nombre] + "presente" for nombre in TABLAS_MODELO]
+    ].all(axis=1)
+
+    tabla["prec_cat"], tabla["prec_num"] = interpretar_columna(tabla["prec_CLAVE"])
+    tabla["prec_rango_cat"], tabla["prec_rango_num"] = interpretar_columna(tabla["prec_RANGOS"])
+    tabla["temp_cat"], tabla["temp_num"] = interpretar_columna(tabla["temp_RANGOS"])
+
+    return tabla
+
+
+def construir_arreglos_modelo(tabla):
+    """
+    Extrae de la tabla de características los arreglos que usa el motor
+    vectorizado, solo para los municipios con datos completos.
+
+    Los textos de edafología y topoforma se codifican como enteros:
+    eda_valores[eda_cod[i]] es el texto del municipio en la posición i.
+    """
+    modelo = tabla[tabla["completo"]]
+    eda = modelo["ed_TEXTO"].astype("category")
+    topo = modelo["topo_CLAVE"].astype("category")
+
+    return {
+        "cvegeo": modelo.index.to_numpy(),
+        "posicion": {cve: i for i, cve in enumerate(modelo.index)},
+        "prec_cat": modelo["prec_cat"].to_numpy(dtype=np.int8),
+        "prec_num": modelo["prec_num"].to_numpy(dtype=np.float64),
+        "prec_rango_cat": modelo["prec_rango_cat"].to_numpy(dtype=np.int8),
+        "prec_rango_num": modelo["prec_rango_num"].to_numpy(dtype=np.float64),
+        "temp_cat": modelo["temp_cat"].to_numpy(dtype=np.int8),
+        "temp_num": modelo["temp_num"].to_numpy(dtype=np.float64),
+        "tipo_n": modelo["uni_TIPO_N"].to_numpy(dtype=np.float64),
+        "eda_cod": eda.cat.codes.to_numpy(dtype=np.int32),
+        "eda_valores": list(eda.cat.categories),
+        "topo_cod": topo.cat.codes.to_numpy(dtype=np.int32),
+        "topo_valores": list(topo.cat.categories),
+    }
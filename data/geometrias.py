@@ -0,0 +1,518 @@
+#comando para precalcular las geometrías por zoom: python -m data.geometrias
+import argparse
+import json
+import math
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import cache_datos
+from data.caracteristicas import normalizar_cvegeo
+
+# Geometrías de los municipios (shapefile de divpoli, WGS84) y versiones
+# simplificadas por nivel de zoom para los mapas.
+#
+# La simplificación es topológica, como en TopoJSON: los anillos se parten
+# en arcos donde se juntan tres o más municipios, cada frontera compartida
+# queda como un solo arco y se simplifica una sola vez, así dos municipios
+# vecinos nunca quedan con huecos ni encimados. A cada vértice se le asigna
+# la tolerancia de Douglas-Peucker a la que deja de ser necesario, de modo
+# que cada nivel de zoom es solo un filtro sobre la misma topología.
+#
+# Cada nivel se guarda en CARPETA_GEOMETRIAS como TopoJSON (para el
+# frontend de React) y GeoJSON (para folium), y se regenera si el
+# shapefile es más reciente.
+
+RUTA_SHAPEFILE = "data/divpoli_limpia 2/municipios_limpio"
+CARPETA_GEOMETRIAS = "data/cache/geometrias"
+
+# Niveles de zoom precalculados (4: país, 6: estados, 8: región, 10: municipio)
+NIVELES_ZOOM = (4, 6, 8, 10)
+
+# Tolerancia en pixeles de pantalla a cada zoom y cuantización de TopoJSON
+PIXELES_TOLERANCIA = 1.0
+CUANTIZACION = 1_000_000
+
+ATRIBUTOS = ["CVEGEO", "NOMGEO", "NOM_ENT"]
+
+
+def tolerancia_zoom(zoom):
+    """
+    Grados que mide un pixel de un mosaico de 256 px al zoom dado.
+    """
+    return PIXELES_TOLERANCIA * 360 / (256 * 2 ** zoom)
+
+
+# -----------------------------------------------------------
+# Lectura del shapefile
+# -----------------------------------------------------------
+
+def leer_dbf(ruta, codificacion="utf-8"):
+    """
+    Lee la tabla de atributos (.dbf) como DataFrame.
+    """
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    n, largo_encabezado, largo_registro = struct.unpack("<IHH", datos[4:12])
+
+    campos = []
+    i = 32
+    while datos[i] != 0x0D:
+        nombre = datos[i:i + 11].split(b"\0")[0].decode("ascii")
+        campos.append((nombre, chr(datos[i + 11]), datos[i + 16]))
+        i += 32
+
+    dtype = np.dtype([("_borrado", "S1")] + [(nombre, f"S{largo}") for nombre, _, largo in campos])
+    registros = np.frombuffer(datos, dtype=dtype, count=n, offset=largo_encabezado)
+
+    df = pd.DataFrame()
+    for nombre, tipo, _ in campos:
+        columna = pd.Series(registros[nombre]).str.decode(codificacion, errors="replace").str.strip()
+        df[nombre] = pd.to_numeric(columna, errors="coerce") if tipo in "NF" else columna
+    return df
+
+
+def leer_shp(ruta):
+    """
+    Lee los polígonos (.shp) y regresa, por registro, la lista de anillos
+    (arreglos k × 2 de lon, lat, cerrados).
+    """
+    with open(ruta, "rb") as f:
+        datos = f.read()
+
+    registros = []
+    pos = 100
+    while pos < len(datos):
+        _, largo = struct.unpack(">ii", datos[pos:pos + 8])
+        inicio = pos + 8
+        tipo = struct.unpack("<i", datos[inicio:inicio + 4])[0]
+        if tipo == 0:
+            registros.append([])
+        elif tipo in (5, 15, 25):
+            num_partes, num_puntos = struct.unpack("<ii", datos[inicio + 36:inicio + 44])
+            partes = np.frombuffer(datos, "<i4", num_partes, inicio + 44)
+            puntos = np.frombuffer(datos, "<f8", 2 * num_puntos, inicio + 44 + 4 * num_partes).reshape(-1, 2)
+            registros.append(np.split(puntos, partes[1:]))
+        else:
+            raise ValueError(f"Tipo de geometría no soportado en {ruta}: {tipo}")
+        pos = inicio + 2 * largo
+    return registros
+
+
+def area_con_signo(anillo):
+    x, y = anillo[:, 0], anillo[:, 1]
+    return 0.5 * np.sum(x[:-1] * y[1:] - x[1:] * y[:-1])
+
+
+def punto_en_anillo(anillo, x, y):
+    """
+    True si (x, y) está dentro del anillo (regla par-impar).
+    """
+    xa, ya = anillo[:-1, 0], anillo[:-1, 1]
+    xb, yb = anillo[1:, 0], anillo[1:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cruza = ((ya > y) != (yb > y)) & (x < (xb - xa) * (y - ya) / (yb - ya) + xa)
+    return bool(np.count_nonzero(cruza) % 2)
+
+
+def agrupar_poligonos(anillos):
+    """
+    Agrupa los anillos de un registro en polígonos [exterior, huecos...].
+    En el shapefile los exteriores van en sentido horario y los huecos al
+    revés; cada hueco va con el exterior que lo contiene.
+    """
+    exteriores = [a for a in anillos if len(a) >= 4 and area_con_signo(a) <= 0]
+    huecos = [a for a in anillos if len(a) >= 4 and area_con_signo(a) > 0]
+    poligonos = [[a] for a in exteriores]
+    for hueco in huecos:
+        x, y = hueco[0]
+        dueno = next((p for p in poligonos if punto_en_anillo(p[0], x, y)), None)
+        if dueno is None:
+            # hueco sin exterior (anillo mal orientado): se toma como exterior
+            poligonos.append([hueco[::-1]])
+        else:
+            dueno.append(hueco)
+    return poligonos
+
+
+def centroide(poligonos):
+    """
+    Centroide (lon, lat) del área de los polígonos (descontando huecos).
+    """
+    area = 0.0
+    momento = np.zeros(2)
+    for poligono in poligonos:
+        for anillo in poligono:
+            x, y = anillo[:, 0], anillo[:, 1]
+            cruz = x[:-1] * y[1:] - x[1:] * y[:-1]
+            a = cruz.sum() / 2
+            if a == 0:
+                continue
+            area += a
+            momento += a * np.array([
+                np.sum((x[:-1] + x[1:]) * cruz) / (6 * a),
+                np.sum((y[:-1] + y[1:]) * cruz) / (6 * a),
+            ])
+    if area == 0:
+        todos = np.concatenate([p[0] for p in poligonos]) if poligonos else np.full((1, 2), np.nan)
+        return todos.mean(axis=0)
+    return momento / area
+
+
+def ruta_shp():
+    return RUTA_SHAPEFILE + ".shp"
+
+
+@cache_datos
+def obtener_geometrias():
+    """
+    Regresa un diccionario con las geometrías a resolución completa:
+    - "cvegeo" / "posicion": CVEGEO de cada municipio y CVEGEO -> posición
+    - "atributos": DataFrame con ATRIBUTOS
+    - "poligonos": por municipio, lista de polígonos [exterior, huecos...]
+    - "cajas": arreglo N × 4 (lon_min, lat_min, lon_max, lat_max)
+    - "centroides": arreglo N × 2 (lon, lat)
+    """
+    if not os.path.exists(ruta_shp()):
+        raise FileNotFoundError(2, "No se encontró el shapefile de municipios", ruta_shp())
+
+    codificacion = "utf-8"
+    if os.path.exists(RUTA_SHAPEFILE + ".cpg"):
+        with open(RUTA_SHAPEFILE + ".cpg") as f:
+            codificacion = f.read().strip() or codificacion
+
+    atributos = leer_dbf(RUTA_SHAPEFILE + ".dbf", codificacion)
+    atributos["CVEGEO"] = atributos["CVEGEO"].map(normalizar_cvegeo)
+    poligonos = [agrupar_poligonos(anillos) for anillos in leer_shp(ruta_shp())]
+
+    cajas = np.full((len(poligonos), 4), np.nan)
+    for i, p in enumerate(poligonos):
+        if p:
+            todos = np.concatenate([anillo for poligono in p for anillo in poligono])
+            cajas[i] = [*todos.min(axis=0), *todos.max(axis=0)]
+
+    cvegeo = atributos["CVEGEO"].to_numpy(dtype=object)
+    return {
+        "cvegeo": cvegeo,
+        "posicion": {cve: i for i, cve in enumerate(cvegeo)},
+        "atributos": atributos[ATRIBUTOS],
+        "poligonos": poligonos,
+        "cajas": cajas,
+        "centroides": np.array([centroide(p) for p in poligonos]).reshape(-1, 2),
+    }
+
+
+# -----------------------------------------------------------
+# Topología (arcos compartidos) y simplificación
+# -----------------------------------------------------------
+
+def distancia_a_segmento(puntos, a, b):
+    """
+    Distancia de cada punto a su segmento a-b (arreglos k × 2, uno por
+    punto); si a == b, la distancia al punto a.
+    """
+    ab = b - a
+    largo = np.einsum("ij,ij->i", ab, ab)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(largo > 0, np.einsum("ij,ij->i", puntos - a, ab) / largo, 0.0)
+    t = np.minimum(np.maximum(t, 0.0), 1.0)
+    return np.hypot(*(puntos - (a + t[:, None] * ab)).T)
+
+
+def importancia_douglas_peucker(puntos, inicios=(0,)):
+    """
+    Para cada punto de una línea, la tolerancia de Douglas-Peucker a partir
+    de la cual se elimina (infinito en los extremos). Filtrar con
+    importancia >= tolerancia da la línea simplificada a esa tolerancia.
+
+    'puntos' puede traer varias líneas seguidas, que empiezan en 'inicios';
+    todas se procesan a la vez, un nivel de la recursión por vuelta.
+    """
+    n = len(puntos)
+    importancia = np.zeros(n)
+    extremos = np.unique(np.concatenate([inicios, np.asarray(inicios[1:], dtype=np.int64) - 1, [n - 1]]))
+    importancia[extremos] = np.inf
+    fijos = np.zeros(n, dtype=bool)
+    fijos[extremos] = True
+
+    while not fijos.all():
+        indices = np.flatnonzero(fijos)
+        libres = np.flatnonzero(~fijos)
+        k = np.searchsorted(indices, libres)
+        a, b = indices[k - 1], indices[k]
+        distancias = distancia_a_segmento(puntos[libres], puntos[a], puntos[b])
+
+        # el punto más lejano de cada tramo (a, b); el primero si empatan
+        cortes = np.flatnonzero(np.diff(a)) + 1
+        grupos = np.concatenate([[0], cortes])
+        maximo = np.maximum.reduceat(distancias, grupos)
+        tamanos = np.diff(np.append(grupos, len(libres)))
+        candidatos = np.flatnonzero(distancias == np.repeat(maximo, tamanos))
+        _, primero = np.unique(a[candidatos], return_index=True)
+        elegidos = candidatos[primero]
+
+        # nunca mayor que la del punto que partió el tramo
+        tope = np.minimum(importancia[a[elegidos]], importancia[b[elegidos]])
+        importancia[libres[elegidos]] = np.minimum(distancias[elegidos], tope)
+        fijos[libres[elegidos]] = True
+    return importancia
+
+
+def construir_topologia(poligonos_por_municipio):
+    """
+    Convierte los polígonos en una topología de arcos compartidos.
+
+    Regresa un diccionario con:
+    - "transform": escala y traslación de la cuantización (como TopoJSON)
+    - "arcos": lista de arreglos k × 2 con coordenadas cuantizadas
+    - "importancia": por arco, importancia_douglas_peucker() en grados
+    - "municipios": por municipio, polígonos como listas de anillos, y cada
+      anillo como lista de referencias a arcos (~i: el arco i al revés)
+    """
+    anillos = []
+    estructura = []
+    for poligonos in poligonos_por_municipio:
+        estructura.append([])
+        for poligono in poligonos:
+            estructura[-1].append([])
+            for anillo in poligono:
+                estructura[-1][-1].append(len(anillos))
+                anillos.append(anillo[:-1])
+
+    todos = np.concatenate(anillos) if anillos else np.zeros((0, 2))
+    origen = todos.min(axis=0) if len(todos) else np.zeros(2)
+    escala = np.maximum(todos.max(axis=0) - origen, 1e-12) / (CUANTIZACION - 1) if len(todos) else np.ones(2)
+
+    # vértices cuantizados, sin repetidos consecutivos, con un id global
+    cuantizados = []
+    for anillo in anillos:
+        q = np.round((anillo - origen) / escala).astype(np.int64)
+        q = q[np.any(q != np.roll(q, 1, axis=0), axis=1)] if len(q) > 1 else q
+        cuantizados.append(q)
+    largos = np.array([len(q) for q in cuantizados], dtype=np.int64)
+    puntos = np.concatenate(cuantizados) if cuantizados else np.zeros((0, 2), dtype=np.int64)
+    coordenadas, ids = np.unique(puntos[:, 0] * CUANTIZACION + puntos[:, 1], return_inverse=True)
+    coordenadas = np.stack([coordenadas // CUANTIZACION, coordenadas % CUANTIZACION], axis=1)
+
+    # un vértice es unión si no tiene los mismos vecinos en todos sus anillos
+    inicios = np.concatenate([[0], np.cumsum(largos)[:-1]])
+    posicion = np.arange(len(ids)) - np.repeat(inicios, largos)
+    anterior = ids[np.repeat(inicios, largos) + (posicion - 1) % np.repeat(largos, largos)]
+    siguiente = ids[np.repeat(inicios, largos) + (posicion + 1) % np.repeat(largos, largos)]
+    par = np.minimum(anterior, siguiente) * len(coordenadas) + np.maximum(anterior, siguiente)
+    pares = np.unique(np.stack([ids, par], axis=1), axis=0)
+    union = np.bincount(pares[:, 0], minlength=len(coordenadas)) > 1
+
+    arcos = []
+    llaves = {}
+    referencias = []
+    for inicio, largo in zip(inicios, largos):
+        anillo = ids[inicio:inicio + largo]
+        cortes = np.flatnonzero(union[anillo])
+        if len(cortes) == 0:
+            # anillo sin uniones (isla o enclave): un solo arco cerrado que
+            # empieza en su id menor, así el vecino lo reconoce
+            anillo = np.roll(anillo, -int(np.argmin(anillo)))
+            tramos = [np.append(anillo, anillo[0])]
+        else:
+            anillo = np.roll(anillo, -int(cortes[0]))
+            cortes = np.append(cortes - cortes[0], len(anillo))
+            cerrado = np.append(anillo, anillo[0])
+            tramos = [cerrado[a:b + 1] for a, b in zip(cortes[:-1], cortes[1:])]
+
+        refs = []
+        for tramo in tramos:
+            llave = tramo.tobytes()
+            if llave in llaves:
+                refs.append(llaves[llave])
+                continue
+            reves = tramo[::-1].tobytes()
+            if reves in llaves:
+                refs.append(~llaves[reves])
+                continue
+            llaves[llave] = len(arcos)
+            refs.append(len(arcos))
+            arcos.append(tramo)
+        referencias.append(refs)
+
+    # todos los arcos de una vez; 'importancia' queda con una vista por arco
+    largos_arcos = np.array([len(tramo) for tramo in arcos], dtype=np.int64)
+    inicios_arcos = np.concatenate([[0], np.cumsum(largos_arcos)[:-1]])
+    grados = coordenadas[np.concatenate(arcos)] * escala + origen if arcos else np.zeros((0, 2))
+    importancia = np.split(importancia_douglas_peucker(grados, inicios_arcos), inicios_arcos[1:]) if arcos else []
+    for tramo, imp in zip(arcos, importancia):
+        if tramo[0] == tramo[-1] and len(tramo) > 3:
+            # arco cerrado: sus dos vértices más importantes siempre quedan
+            imp[np.argsort(imp[1:-1])[-2:] + 1] = np.inf
+
+    # cada anillo conserva al menos tres vértices distintos
+    # (cada arco aporta su vértice inicial, que nunca se elimina)
+    for refs in referencias:
+        if len(refs) >= 3:
+            continue
+        internos = [
+            (importancia[r if r >= 0 else ~r], j)
+            for r in refs for j in range(1, len(importancia[r if r >= 0 else ~r]) - 1)
+        ]
+        faltan = 3 - len(refs) - sum(bool(np.isinf(imp[j])) for imp, j in internos)
+        internos.sort(key=lambda par: -par[0][par[1]])
+        for imp, j in internos[:max(faltan, 0)]:
+            imp[j] = np.inf
+
+    return {
+        "transform": {"scale": escala.tolist(), "translate": origen.tolist()},
+        "arcos": [coordenadas[tramo] for tramo in arcos],
+        "importancia": importancia,
+        "municipios": [
+            [[referencias[k] for k in poligono] for poligono in municipio]
+            for municipio in estructura
+        ],
+    }
+
+
+def _referencias_validas(refs, arcos_filtrados):
+    # vértices distintos que le quedan a un anillo al filtrar sus arcos
+    return sum(len(arcos_filtrados[r if r >= 0 else ~r]) - 1 for r in refs) >= 3
+
+
+def topojson_zoom(topologia, atributos, zoom):
+    """
+    Objeto TopoJSON de la topología simplificada para un zoom.
+    """
+    tolerancia = tolerancia_zoom(zoom)
+    filtrados = [arco[imp >= tolerancia] for arco, imp in zip(topologia["arcos"], topologia["importancia"])]
+
+    geometrias = []
+    for municipio, fila in zip(topologia["municipios"], atributos.to_dict("records")):
+        poligonos = [
+            [refs for refs in poligono if _referencias_validas(refs, filtrados)]
+            for poligono in municipio
+        ]
+        poligonos = [p for p in poligonos if p]
+        geometria = {"id": fila["CVEGEO"], "properties": fila}
+        if not poligonos:
+            geometria["type"] = None
+        elif len(poligonos) == 1:
+            geometria.update(type="Polygon", arcs=poligonos[0])
+        else:
+            geometria.update(type="MultiPolygon", arcs=poligonos)
+        geometrias.append(geometria)
+
+    return {
+        "type": "Topology",
+        "transform": topologia["transform"],
+        "objects": {"municipios": {"type": "GeometryCollection", "geometries": geometrias}},
+        # arcos con coordenadas delta, como pide TopoJSON cuantizado
+        "arcs": [np.diff(arco, axis=0, prepend=[[0, 0]]).tolist() for arco in filtrados],
+    }
+
+
+def geojson_de_topojson(topo):
+    """
+    Convierte el TopoJSON de topojson_zoom() a GeoJSON (FeatureCollection),
+    con las coordenadas redondeadas a la precisión del zoom.
+    """
+    escala = np.array(topo["transform"]["scale"])
+    origen = np.array(topo["transform"]["translate"])
+    arcos = [np.cumsum(np.array(arco, dtype=np.int64).reshape(-1, 2), axis=0) * escala + origen
+             for arco in topo["arcs"]]
+    decimales = max(0, math.ceil(-math.log10(escala.max())))
+
+    def anillo(refs):
+        partes = [arcos[r] if r >= 0 else arcos[~r][::-1] for r in refs]
+        coordenadas = np.concatenate([partes[0]] + [p[1:] for p in partes[1:]])
+        return np.round(coordenadas, decimales).tolist()
+
+    caracteristicas = []
+    for geometria in topo["objects"]["municipios"]["geometries"]:
+        if geometria["type"] == "Polygon":
+            forma = {"type": "Polygon", "coordinates": [anillo(r) for r in geometria["arcs"]]}
+        elif geometria["type"] == "MultiPolygon":
+            forma = {"type": "MultiPolygon", "coordinates": [[anillo(r) for r in p] for p in geometria["arcs"]]}
+        else:
+            forma = None
+        caracteristicas.append({
+            "type": "Feature", "id": geometria["id"], "properties": geometria["properties"], "geometry": forma,
+        })
+    return {"type": "FeatureCollection", "features": caracteristicas}
+
+
+def rutas_zoom(zoom):
+    """
+    Rutas (topojson, geojson) del nivel de zoom.
+    """
+    base = os.path.join(CARPETA_GEOMETRIAS, f"municipios_z{zoom}")
+    return base + ".topojson", base + ".geojson"
+
+
+def geometrias_vigentes():
+    return all(
+        os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(ruta_shp())
+        for zoom in NIVELES_ZOOM for ruta in rutas_zoom(zoom)
+    )
+
+
+def construir_geometrias(informar=None):
+    """
+    Construye la topología y escribe el TopoJSON y el GeoJSON de cada
+    nivel de NIVELES_ZOOM. Regresa {zoom: (ruta_topojson, ruta_geojson)}.
+    """
+    g = obtener_geometrias()
+    topologia = construir_topologia(g["poligonos"])
+    os.makedirs(CARPETA_GEOMETRIAS, exist_ok=True)
+
+    rutas = {}
+    for zoom in NIVELES_ZOOM:
+        topo = topojson_zoom(topologia, g["atributos"], zoom)
+        geo = geojson_de_topojson(topo)
+        for ruta, objeto in zip(rutas_zoom(zoom), (topo, geo)):
+            # dumps usa el codificador en C; dump escribe por partes en Python
+            with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+                f.write(json.dumps(objeto, ensure_ascii=False, separators=(",", ":")))
+            os.replace(ruta + ".tmp", ruta)
+        rutas[zoom] = rutas_zoom(zoom)
+        if informar is not None:
+            vertices = sum(len(a) for a in topo["arcs"])
+            informar(f"zoom {zoom}: {vertices} vértices, "
+                     + ", ".join(f"{os.path.getsize(r) / 2**20:.1f} MB" for r in rutas[zoom]))
+    return rutas
+
+
+def nivel_zoom(zoom):
+    """
+    El nivel precalculado más cercano por abajo (o el menor).
+    """
+    menores = [nivel for nivel in NIVELES_ZOOM if nivel <= zoom]
+    return max(menores) if menores else min(NIVELES_ZOOM)
+
+
+def ruta_geometria(zoom, formato="geojson"):
+    """
+    Ruta del archivo del zoom ("geojson" o "topojson"), construyéndolo si
+    no existe o si el shapefile cambió.
+    """
+    if not geometrias_vigentes():
+        construir_geometrias()
+    topo, geo = rutas_zoom(nivel_zoom(zoom))
+    return geo if formato == "geojson" else topo
+
+
+@cache_datos
+def cargar_geometria(zoom, formato="geojson"):
+    """
+    El GeoJSON (o TopoJSON) del zoom ya leído, para pasarlo a folium.
+    """
+    with open(ruta_geometria(zoom, formato), encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula las geometrías simplificadas por zoom.")
+    parser.parse_args()
+
+    inicio = time.time()
+    rutas = construir_geometrias(informar=print)
+    completos = sum(len(a) for p in obtener_geometrias()["poligonos"] for pol in p for a in pol)
+    print(f"{completos} vértices a resolución completa; listo en {time.time() - inicio:.1f} s")
@@ -0,0 +1,231 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentación opcional de las funciones principales: tiempo y número de
+# llamadas por función, agregados por solicitud (una pantalla de Streamlit o
+# una petición de la API) y en totales del proceso.
+#
+# Se activa con variables de entorno:
+# - AGRO_INSTRUMENTAR=1: mide las funciones marcadas con @instrumentar y
+#   escribe una línea JSON por solicitud en el logger "agroanalytics.metricas"
+#   (a stderr, o al archivo de AGRO_METRICAS_ARCHIVO)
+# - AGRO_PERFIL=cprofile (o pyinstrument): guarda un perfil de cada solicitud
+#   en AGRO_PERFIL_CARPETA (por omisión "perfiles/")
+# Sin ellas, las funciones marcadas solo revisan una bandera.
+
+ACTIVA = os.environ.get("AGRO_INSTRUMENTAR", "") not in ("", "0")
+PERFIL = os.environ.get("AGRO_PERFIL", "").lower()
+CARPETA_PERFILES = os.environ.get("AGRO_PERFIL_CARPETA", "perfiles")
+
+registro = logging.getLogger("agroanalytics.metricas")
+
+_totales = {}      # nombre -> [llamadas, segundos, máximo]
+_contadores = {}   # nombre -> total
+_candado = threading.Lock()
+_solicitud = contextvars.ContextVar("solicitud", default=None)
+
+
+def _configurar_registro():
+    if registro.handlers:
+        return
+    archivo = os.environ.get("AGRO_METRICAS_ARCHIVO")
+    manejador = logging.FileHandler(archivo) if archivo else logging.StreamHandler(sys.stderr)
+    manejador.setFormatter(logging.Formatter("%(message)s"))
+    registro.addHandler(manejador)
+    registro.setLevel(logging.INFO)
+    registro.propagate = False
+
+
+def activar_instrumentacion(activa=True):
+    """
+    Activa o desactiva la medición en tiempo de ejecución.
+    """
+    global ACTIVA
+    ACTIVA = activa
+    if activa:
+        _configurar_registro()
+
+
+def _acumular(nombre, segundos):
+    with _candado:
+        total = _totales.setdefault(nombre, [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += segundos
+        total[2] = max(total[2], segundos)
+    actual = _solicitud.get()
+    if actual is not None:
+        medida = actual["tiempos"].setdefault(nombre, {"llamadas": 0, "segundos": 0.0})
+        medida["llamadas"] += 1
+        medida["segundos"] += segundos
+
+
+@contextmanager
+def medir(nombre):
+    """
+    Mide el bloque 'with' bajo 'nombre'.
+    """
+    if not ACTIVA:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _acumular(nombre, time.perf_counter() - inicio)
+
+
+def instrumentar(nombre=None):
+    """
+    Decorador: mide cada llamada de la función bajo 'nombre'
+    (por omisión "modulo.funcion").
+    """
+    def decorador(funcion):
+        etiqueta = nombre or f"{funcion.__module__}.{funcion.__qualname__}"
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not ACTIVA:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                _acumular(etiqueta, time.perf_counter() - inicio)
+
+        return envoltura
+
+    return decorador
+
+
+def contar(nombre, n=1):
+    """
+    Suma n al contador 'nombre' (del proceso y de la solicitud actual).
+    """
+    if not ACTIVA:
+        return
+    with _candado:
+        _contadores[nombre] = _contadores.get(nombre, 0) + n
+    actual = _solicitud.get()
+    if actual is not None:
+        actual["contadores"][nombre] = actual["contadores"].get(nombre, 0) + n
+
+
+def _iniciar_perfil():
+    if PERFIL == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            registro.warning("pyinstrument no está instalado; se usa cProfile")
+        else:
+            perfilador = Profiler()
+            perfilador.start()
+            return perfilador
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    return perfilador
+
+
+def _guardar_perfil(perfilador, nombre):
+    os.makedirs(CARPETA_PERFILES, exist_ok=True)
+    archivo = re.sub(r"[^\w.-]+", "_", nombre)
+    base = os.path.join(CARPETA_PERFILES, f"{time.strftime('%Y%m%d_%H%M%S')}_{archivo}")
+    if isinstance(perfilador, cProfile.Profile):
+        perfilador.disable()
+        perfilador.dump_stats(base + ".prof")
+        return base + ".prof"
+    perfilador.stop()
+    with open(base + ".html", "w") as f:
+        f.write(perfilador.output_html())
+    return base + ".html"
+
+
+@contextmanager
+def solicitud(nombre):
+    """
+    Delimita una solicitud: las mediciones dentro del bloque se agregan en
+    un resumen que se escribe como una línea JSON al terminar. Con
+    AGRO_PERFIL además se guarda un perfil del bloque.
+
+    También sirve como decorador. Las solicitudes anidadas se cuentan en la
+    de afuera.
+    """
+    if (not ACTIVA and not PERFIL) or _solicitud.get() is not None:
+        yield None
+        return
+
+    datos = {"solicitud": nombre, "tiempos": {}, "contadores": {}}
+    token = _solicitud.set(datos)
+    perfilador = _iniciar_perfil() if PERFIL else None
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        datos["segundos"] = time.perf_counter() - inicio
+        _solicitud.reset(token)
+        if perfilador is not None:
+            datos["perfil"] = _guardar_perfil(perfilador, nombre)
+        if ACTIVA:
+            _acumular("solicitud", datos["segundos"])
+            registro.info(json.dumps(datos, ensure_ascii=False))
+
+
+def metricas():
+    """
+    Totales del proceso: {"tiempos": {nombre: {llamadas, segundos, maximo}},
+    "contadores": {nombre: total}}.
+    """
+    with _candado:
+        return {
+            "tiempos": {
+                nombre: {"llamadas": t[0], "segundos": t[1], "maximo": t[2]}
+                for nombre, t in _totales.items()
+            },
+            "contadores": dict(_contadores),
+        }
+
+
+def reiniciar_metricas():
+    with _candado:
+        _totales.clear()
+        _contadores.clear()
+
+
+def exportar_prometheus():
+    """
+    Totales del proceso en formato de texto de Prometheus.
+    """
+    datos = metricas()
+    lineas = [
+        "# HELP agro_llamadas_total Llamadas por función instrumentada.",
+        "# TYPE agro_llamadas_total counter",
+    ]
+    lineas += [f'agro_llamadas_total{{funcion="{n}"}} {t["llamadas"]}' for n, t in datos["tiempos"].items()]
+    lineas += [
+        "# HELP agro_segundos_total Segundos acumulados por función instrumentada.",
+        "# TYPE agro_segundos_total counter",
+    ]
+    lineas += [f'agro_segundos_total{{funcion="{n}"}} {t["segundos"]:.6f}' for n, t in datos["tiempos"].items()]
+    lineas += [
+        "# HELP agro_segundos_maximo Llamada más lenta por función instrumentada.",
+        "# TYPE agro_segundos_maximo gauge",
+    ]
+    lineas += [f'agro_segundos_maximo{{funcion="{n}"}} {t["maximo"]:.6f}' for n, t in datos["tiempos"].items()]
+    lineas += [
+        "# HELP agro_eventos_total Contadores de eventos (p. ej. fallos de cache).",
+        "# TYPE agro_eventos_total counter",
+    ]
+    lineas += [f'agro_eventos_total{{nombre="{n}"}} {v}' for n, v in datos["contadores"].items()]
+    return "\n".join(lineas) + "\n"
+
+
+if ACTIVA:
+    _configurar_registro()
@@ -0,0 +1,58 @@
+#comando para construir el paquete: python -m data.paquete_parquet
+import argparse
+import os
+import time
+
+from data.acceso_data import (
+    ARCHIVOS,
+    CARPETA_PAQUETE,
+    leer_original,
+    ruta_paquete,
+    tipar_tabla,
+)
+
+# Convierte las tablas de ARCHIVOS (CSV y Parquet originales) a Parquet ya
+# tipado (ver tipar_tabla). data.acceso_data.cargar_tabla lee de aquí cuando
+# el paquete es más reciente que el archivo original.
+
+
+def convertir_tabla(nombre):
+    """
+    Lee la tabla original, la tipa y la escribe en el paquete.
+    Regresa (bytes del original, bytes del Parquet).
+    """
+    df = tipar_tabla(leer_original(nombre))
+    destino = ruta_paquete(nombre)
+    temporal = destino + ".tmp"
+    df.to_parquet(temporal, index=False, compression="zstd")
+    os.replace(temporal, destino)
+    return os.path.getsize(ARCHIVOS[nombre]), os.path.getsize(destino)
+
+
+def convertir_paquete(nombres=None):
+    """
+    Convierte las tablas indicadas (todas las que existan si es None).
+    Regresa un diccionario nombre -> (bytes original, bytes Parquet, segundos).
+    """
+    if nombres is None:
+        nombres = [n for n, ruta in ARCHIVOS.items() if os.path.exists(ruta)]
+    os.makedirs(CARPETA_PAQUETE, exist_ok=True)
+
+    resultados = {}
+    for nombre in nombres:
+        inicio = time.time()
+        original, parquet = convertir_tabla(nombre)
+        resultados[nombre] = (original, parquet, time.time() - inicio)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convierte las tablas de datos a Parquet tipado."
+    )
+    parser.add_argument("tablas", nargs="*", help="tablas a convertir (por defecto todas)")
+    args = parser.parse_args()
+
+    resultados = convertir_paquete(args.tablas or None)
+    for nombre, (original, parquet, segundos) in resultados.items():
+        print(f"{nombre}: {original / 1e6:.1f} MB -> {parquet / 1e6:.1f} MB ({segundos:.1f} s)")
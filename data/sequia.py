@@ -0,0 +1,106 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from data.acceso_data import cache_datos, cargar_tabla
+
+# Historial de sequía por municipio ya agregado por año.
+# La tabla mensual (data/Sequia_mensual.parquet) tiene una fila por municipio
+# y una columna por mes ("2013-01", ...) con el nivel de sequía:
+
+NIVELES_SEQUIA = {
+    0: "Sin sequía",
+    1: "D0 Anormalmente seco",
+    2: "D1 Sequía moderada",
+    3: "D2 Sequía severa",
+    4: "D3 Sequía extrema",
+    5: "D4 Sequía excepcional",
+}
+
+
+def construir_sequia_anual(df_mensual):
+    """
+    Agrega la tabla mensual por municipio y año.
+
+    Regresa un diccionario con:
+    - "cvegeo" / "posicion": CVEGEO de cada fila y CVEGEO -> fila
+    - "anios": años de cada columna
+    - "media": nivel promedio (municipios × años)
+    - "maximo": nivel máximo (municipios × años)
+    - "meses": meses con dato (municipios × años)
+    - "meses_por_nivel": meses en cada nivel de NIVELES_SEQUIA
+      (municipios × años × niveles)
+    """
+    columnas_mes = [c for c in df_mensual.columns if c != "CVEGEO"]
+    anio_de_mes = np.array([int(c[:4]) for c in columnas_mes])
+    anios = np.unique(anio_de_mes)
+
+    cvegeo = df_mensual["CVEGEO"].astype(str).str.zfill(5).to_numpy()
+    valores = df_mensual[columnas_mes].to_numpy(dtype=np.float64)
+    niveles = np.array(list(NIVELES_SEQUIA))
+
+    n_mun, n_anios = len(cvegeo), len(anios)
+    media = np.full((n_mun, n_anios), np.nan)
+    maximo = np.full((n_mun, n_anios), np.nan)
+    meses = np.zeros((n_mun, n_anios), dtype=np.int16)
+    meses_por_nivel = np.zeros((n_mun, n_anios, len(niveles)), dtype=np.int16)
+
+    # años sin ningún dato quedan en NaN (nanmean/nanmax avisan de eso)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for k, anio in enumerate(anios):
+            bloque = valores[:, anio_de_mes == anio]
+            media[:, k] = np.nanmean(bloque, axis=1)
+            maximo[:, k] = np.nanmax(bloque, axis=1)
+            meses[:, k] = (~np.isnan(bloque)).sum(axis=1)
+            meses_por_nivel[:, k, :] = (bloque[:, :, None] == niveles).sum(axis=1)
+
+    return {
+        "cvegeo": cvegeo,
+        "posicion": {cve: i for i, cve in enumerate(cvegeo)},
+        "anios": anios,
+        "media": media,
+        "maximo": maximo,
+        "meses": meses,
+        "meses_por_nivel": meses_por_nivel,
+    }
+
+
+@cache_datos
+def obtener_sequia_anual():
+    """
+    Regresa el resultado de construir_sequia_anual(), construido una sola vez.
+    """
+    return construir_sequia_anual(cargar_tabla("tabla_sequia_mensual"))
+
+
+def sequia_anual(lista_cvegeo, medida="nivel"):
+    """
+    Regresa un DataFrame (CVEGEO × años) para los municipios de la lista que
+    tienen datos, en el mismo orden.
+
+    medida:
+    - "nivel": promedio anual redondeado (el que se grafica)
+    - "media": promedio anual
+    - "maximo": nivel máximo del año
+    - un nivel de NIVELES_SEQUIA (0-5): meses del año en ese nivel
+    """
+    s = obtener_sequia_anual()
+    lista_cvegeo = [str(cve).zfill(5) for cve in lista_cvegeo]
+    lista_cvegeo = [cve for cve in lista_cvegeo if cve in s["posicion"]]
+    filas = [s["posicion"][cve] for cve in lista_cvegeo]
+
+    if medida == "nivel":
+        valores = np.round(s["media"][filas])
+    elif medida in ("media", "maximo"):
+        valores = s[medida][filas]
+    elif medida in NIVELES_SEQUIA:
+        valores = s["meses_por_nivel"][filas, :, medida]
+    else:
+        raise ValueError(f"Medida de sequía desconocida: {medida}")
+
+    return pd.DataFrame(
+        valores,
+        index=pd.Index(lista_cvegeo, name="CVEGEO"),
+        columns=pd.Index(s["anios"], name="Año"),
+    )
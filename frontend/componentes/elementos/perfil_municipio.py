@@ -1,6 +1,6 @@
 import streamlit as st
 import plotly.express as px
-from data.acceso_data import *
+from data.acceso_data import cargar_tabla, leer_caracteristicas_municipio
 from frontend.diseño import aplicar_estilos
 from calculos.aez_comp import obtener_cultivos
 
@@ -30,7 +30,7 @@ def mostrar_perfil_municipio(fila_muni, cultivos_df=None):
         st.markdown("No hay cultivos registrados en el cierre agrícola.")
     else:
         # si quieres mostrar ID y nombre:
-        nombres = df_catalogo_cultivos.set_index("Idcultivo")["Nomcultivo"].to_dict()
+        nombres = cargar_tabla("tabla_catalogo_cultivos").set_index("Idcultivo")["Nomcultivo"].to_dict()
         lista = [f"{cid} — {nombres.get(cid, 'Desconocido')}" for cid in cultivos_muni]
 
         st.markdown("- " + "<br>- ".join(lista), unsafe_allow_html=True)
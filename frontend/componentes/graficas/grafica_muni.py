@@ -1,74 +1,79 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+from data.acceso_data import obtener_nombres_municipios
+from data.sequia import sequia_anual
+from data.instrumentacion import instrumentar
 
-def graficar_similitud_municipios(df_similitud):
-    df_similitud = df_similitud.sort_values("Similitud", ascending=False)
+# Las gráficas se regresan como especificaciones de Plotly (diccionarios con
+# "data" y "layout") que st.plotly_chart dibuja directo: son chicas, se
+# pueden guardar en cache y no hace falta crear la figura en cada ejecución.
 
-    plt.figure(figsize=(8, 4))
-    sns.barplot(
-        data=df_similitud.head(10),
-        x="Similitud",
-        y="NOMGEO",
-        hue="NOMGEO",
-        palette="viridis",
-        legend=False
-    )
-    plt.title("Top 10 Municipios Con Mayor Similitud")
-    plt.xlabel("Similitud")
-    plt.ylabel("Municipio")
-    plt.xlim(0, 1)
-    plt.tight_layout()
 
-    return plt.gcf()
+def graficar_similitud_municipios(df_similitud):
+    """
+    Barras horizontales con los 10 municipios más similares.
+    df_similitud: DataFrame con columnas 'NOMGEO' y 'Similitud'.
+    """
+    top = df_similitud.nlargest(10, "Similitud").iloc[::-1]
+    return {
+        "data": [{
+            "type": "bar",
+            "orientation": "h",
+            "x": top["Similitud"].round(4).tolist(),
+            "y": top["NOMGEO"].astype(str).tolist(),
+            "marker": {"color": top["Similitud"].round(4).tolist(), "colorscale": "Viridis"},
+            "hovertemplate": "%{y}: %{x:.1%}<extra></extra>",
+        }],
+        "layout": {
+            "title": {"text": "Top 10 Municipios Con Mayor Similitud"},
+            "xaxis": {"title": {"text": "Similitud"}, "range": [0, 1]},
+            "yaxis": {"title": {"text": "Municipio"}},
+            "height": 400,
+            "margin": {"l": 10, "r": 10, "t": 40, "b": 10},
+        },
+    }
 
 
-def graficar_sequia(df_sequia, municipio, lista_municipios, tabla_muni):
+@instrumentar()
+def graficar_sequia(municipio, lista_municipios):
     """
-    df_sequia: DataFrame con columnas 'CVEGEO', 'Fecha', 'Nivel_Sequia'
     municipio: CVEGEO del municipio base
     lista_municipios: lista de CVEGEO de municipios a comparar
-    tabla_muni: DataFrame con columnas 'CVEGEO', 'NOMGEO', 'NOM_ENT' para los nombres legibles
+
+    Mapa de calor del nivel de sequía anual, a partir del historial ya
+    agregado (data.sequia).
     """
-    df_sequia["CVEGEO"] = df_sequia["CVEGEO"].astype(str).str.zfill(5)
     municipio = str(municipio).zfill(5)
     lista_municipios = [str(x).zfill(5) for x in lista_municipios]
 
-    df_sequia["Fecha"] = pd.to_datetime(df_sequia["Fecha"], errors="coerce")
-    df_sequia["Año"] = df_sequia["Fecha"].dt.year
-
-    df_anual = (
-        df_sequia
-        .groupby(["CVEGEO", "Año"], as_index=False)
-        .agg(Nivel_Sequia=("Nivel_Sequia", lambda x: round(x.mean())))
-    )
-
-    # Filtrar solo los municipios que nos interesan
-    df_anual = df_anual[df_anual["CVEGEO"].isin(lista_municipios + [municipio])]
+    # Nivel anual (promedio redondeado) de los municipios que nos interesan
+    heat_df = sequia_anual(lista_municipios + [municipio], medida="nivel")
 
     # Mapear nombres legibles
-    nombres_map = tabla_muni.set_index("CVEGEO").apply(lambda row: f"{row['NOMGEO']} ({row['NOM_ENT']})", axis=1)
-    df_anual["Nombre"] = df_anual["CVEGEO"].map(nombres_map)
-
-    # Pivotar para heatmap usando el nombre legible
-    heat_df = df_anual.pivot(index="Nombre", columns="Año", values="Nivel_Sequia")
-
-    # --- Crear figura explícita ---
-    fig, ax = plt.subplots(figsize=(10,5))
-    sns.heatmap(
-        heat_df,
-        annot=True,
-        fmt=".0f",
-        cmap="YlOrRd",
-        cbar_kws={'label': 'Nivel de sequía'},
-        ax=ax
-    )
-    ax.set_ylabel("Municipio")
-    ax.set_xlabel("Año")
-    ax.set_title("Historial de sequía")
-    fig.tight_layout()
-
-    return fig
-
-
+    nombres = obtener_nombres_municipios()
+    nombres_map = nombres["NOMGEO"].astype(str) + " (" + nombres["NOM_ENT"].astype(str) + ")"
+    heat_df = heat_df[~heat_df.index.duplicated()]
+    heat_df.index = heat_df.index.map(nombres_map)
+    heat_df = heat_df[heat_df.index.notna()].sort_index()
 
+    valores = heat_df.to_numpy(dtype=float)
+    z = np.where(np.isnan(valores), None, valores).tolist()
+    return {
+        "data": [{
+            "type": "heatmap",
+            "z": z,
+            "x": [str(anio) for anio in heat_df.columns],
+            "y": heat_df.index.tolist(),
+            "colorscale": "YlOrRd",
+            "zmin": 0,
+            "zmax": 5,
+            "texttemplate": "%{z:.0f}",
+            "colorbar": {"title": {"text": "Nivel de sequía"}},
+        }],
+        "layout": {
+            "title": {"text": "Historial de sequía"},
+            "xaxis": {"title": {"text": "Año"}, "type": "category"},
+            "yaxis": {"title": {"text": "Municipio"}},
+            "height": 150 + 30 * len(heat_df),
+            "margin": {"l": 10, "r": 10, "t": 40, "b": 10},
+        },
+    }
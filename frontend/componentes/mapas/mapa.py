@@ -1,12 +1,79 @@
+import folium
+import streamlit as st
+import streamlit.components.v1 as components
+from data.acceso_data import cache_datos
+from data.capas import CAPAS, ZOOM_CAPAS, obtener_capa
+
+CENTRO_MEXICO = (23.6, -102.5)
+ZOOM_INICIAL = 5
+
+
+def _estilo(feature):
+    # el color ya viene asignado en la capa (data.capas)
+    return {
+        "fillColor": feature["properties"]["color"],
+        "color": "#ffffff",
+        "weight": 0.3,
+        "fillOpacity": 0.8,
+    }
+
+
+def html_leyenda(capa):
+    filas = "".join(
+        f'<div><span style="background:{c["color"]};width:12px;height:12px;'
+        f'display:inline-block;margin-right:6px"></span>{c["etiqueta"]}</div>'
+        for c in capa["leyenda"]
+    )
+    return (
+        '<div style="position:fixed;bottom:20px;left:20px;z-index:9999;background:white;'
+        f'padding:8px 10px;font-size:12px;border-radius:4px"><b>{capa["titulo"]}</b>{filas}</div>'
+    )
+
+
+def mapa_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    Mapa de folium con la capa precalculada 'nombre' (ver data.capas.CAPAS).
+    """
+    capa = obtener_capa(nombre, zoom)
+    mapa = folium.Map(location=CENTRO_MEXICO, zoom_start=ZOOM_INICIAL, tiles="cartodbpositron")
+    folium.GeoJson(
+        capa,
+        name=capa["titulo"],
+        style_function=_estilo,
+        tooltip=folium.GeoJsonTooltip(
+            fields=["NOMGEO", "NOM_ENT", "etiqueta"],
+            aliases=["Municipio", "Estado", capa["titulo"]],
+        ),
+    ).add_to(mapa)
+    mapa.get_root().html.add_child(folium.Element(html_leyenda(capa)))
+    return mapa
+
+
+@cache_datos
+def html_mapa_capa(nombre, zoom=ZOOM_CAPAS):
+    """
+    HTML del mapa de la capa; se genera una vez por proceso y en cada
+    ejecución de la pantalla solo se manda.
+    """
+    return mapa_capa(nombre, zoom).get_root().render()
+
 
 #---------------pantalla: INICIO
 
+# mapas de topoforma, precipitación, temperatura, unidades de clima y tipo de región
+def mostrar_mapa_capa(nombre, zoom=ZOOM_CAPAS, alto=520):
+    try:
+        components.html(html_mapa_capa(nombre, zoom), height=alto)
+    except FileNotFoundError as e:
+        st.info(f"Mapa no disponible: falta {e.filename}")
+
+
+def selector_mapas_nacionales():
+    nombre = st.selectbox(
+        "Mapa nacional:", list(CAPAS), format_func=lambda capa: CAPAS[capa]["titulo"]
+    )
+    mostrar_mapa_capa(nombre)
 
-#mapa que muestre valores de topoforma 
-#mapa que muestre valores de precipitación
-#mapa que muestre valores de temperatura
-#mapa que muestre unidades de clima
-# mapa que muestre tipo de región 
 
 #---------------pantalla: Municipios
 # Mapa que muestre los municipios similares
@@ -15,5 +82,4 @@
 # mapa que muestre los municipios donde se cultiva cierto cultivo
 
 
-# mapa que muestre los principales cultivos del país 
-
+# mapa que muestre los principales cultivos del país
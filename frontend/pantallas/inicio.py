@@ -1,18 +1,66 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 from frontend.diseño import aplicar_estilos
+from frontend.componentes.mapas.mapa import selector_mapas_nacionales
+from data.acceso_data import obtener_nombres_municipios
+from calculos.aez_comp import obtener_nombres_cultivos
+from calculos.cubo_produccion import (
+    cultivos_mas_rentables,
+    municipios_mas_rentables,
+    principales_cultivos,
+    principales_municipios,
+    superficie_anual,
+)
+
+
+def _con_nombres_cultivos(tabla):
+    nombres = obtener_nombres_cultivos()
+    return tabla.set_axis([nombres.get(i, str(i)) for i in tabla.index], axis=0)
+
+
+def _con_nombres_municipios(tabla):
+    muni = obtener_nombres_municipios()
+    nombres = (muni["NOMGEO"].astype(str) + " (" + muni["NOM_ENT"].astype(str) + ")").to_dict()
+    return tabla.set_axis([nombres.get(c, c) for c in tabla.index], axis=0)
+
 
 def pantalla_inicio():
 
     st.header("Panorama general de la agricultura en México")
     st.markdown("Vista general de la producción nacional :blue-background[últimos 10 años] text")
 
+    # Mapas nacionales (capas precalculadas en data.capas)
+    selector_mapas_nacionales()
+
+    # Las vistas son búsquedas en el cubo de producción (calculos.cubo_produccion)
+    try:
+        cultivos = principales_cultivos()
+    except FileNotFoundError as e:
+        st.info(f"Sin datos del cierre agrícola ({e.filename}).")
+        return
+    if cultivos is None:
+        return
+
     # Función para mostrar los principales cultivos a nivel nacional
+    st.subheader("Principales cultivos del país (valor de la producción)")
+    st.bar_chart(_con_nombres_cultivos(cultivos)["Valorproduccion"])
 
     #función para mostraer los municipios con mayor desempeño en los principales cultivos
+    nombres_cultivos = obtener_nombres_cultivos()
+    cultivo = st.selectbox(
+        "Cultivo:", list(cultivos.index), format_func=lambda i: nombres_cultivos.get(i, str(i))
+    )
+    st.subheader("Municipios con mayor producción del cultivo")
+    st.bar_chart(_con_nombres_municipios(principales_municipios(cultivo))["Volumenproduccion"])
 
     # gráfica de siembra total en 10 años
+    st.subheader("Superficie sembrada y cosechada (ha)")
+    st.line_chart(superficie_anual(10))
 
     # cultivos con mayor ganancia económica 
+    st.subheader("Cultivos con mayor valor por hectárea")
+    st.bar_chart(_con_nombres_cultivos(cultivos_mas_rentables())["ValorPorHectarea"])
 
     # municipios con mayor ganancia económica en general o en los principales cultivos
+    st.subheader("Municipios con mayor valor de la producción")
+    st.bar_chart(_con_nombres_municipios(municipios_mas_rentables())["Valorproduccion"])
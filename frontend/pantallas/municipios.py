@@ -1,24 +1,67 @@
 import sys
 import os
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 if ROOT not in sys.path:
     sys.path.append(ROOT)
 import streamlit as st
-from streamlit_folium import st_folium
-import pandas as pd
 from frontend.componentes.elementos.perfil_municipio import mostrar_perfil_municipio
-from calculos.modelo import (comparar_municipios,comparar_municipios_detallado,normalizar_cvegeo)
+import pandas as pd
+from calculos.modelo import ESPECIFICACION_DETALLE, normalizar_cvegeo
+from calculos.cache_resultados import cache_resultado, detalle_similares
 from frontend.componentes.graficas.grafica_muni import graficar_similitud_municipios, graficar_sequia
-from data.acceso_data import *
-from calculos.aez_comp import * 
+from data.acceso_data import cargar_tabla, obtener_nombres_municipios
+
+
+# Etapas de la pantalla guardadas por municipio en el cache de resultados
+# (calculos.cache_resultados): al volver a ejecutar la pantalla (cada clic)
+# solo se dibuja lo que ya está calculado. El detalle de todos los similares
+# sale de una sola llamada (detalle_similares).
+
+def tabla_componentes(fila):
+    """
+    Una fila de detalle_similares() como tabla componente × (base, otro,
+    similitud) para mostrarla.
+    """
+    return pd.DataFrame(
+        [
+            {
+                "Componente": componente["nombre"],
+                "Municipio base": fila[f"{componente['nombre']}_base"],
+                "Municipio similar": fila[f"{componente['nombre']}_otro"],
+                "Similitud": fila[componente["nombre"]],
+            }
+            for componente in ESPECIFICACION_DETALLE
+        ]
+    ).astype({"Municipio base": str, "Municipio similar": str})
+
+
+# Tipos de ranking (modo de detalle_similares)
+MODOS = {
+    "ambiente": "Ambiente",
+    "cultivos": "Ambiente y cultivos",
+}
+
+
+def columna_similitud(modo):
+    # la similitud con la que se ordena el ranking
+    return "similitud_combinada" if modo == "cultivos" else "Similitud"
+
+
+@cache_resultado
+def grafica_similitud(cvegeo, k=10, modo="ambiente"):
+    detalle = detalle_similares(cvegeo, k, modo)
+    return graficar_similitud_municipios(detalle.assign(Similitud=detalle[columna_similitud(modo)]))
+
+
+@cache_resultado
+def grafica_sequia(cvegeo, similares):
+    return graficar_sequia(cvegeo, list(similares))
+
+
 def pantalla_municipios():
 
     #tabla_muni = pd.read_parquet("data/tabla_municipios.parquet")
-    tabla_muni=df_municipios
-    sequia=df_sequia
+    tabla_muni=cargar_tabla("tabla_municipios")
 
 
     # ================================
@@ -59,6 +102,7 @@ def pantalla_municipios():
         st.session_state["cvegeo_seleccionado"] = cvegeo
         st.session_state["municipio_seleccionado_nombre"] = municipio_sel
         st.session_state["consulta_realizada"] = True
+        st.session_state.pop("detalle_abierto", None)
 
         st.success("Municipio cargado exitosamente.")
 
@@ -80,11 +124,8 @@ def pantalla_municipios():
     # - col_profile: para el perfil del municipio
     col_main, col_profile = st.columns([3, 1])
 
-# Sacamos la fila completa del municipio seleccionado
-    fila_muni = tabla_muni[
-        (tabla_muni["NOM_ENT"] == estado_sel) &
-        (tabla_muni["NOMGEO"] == municipio_sel)
-    ]
+    # Fila del municipio consultado (no la de los selectores, que pueden haber cambiado)
+    fila_muni = obtener_nombres_municipios().loc[[cvegeo_base]].reset_index()
 
     # --- MINI SIDEBAR A LA DERECHA ---
     with col_profile:
@@ -92,76 +133,61 @@ def pantalla_municipios():
 
 
     with col_main:
-        tabla = tabla_muni.copy()
-        tabla["CVEGEO"] = tabla["CVEGEO"].apply(normalizar_cvegeo)
-
-        municipios_lista = tabla["CVEGEO"].unique()
-
-        resultados = []
 
     # ================================
     # Calcular similitud contra todos
     # ================================
+        modo = st.radio(
+            "Similitud por", list(MODOS), format_func=MODOS.get, horizontal=True, key="modo_similitud"
+        )
         with st.spinner("Calculando similitudes..."):
-            for otro in municipios_lista:
-                if otro == cvegeo_base:
-                    continue
-                sim = comparar_municipios(cvegeo_base, otro)
-                if sim is None:
-                    continue 
-
-                fila_otro = tabla[tabla["CVEGEO"] == otro].iloc[0]
-                nom_ent = fila_otro["NOM_ENT"]
-                nom_geo = fila_otro["NOMGEO"]
-
-                resultados.append((otro, nom_ent, nom_geo, sim))
-
-        df_res = pd.DataFrame(resultados, columns=["CVEGEO", "NOM_ENT", "NOMGEO", "Similitud"])
-        df_res = df_res.sort_values(by="Similitud", ascending=False) 
-              
+            df_res = detalle_similares(cvegeo_base, k=10, modo=modo)
+        if df_res is None:
+            st.warning("No hay datos completos para este municipio.")
+            return
+        df_res = df_res.reset_index()
+
         st.subheader("Municipios con mayor similitud")
-        st.dataframe(df_res.head(10), width="stretch")
+        columnas = ["CVEGEO", "NOM_ENT", "NOMGEO", "Similitud", "n_comunes"]
+        if modo == "cultivos":
+            columnas += ["similitud_cultivos", "similitud_aptitud", "similitud_combinada"]
+        st.dataframe(df_res[columnas].head(10), width="stretch")
 
         #st.markdown("Ver detalle de municipios similares")
-        fig_sim = graficar_similitud_municipios(df_res)
-        st.pyplot(fig_sim)
+        st.plotly_chart(grafica_similitud(cvegeo_base, k=10, modo=modo), use_container_width=True)
 
-        for idx, row in df_res.head(10).iterrows():
-            cve_otro = row["CVEGEO"]
-            nombre_otro = f"{row['NOMGEO']} ({row['NOM_ENT']})"
-            sim = row["Similitud"]
+        # El municipio abierto queda en la sesión; en cada ejecución solo se
+        # dibuja su detalle (ya calculado)
+        for row in df_res.head(10).itertuples():
+            nombre_otro = f"{row.NOMGEO} ({row.NOM_ENT})"
             # Botón por municipio
-            if st.button(f"Ver detalle de {nombre_otro}", key=f"detalle_{nombre_otro}"):
-                st.markdown(f"Comparación entre **{municipio_nombre}** y **{nombre_otro}**")
-                detalle = comparar_municipios_detallado(cvegeo_base, cve_otro)
-                st.code(detalle)
-                st.markdown("---")
-                st.markdown("### 🌱 Comparación de cultivos entre municipios")
-                cultivos = comparar_municipios_cultivo(cvegeo_base, cve_otro)
-                st.write("**Cultivos en común:**")
-                st.dataframe(cultivos["cultivos_comunes"])
-
-
-    # Gráfica de sequía 
-                st.markdown("**Niveles de sequía comparados**")
-        top10 = df_res.head(10)["CVEGEO"].tolist()  # Lista de municipios similares
-        fig_seq = graficar_sequia(sequia, cvegeo_base, top10, tabla_muni)
-        st.pyplot(fig_seq)
-
-        comparar_municipios_cultivo(cvegeo_base, cve_otro)
-        
-
-
-    
-
-
-
-
-
-
-
-
-
+            if st.button(f"Ver detalle de {nombre_otro}", key=f"detalle_{row.CVEGEO}"):
+                st.session_state["detalle_abierto"] = row.CVEGEO
+
+        cve_otro = st.session_state.get("detalle_abierto")
+        if cve_otro in set(df_res["CVEGEO"]):
+            fila_otro = df_res[df_res["CVEGEO"] == cve_otro].iloc[0]
+            nombre_otro = f"{fila_otro['NOMGEO']} ({fila_otro['NOM_ENT']})"
+            st.markdown(f"Comparación entre **{municipio_nombre}** y **{nombre_otro}**")
+            st.dataframe(tabla_componentes(fila_otro), width="stretch", hide_index=True)
+            st.markdown(f"**Similitud final:** {fila_otro['Similitud']:.3f}")
+            if modo == "cultivos":
+                st.markdown(
+                    f"**Cultivos (Jaccard):** {fila_otro['similitud_cultivos']:.3f} · "
+                    f"**Aptitud AEZ:** {fila_otro['similitud_aptitud']:.3f} · "
+                    f"**Combinada:** {fila_otro['similitud_combinada']:.3f}"
+                )
+            st.markdown("---")
+            st.markdown("### 🌱 Comparación de cultivos entre municipios")
+            st.write("**Cultivos en común:**")
+            st.dataframe(pd.Series(fila_otro["cultivos_comunes"], name="Cultivo", dtype=object))
+            st.write("**Cultivos del municipio similar que no tiene la base:**")
+            st.dataframe(pd.Series(fila_otro["cultivos_faltantes"], name="Cultivo", dtype=object))
+
+    # Gráfica de sequía
+        st.markdown("**Niveles de sequía comparados**")
+        top10 = tuple(df_res.head(10)["CVEGEO"])  # municipios similares
+        st.plotly_chart(grafica_sequia(cvegeo_base, top10), use_container_width=True)
 
 
 if __name__ == "__main__":